@@ -0,0 +1,322 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_ohlcv, synthetic_universe, synthetic_ws_messages
+
+# Бенчмарки горячего пути: индикаторы (пакетные, потоковые, векторизованные), проверка сигнала
+# и обработка WS-сообщений collector. Данные синтетические и детерминированные (benchmarks.synthetic).
+#
+# python -m benchmarks.bench                 — прогон и сравнение с baseline (код выхода 1 при регрессии)
+# python -m benchmarks.bench --save          — прогон и запись результатов как нового baseline
+# Опции: --quick (уменьшенные размеры), --only <подстрока>, --repeat N, --threshold 0.25,
+#        --baseline benchmarks/baseline.json
+#
+# Для каждого замера пишутся throughput (операций/сек, лучший из repeat прогонов) и latency_us
+# (мкс на операцию); для потока WS — ещё p99_us по отдельным сообщениям. Регрессия — throughput
+# ниже baseline больше чем на threshold или p99 выше на столько же. Baseline зависит от машины,
+# поэтому в репозиторий не коммитится (.gitignore) и записывается на той же машине, где потом
+# проверяются изменения:
+#   git stash && python -m benchmarks.bench --save && git stash pop   — baseline по коду без изменений
+#   python -m benchmarks.bench                                        — сравнение изменений с ним
+# Без baseline сравнение не выполняется: печатается предупреждение, код выхода 0.
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+FULL_SIZES = {"candles": (1_000, 10_000, 100_000), "universe": (500, 1_000), "stream": 100_000, "burst": 10_000}
+QUICK_SIZES = {"candles": (1_000, 10_000), "universe": (50, 1_000), "stream": 10_000, "burst": 2_000}
+
+
+def _timed(fn, repeat):
+    """Лучшее время из repeat прогонов fn() (сек)."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _result(ops, seconds, **extra):
+    return {"throughput": ops / seconds, "latency_us": seconds / ops * 1e6, **extra}
+
+
+def _size_label(n):
+    return f"{n // 1000}k" if n >= 1000 else str(n)
+
+
+def _selected(name, only):
+    """Фильтр --only проверяется до подготовки данных и замера, а не по готовым результатам."""
+    return not only or only in name
+
+
+# --- замеры ---
+
+def bench_batch_indicators(sizes, repeat, only=None):
+    from indicators.tema import calculate_tema_lines
+    from indicators.adx import calculate_adx
+    from indicators.cmo import calculate_cmo
+    from indicators.ema_slope import calculate_rolling_ema_slope
+    results = {}
+    for n in sizes["candles"]:
+        label = _size_label(n)
+        cases = {
+            f"tema_lines_{label}": lambda df: calculate_tema_lines(df["close"]),
+            f"adx_{label}": lambda df: calculate_adx(df),
+            f"cmo_{label}": lambda df: calculate_cmo(df["close"]),
+            f"ema_slope_{label}": lambda df: calculate_rolling_ema_slope(df["close"]),
+        }
+        cases = {name: fn for name, fn in cases.items() if _selected(name, only)}
+        if not cases:
+            continue
+        df = synthetic_ohlcv(n, seed=n)
+        for name, fn in cases.items():
+            results[name] = _result(1, _timed(lambda: fn(df), repeat))
+    return results
+
+
+def bench_check_signal(sizes, repeat, only=None):
+    from strategies.tema_adx_cmo import check_signal
+    n_symbols, n_candles = sizes["universe"]
+    name = f"check_signal_{n_symbols}x{_size_label(n_candles)}"
+    if not _selected(name, only):
+        return {}
+    universe = synthetic_universe(n_symbols, n_candles)
+    frames = list(universe.values())
+
+    def run():
+        for df in frames:
+            check_signal(df)
+    return {name: _result(n_symbols, _timed(run, repeat))}
+
+
+def bench_vectorized_universe(sizes, repeat, only=None):
+    from indicators.vectorized import stack_universe, compute_universe_indicators
+    from strategies.tema_adx_cmo import check_signal_vectorized
+    n_symbols, n_candles = sizes["universe"]
+    label = f"{n_symbols}x{_size_label(n_candles)}"
+    names = [f"universe_indicators_{label}", f"check_signal_vectorized_{label}"]
+    if not any(_selected(name, only) for name in names):
+        return {}
+    _, m = stack_universe(synthetic_universe(n_symbols, n_candles))
+    indicators = compute_universe_indicators(m["high"], m["low"], m["close"])
+    results = {}
+    if _selected(names[0], only):
+        results[names[0]] = _result(
+            n_symbols, _timed(lambda: compute_universe_indicators(m["high"], m["low"], m["close"]), repeat)
+        )
+    if _selected(names[1], only):
+        results[names[1]] = _result(n_symbols, _timed(lambda: check_signal_vectorized(indicators), repeat))
+    return results
+
+
+def bench_streaming_update(sizes, repeat, only=None):
+    from indicators.streaming import SymbolIndicators
+    n = sizes["stream"]
+    name = f"streaming_update_{_size_label(n)}"
+    if not _selected(name, only):
+        return {}
+    df = synthetic_ohlcv(n, seed=7)
+    highs, lows, closes = df["high"].tolist(), df["low"].tolist(), df["close"].tolist()
+
+    def run():
+        state = SymbolIndicators()
+        for h, l, c in zip(highs, lows, closes):
+            state.update(h, l, c)
+    return {name: _result(n, _timed(run, repeat))}
+
+
+def bench_ws_burst(sizes, repeat, only=None):
+    """Пачка сообщений через декодер и таблицу маршрутизации collector (ring-буферы + постановка в очередь записи)."""
+    import core.websocket_collector as collector
+    n = sizes["burst"]
+    name = f"ws_burst_{_size_label(n)}"
+    if not _selected(name, only):
+        return {}
+    symbols = [f"SYN{i:04d}USDT" for i in range(500)]
+    messages = synthetic_ws_messages(symbols, n, book_depth=collector.ORDERBOOK_DEPTH)
+    tmp = tempfile.mkdtemp(prefix="bench_ws_")
+    saved = {name: getattr(collector, name) for name in
+             ("KLINE_CSV_PATH", "TICKER_CSV_PATH", "TRADE_CSV_PATH", "ORDERBOOK_CSV_PATH")}
+    try:
+        for attr in saved:
+            path = os.path.join(tmp, attr.lower())
+            os.makedirs(path)
+            setattr(collector, attr, path)
+        collector.setup_tickers(symbols)
+        _, dispatch = collector.build_subscriptions(symbols, "60")
+        decode, handle_message = collector.decode, collector.handle_message
+        per_message = np.empty(n)
+
+        def run():
+            for k, raw in enumerate(messages):
+                started = time.perf_counter()
+                handle_message(decode(raw), dispatch)
+                per_message[k] = time.perf_counter() - started
+
+        seconds = _timed(run, repeat)
+        return {name: _result(n, seconds, p99_us=float(np.percentile(per_message, 99) * 1e6))}
+    finally:
+        collector.persistence.stop()
+        collector.tickers = None
+        for attr, value in saved.items():
+            setattr(collector, attr, value)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_orderbook(sizes, repeat, only=None):
+    """Применение delta к L2-стаканам (orderbook.50) по 500 символам."""
+    from core.orderbook import L2Book
+    n = sizes["burst"]
+    name = f"orderbook_apply_{_size_label(n)}"
+    if not _selected(name, only):
+        return {}
+    symbols = [f"SYN{i:04d}USDT" for i in range(500)]
+    messages = [json.loads(raw) for raw in synthetic_ws_messages(symbols, n, mix=(0, 0, 0, 1), book_depth=50)]
+
+    def run():
+        books = {s: L2Book(s, 50) for s in symbols}
+        for msg in messages:
+            books[msg["data"]["s"]].apply(msg["type"], msg["data"], msg["ts"])
+    return {name: _result(n, _timed(run, repeat))}
+
+
+def bench_ticker_apply(sizes, repeat, only=None):
+    """Применение snapshot/delta тикеров к типизированной таблице по 500 символам."""
+    from core.ticker_state import TickerTable
+    n = sizes["burst"]
+    name = f"ticker_apply_{_size_label(n)}"
+    if not _selected(name, only):
+        return {}
+    symbols = [f"SYN{i:04d}USDT" for i in range(500)]
+    messages = [json.loads(raw) for raw in synthetic_ws_messages(symbols, n, mix=(0, 1, 0, 0))]
+    table = TickerTable.local(symbols)
+
+    def run():
+        for msg in messages:
+            table.apply(msg["data"]["symbol"], msg["data"], msg["ts"])
+    return {name: _result(n, _timed(run, repeat))}
+
+
+def bench_trade_bars(sizes, repeat, only=None):
+    """Агрегация ленты сделок в бары (1с / объём / оборот) по одному символу."""
+    from core.trade_bars import TradeAggregator
+    n = sizes["stream"]
+    name = f"trade_bars_{_size_label(n)}"
+    if not _selected(name, only):
+        return {}
+    rng = np.random.default_rng(3)
+    trades = list(zip(
+        (np.cumsum(rng.integers(0, 300, n)) + 1_700_000_000_000).tolist(),
+        (100 * np.exp(np.cumsum(rng.normal(0, 1e-4, n)))).tolist(),
+        rng.lognormal(0, 1, n).tolist(),
+        rng.choice([1, -1], n).tolist(),
+    ))
+
+    def run():
+        agg = TradeAggregator("SYN0000USDT", 1000, 50.0, 20_000.0)
+        for trade in trades:
+            agg.on_trade(*trade)
+    return {name: _result(n, _timed(run, repeat))}
+
+
+BENCHMARKS = [
+    bench_batch_indicators,
+    bench_check_signal,
+    bench_vectorized_universe,
+    bench_streaming_update,
+    bench_ws_burst,
+    bench_orderbook,
+    bench_ticker_apply,
+    bench_trade_bars,
+]
+
+
+# --- baseline ---
+
+def compare(results, baseline, threshold):
+    """Список регрессий: (замер, метрика, было, стало)."""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        if current["throughput"] < base["throughput"] * (1 - threshold):
+            regressions.append((name, "throughput", base["throughput"], current["throughput"]))
+        if "p99_us" in base and "p99_us" in current and current["p99_us"] > base["p99_us"] * (1 + threshold):
+            regressions.append((name, "p99_us", base["p99_us"], current["p99_us"]))
+    return regressions
+
+
+def _meta(quick):
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "quick": quick,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def _parse_args(args):
+    options = {"--quick": False, "--save": False, "--only": None, "--repeat": "3", "--threshold": "0.25",
+               "--baseline": DEFAULT_BASELINE}
+    while args:
+        key = args.pop(0)
+        if key in ("--quick", "--save"):
+            options[key] = True
+        elif key in options and args:
+            options[key] = args.pop(0)
+        else:
+            print("Использование: python -m benchmarks.bench [--save] [--quick] [--only <подстрока>] "
+                  "[--repeat 3] [--threshold 0.25] [--baseline benchmarks/baseline.json]")
+            sys.exit(2)
+    return options
+
+
+def main(args):
+    opts = _parse_args(args)
+    sizes = QUICK_SIZES if opts["--quick"] else FULL_SIZES
+    repeat = int(opts["--repeat"])
+    threshold = float(opts["--threshold"])
+
+    results = {}
+    for bench in BENCHMARKS:
+        for name, result in bench(sizes, repeat, opts["--only"]).items():
+            results[name] = result
+            p99 = f"  p99={result['p99_us']:.1f} мкс" if "p99_us" in result else ""
+            print(f"[BENCH] {name:<36} {result['throughput']:>14,.1f} оп/с  {result['latency_us']:>12,.1f} мкс/оп{p99}")
+
+    if opts["--save"]:
+        with open(opts["--baseline"], "w") as f:
+            json.dump({"meta": _meta(opts["--quick"]), "results": results}, f, indent=2)
+        print(f"[BENCH] Baseline записан в {opts['--baseline']}")
+        return 0
+
+    if not os.path.exists(opts["--baseline"]):
+        print(f"[BENCH] Нет baseline ({opts['--baseline']}) — сравнивать не с чем, запустите с --save")
+        return 0
+    with open(opts["--baseline"]) as f:
+        baseline = json.load(f)
+    if baseline.get("meta", {}).get("quick") != opts["--quick"]:
+        print("[BENCH] ⚠️ Baseline записан с другими размерами (--quick) — часть замеров не сравнивается")
+    regressions = compare(results, baseline, threshold)
+    for name, metric, before, after in regressions:
+        print(f"[BENCH] ❌ Регрессия {name}.{metric}: {before:,.1f} -> {after:,.1f}")
+    if regressions:
+        return 1
+    print(f"[BENCH] ✅ Регрессий нет (порог {threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
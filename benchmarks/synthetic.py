@@ -0,0 +1,106 @@
+import json
+import numpy as np
+import pandas as pd
+
+# Детерминированные синтетические данные для бенчмарков: OHLCV (геометрическое блуждание)
+# и поток WS-сообщений Bybit v5 (kline / tickers / publicTrade / orderbook.1) в формате биржи.
+# Одинаковый seed — одинаковые данные на любой машине, поэтому замеры сравнимы с baseline.
+
+START_TS = 1_700_000_000  # сек
+
+
+def synthetic_ohlcv(n_candles, seed=0, interval=3600, start_price=100.0):
+    """DataFrame [timestamp, open, high, low, close, volume, turnover] из n_candles свечей."""
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(0, 0.01, n_candles)))
+    open_ = np.concatenate(([start_price], close[:-1]))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, n_candles)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, n_candles)))
+    volume = rng.lognormal(8, 1, n_candles)
+    return pd.DataFrame({
+        "timestamp": START_TS + np.arange(n_candles, dtype=np.int64) * interval,
+        "open": open_,
+        "high": high,
+        "low": low,
+        "close": close,
+        "volume": volume,
+        "turnover": volume * close,
+    })
+
+
+def synthetic_universe(n_symbols, n_candles, seed=0):
+    """{symbol: DataFrame} — вселенная из n_symbols пар с n_candles свечами."""
+    return {f"SYN{i:04d}USDT": synthetic_ohlcv(n_candles, seed=seed + i) for i in range(n_symbols)}
+
+
+def _book_levels(price, n, step, sign, rng):
+    return [[f"{price * (1 + sign * step * (i + 1)):.4f}", f"{rng.uniform(1, 20):.1f}"] for i in range(n)]
+
+
+def synthetic_ws_messages(symbols, n_messages, seed=0, interval="60", mix=(0.1, 0.3, 0.4, 0.2), book_depth=50,
+                          rate=10_000):
+    """
+    n_messages сырых JSON-строк публичного WS Bybit v5 по symbols; биржевые ts идут с темпом rate сообщений/сек.
+    mix — доли kline / tickers / publicTrade / orderbook.<book_depth> в потоке.
+    По каждому символу первым приходит tickers snapshot, дальше — delta;
+    стакан — snapshot на book_depth уровней, дальше delta с непрерывным u (для orderbook.1 — только snapshot).
+    """
+    rng = np.random.default_rng(seed)
+    kinds = rng.choice(4, size=n_messages, p=np.asarray(mix) / sum(mix))
+    picks = rng.integers(0, len(symbols), size=n_messages)
+    moves = rng.normal(0, 0.001, size=n_messages)
+    prices = {s: 100.0 for s in symbols}
+    ticker_seen = set()
+    book_u = {}
+    messages = []
+    for k in range(n_messages):
+        symbol = symbols[picks[k]]
+        price = prices[symbol] = prices[symbol] * (1 + moves[k])
+        ts = START_TS * 1000 + k * 1000 // rate
+        kind = kinds[k]
+        if kind == 0:
+            start = ts - ts % (int(interval) * 60_000)
+            msg = {"topic": f"kline.{interval}.{symbol}", "type": "snapshot", "ts": ts, "data": [{
+                "start": start, "end": start + int(interval) * 60_000 - 1, "interval": interval,
+                "open": f"{price:.4f}", "close": f"{price:.4f}", "high": f"{price * 1.001:.4f}",
+                "low": f"{price * 0.999:.4f}", "volume": "1234.5", "turnover": f"{1234.5 * price:.2f}",
+                "confirm": bool(k % 50 == 0), "timestamp": ts,
+            }]}
+        elif kind == 1:
+            if symbol not in ticker_seen:
+                ticker_seen.add(symbol)
+                data = {"symbol": symbol, "tickDirection": "PlusTick", "price24hPcnt": "0.01",
+                        "lastPrice": f"{price:.4f}", "prevPrice24h": "99.0", "highPrice24h": "105.0",
+                        "lowPrice24h": "95.0", "prevPrice1h": "100.0", "markPrice": f"{price:.4f}",
+                        "indexPrice": f"{price:.4f}", "openInterest": "1000", "openInterestValue": "100000",
+                        "turnover24h": "1000000", "volume24h": "10000", "nextFundingTime": str(ts + 3_600_000),
+                        "fundingRate": "0.0001", "bid1Price": f"{price * 0.9999:.4f}", "bid1Size": "10",
+                        "ask1Price": f"{price * 1.0001:.4f}", "ask1Size": "12"}
+                msg = {"topic": f"tickers.{symbol}", "type": "snapshot", "ts": ts, "cs": k, "data": data}
+            else:
+                msg = {"topic": f"tickers.{symbol}", "type": "delta", "ts": ts, "cs": k, "data": {
+                    "symbol": symbol, "lastPrice": f"{price:.4f}", "markPrice": f"{price:.4f}",
+                    "bid1Price": f"{price * 0.9999:.4f}", "ask1Price": f"{price * 1.0001:.4f}",
+                }}
+        elif kind == 2:
+            msg = {"topic": f"publicTrade.{symbol}", "type": "snapshot", "ts": ts, "data": [{
+                "T": ts, "s": symbol, "S": "Buy" if moves[k] > 0 else "Sell", "v": "0.5", "p": f"{price:.4f}",
+                "L": "PlusTick", "i": f"trade-{k}", "BT": False,
+            }]}
+        else:
+            u = book_u.get(symbol)
+            if u is None or book_depth == 1:
+                book_u[symbol] = k + 1
+                data = {"s": symbol, "b": _book_levels(price, book_depth, 1e-4, -1, rng),
+                        "a": _book_levels(price, book_depth, 1e-4, 1, rng), "u": k + 1, "seq": k}
+                msg_type = "snapshot"
+            else:
+                book_u[symbol] = u + 1
+                level = int(rng.integers(0, book_depth))
+                size = "0" if rng.random() < 0.3 else f"{rng.uniform(1, 20):.1f}"
+                data = {"s": symbol, "b": [[f"{price * (1 - 1e-4 * (level + 1)):.4f}", size]],
+                        "a": [[f"{price * (1 + 1e-4 * (level + 1)):.4f}", size]], "u": u + 1, "seq": k}
+                msg_type = "delta"
+            msg = {"topic": f"orderbook.{book_depth}.{symbol}", "type": msg_type, "ts": ts, "data": data, "cts": ts}
+        messages.append(json.dumps(msg))
+    return messages
@@ -14,6 +14,21 @@ TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")
 # Общий таймфрейм для всех модулей
 TIMEFRAME = "1h"
 
+# Старшие таймфреймы из одного потока 1m (core.resampler): например ["5m", "15m", "1h", "4h", "1d"].
+# Пусто — collector подписан на TIMEFRAME напрямую
+RESAMPLE_TIMEFRAMES = []
+
+# Сколько последних свечей на символ хранится в shared memory между collector и стратегией
+SHARED_CANDLES_CAPACITY = 1000
+
+# Планировщик стратегии: проверка сигналов по закрытию свечи (confirm)
+CANDLE_CLOSE_POLL_INTERVAL = 0.005  # как часто (сек) проверять закрытие свечей в shared memory
+INTRABAR_CHECK_INTERVAL = 0  # проверка по формирующейся свече раз в N секунд (0 — выключено)
+
+# Замеры задержек по этапам (core.latency): сводка в лог раз в N секунд и JSON-endpoint на 127.0.0.1
+LATENCY_REPORT_INTERVAL = 60  # 0 — не печатать сводку
+LATENCY_METRICS_PORT = 0  # порт стратегии (collector — порт + 1); 0 — endpoint выключен
+
 TP_LEVELS = [2.0, 2.5, 5.0]  # Take Profit уровни в %
 TP_PERCENTAGES = [60, 20, 20]  # Проценты от позиции на каждом TP
 
@@ -23,9 +38,50 @@ TRAILING_STOP_ACTIVATION_PERCENT = 2.0  # Процент движения в п
 TRAILING_STOP_PERCENT = 3.5  # Шаг трейлинг-стопа в %
 
 LEVERAGE = 1
+FAST_ENTRY_ENABLED = False  # opt-in: open_trade идёт через open_trade_fast (SL в самом ордере, TP одним batch,
+                           # исполнение из приватного WS; трейлинг по TRAILING_STOP_*, аргументы trailing_* не учитываются)
+FILL_WAIT_TIMEOUT = 2.0  # сколько (сек) ждать исполнения рыночного ордера в execution-стриме
 TRADE_AMOUNT = 6.0   # сумма в $
 DEPOSIT = 100
 
+#-----REST-----
+REST_BASE_URL = "https://api.bybit.com"
+REST_IP_RATE_LIMIT = 100  # запросов в секунду на IP (лимит Bybit — 600 за 5 секунд, оставляем запас)
+REST_MAX_CONNECTIONS = 20  # размер keep-alive пула соединений
+REST_MAX_RETRIES = 5  # повторы с экспоненциальной задержкой и jitter
+INSTRUMENTS_CACHE_TTL = 3600  # как часто (сек) обновлять справочник инструментов (tickSize, qtyStep, плечо)
+PRIVATE_STATE_RECONCILE_INTERVAL = 60  # сверка позиций/ордеров из приватного WS с REST раз в N секунд
+
+#-----WEBSOCKET-----
+WS_DEBUG_SAMPLE = 0  # печатать каждое N-е сырое сообщение публичного WS (0 — не печатать)
+WS_RATE_REPORT_INTERVAL = 60  # печать счётчика сообщений/сек collector раз в N секунд (0 — выключено)
+WS_SHARD_SYMBOLS = 50  # пар на одно соединение публичного WS (4 топика на пару); 0 — всё в одном соединении
+WS_SUBSCRIBE_BATCH = 10  # топиков в одном запросе subscribe
+WS_PROCESSES = 1  # процессов collector; шарды раздаются процессам по кругу
+WS_STALE_TIMEOUT = 30  # шард без сообщений дольше N секунд переподключается (0 — по длительности свечи)
+ORDERBOOK_DEPTH = 50  # глубина стакана в подписке: 1, 50 или 200 (orderbook.<N>)
+ORDERBOOK_RECORD_INTERVAL_MS = 1000  # строка истории стакана (лучшие цены, глубина, дисбаланс) не чаще раза в N мс на символ
+ORDERBOOK_RECORD_LEVELS = 10  # по скольким уровням считать глубину и дисбаланс в истории
+TRADE_BAR_INTERVAL_MS = 1000  # бары ленты сделок по времени, мс (0 — выключено)
+TRADE_BAR_FLUSH_GRACE_MS = 500  # тихий бар по времени закрывается по часам только через N мс после конца интервала (задержка ленты)
+TRADE_DOLLAR_BAR = 100_000  # dollar-бары: закрытие по обороту в USDT (0 — выключено)
+TRADE_VOLUME_BAR_SIZES = {}  # бары по объёму: { "BTCUSDT": 5.0, ... } в монетах — порог у каждой пары свой
+TRADE_RAW_CSV = False  # писать в CSV каждую сделку (иначе — только бары)
+TICKER_MAX_AGE = 5  # тикер из WS-таблицы старше N секунд считается устаревшим (трейдер берёт цену по REST)
+WS_CONTROL_POLL_INTERVAL = 0.5  # как часто collector проверяет команды подписки/отписки от основного процесса, сек
+
+#-----ВСЕЛЕННАЯ-----
+UNIVERSE_CHECK_INTERVAL = 60  # пересчёт состава вселенной по объёмам из потока тикеров раз в N секунд (0 — состав не меняется)
+UNIVERSE_SNAPSHOT_INTERVAL = 900  # повторный снимок тикеров REST (листинги, делистинги, объёмы пар вне вселенной) раз в N секунд
+UNIVERSE_DROP_RATIO = 0.8  # пара выходит из вселенной при объёме ниже MIN_VOLUME24H * N (гистерезис)
+UNIVERSE_SPARE_SLOTS = 50  # запасные слоты shared memory под новые листинги без перезапуска
+
+#-----СТАРТ-----
+STARTUP_SUBSCRIBE_BUDGET = 5.0  # бюджет времени от старта до первой подписки WS, сек (в боте превышение — только
+                                # предупреждение [STARTUP]; падающая проверка — tests/test_startup.py)
+CLOCK_SYNC_SAMPLES = 3  # запросов времени сервера Bybit для замера смещения часов (берётся минимальный RTT)
+CLOCK_MAX_OFFSET_MS = 500  # смещение часов больше N мс — предупреждение о настройке NTP
+
 #-----ИНДИКАТОРЫ-----
 # Периоды для трёх TEMA линий (можно менять)
 TEMA_PERIODS = [8, 14, 21]
@@ -52,3 +108,6 @@ TEMA_ADX_THRESHOLD_SHORT = 25  # Пример: ADX <= 25 для шорта
 
 TEMA_CMO_THRESHOLD_LONG = 0   # Пример: CMO > 20 для лонга
 TEMA_CMO_THRESHOLD_SHORT = 0 # Пример: CMO < -20 для шорта
+
+#-----БЭКТЕСТ-----
+BACKTEST_FEE_PERCENT = 0.055  # комиссия на вход и на выход, % от объёма (taker Bybit)
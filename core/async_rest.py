@@ -0,0 +1,208 @@
+import time
+import random
+import asyncio
+import threading
+import aiohttp
+from config import REST_BASE_URL, REST_IP_RATE_LIMIT, REST_MAX_CONNECTIONS, REST_MAX_RETRIES
+
+# Общий асинхронный REST-клиент Bybit для массовых загрузок (история, сканер свечей).
+# - один aiohttp.ClientSession с keep-alive пулом соединений на весь процесс;
+# - token bucket на IP (лимит Bybit 600 запросов / 5 сек) и отдельный bucket на каждый endpoint,
+#   который подстраивается под заголовки X-Bapi-Limit / X-Bapi-Limit-Status / X-Bapi-Limit-Reset-Timestamp;
+# - повторы с экспоненциальной задержкой и jitter на сетевые ошибки, 403/429/5xx и retCode лимитов.
+#   Остальные HTTP-ошибки (400/401/404...) — исключение сразу, без повторов.
+# Клиент живёт в собственном event loop в фоновом потоке: из async-кода вызываются *_async методы
+# (через run()), из синхронного — методы с сигнатурой pybit (get_kline, get_tickers).
+
+RETRY_RET_CODES = {10000, 10006, 10016}  # server timeout, too many visits, server error
+RETRY_HTTP_STATUSES = {403, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Token bucket для одного event loop: rate токенов в секунду, запас до capacity."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def block_for(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def set_rate(self, rate):
+        if rate > 0 and rate != self.rate:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+            self.capacity = float(rate)
+            self.tokens = min(self.tokens, self.capacity)
+
+
+class BybitAsyncClient:
+    def __init__(self, base_url=REST_BASE_URL, ip_rate=REST_IP_RATE_LIMIT,
+                 max_connections=REST_MAX_CONNECTIONS, max_retries=REST_MAX_RETRIES, timeout=10):
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.ip_bucket = TokenBucket(ip_rate)
+        self.endpoint_buckets = {}
+        self.ip_rate = ip_rate
+        self.stats = {"requests": 0, "retries": 0, "errors": 0}
+        self._session = None
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    # --- event loop в фоновом потоке ---
+
+    def _ensure_loop(self):
+        if self._loop is not None:
+            return
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=loop.run_forever, name="bybit-async-rest", daemon=True)
+            self._thread.start()
+            self._loop = loop
+
+    def run(self, coro):
+        """Выполняет корутину в loop клиента и ждёт результат (для вызова из синхронного кода)."""
+        self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def close(self):
+        if self._loop is None:
+            return
+        if self._session is not None:
+            self.run(self._session.close())
+            self._session = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+        self._loop = None
+        self._thread = None
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                base_url=self.base_url,
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    # --- лимиты ---
+
+    def _bucket(self, path):
+        bucket = self.endpoint_buckets.get(path)
+        if bucket is None:
+            bucket = self.endpoint_buckets[path] = TokenBucket(self.ip_rate)
+        return bucket
+
+    def _apply_limit_headers(self, bucket, headers):
+        """Подстройка под X-Bapi-Limit* (лимит за секунду, остаток, время сброса окна в мс)."""
+        limit = headers.get("X-Bapi-Limit")
+        remaining = headers.get("X-Bapi-Limit-Status")
+        reset_ms = headers.get("X-Bapi-Limit-Reset-Timestamp")
+        try:
+            if limit:
+                bucket.set_rate(float(limit))
+            if remaining is not None and reset_ms and int(remaining) <= 1:
+                bucket.block_for(max(0.0, int(reset_ms) / 1000 - time.time()))
+        except ValueError:
+            pass
+
+    def _backoff(self, attempt, base=0.25, cap=10.0):
+        # full jitter
+        return random.uniform(0, min(cap, base * 2 ** attempt))
+
+    # --- запросы ---
+
+    async def get_async(self, path, params=None):
+        params = {k: str(v) for k, v in (params or {}).items() if v is not None}
+        bucket = self._bucket(path)
+        session = await self._get_session()
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            await self.ip_bucket.acquire()
+            await bucket.acquire()
+            self.stats["requests"] += 1
+            try:
+                async with session.get(path, params=params) as resp:
+                    self._apply_limit_headers(bucket, resp.headers)
+                    if resp.status in RETRY_HTTP_STATUSES:
+                        last_error = f"HTTP {resp.status}"
+                        if resp.status in (403, 429):
+                            # Превышен IP-лимит: притормаживаем весь клиент
+                            self.ip_bucket.block_for(self._backoff(attempt, base=1.0, cap=30.0))
+                    else:
+                        resp.raise_for_status()
+                        data = await resp.json(content_type=None)
+                        if data.get("retCode") in RETRY_RET_CODES:
+                            last_error = f"retCode {data.get('retCode')}: {data.get('retMsg')}"
+                        else:
+                            return data
+            except aiohttp.ClientResponseError as e:
+                # raise_for_status: статусы вне RETRY_HTTP_STATUSES (400/401/404...) повтор не исправит
+                self.stats["errors"] += 1
+                raise RuntimeError(f"[REST] {path} {params}: HTTP {e.status} {e.message}") from e
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = repr(e)
+            if attempt < self.max_retries:
+                self.stats["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt))
+        self.stats["errors"] += 1
+        raise RuntimeError(f"[REST] {path} {params}: не удалось после {self.max_retries + 1} попыток ({last_error})")
+
+    async def get_kline_async(self, **params):
+        return await self.get_async("/v5/market/kline", params)
+
+    async def get_tickers_async(self, **params):
+        return await self.get_async("/v5/market/tickers", params)
+
+    async def get_server_time_async(self):
+        return await self.get_async("/v5/market/time")
+
+    # --- синхронные методы с сигнатурой pybit HTTP ---
+
+    def get_kline(self, **params):
+        return self.run(self.get_kline_async(**params))
+
+    def get_tickers(self, **params):
+        return self.run(self.get_tickers_async(**params))
+
+    def get_server_time(self):
+        return self.run(self.get_server_time_async())
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_client():
+    """Единый клиент на процесс — общий пул соединений и общий бюджет лимитов."""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = BybitAsyncClient()
+        return _shared_client
@@ -0,0 +1,431 @@
+import os
+import sys
+import csv
+import time
+import numpy as np
+import pandas as pd
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from core.columnar_store import ColumnarStore, DEFAULT_ROOT
+from core.ohlcv import format_interval
+from indicators.vectorized import tema_matrix, adx_matrix, cmo_matrix
+from strategies.tema_adx_cmo import check_signal_vectorized, SIGNAL_NAMES
+import config
+
+# Бэктест стратегии TEMA/ADX/CMO по сохранённой истории.
+# Индикаторы считаются векторизованно один раз на пачку символов (символы × свечи),
+# сигналы — той же check_signal_vectorized, что и в живой торговле, по каждой закрытой свече.
+# Выход из позиции моделируется как в BybitTrader: частичные TP (TP_LEVELS / TP_PERCENTAGES),
+# SL_PERCENT и трейлинг-стоп (TRAILING_STOP_ACTIVATION_PERCENT / TRAILING_STOP_PERCENT от цены входа).
+# Пачки символов распределяются по пулу процессов; каждый процесс сам читает свои символы
+# из хранилища (memmap), между процессами передаются только списки символов и сделки.
+#
+# Допущения: вход по close сигнальной свечи (стратегия проверяется по закрытию свечи и входит рынком),
+# одна позиция на символ, внутри свечи сначала проверяется стоп, потом TP (консервативно),
+# стоп и TP исполняются по своей цене.
+#
+# python -m core.backtest [--source store|klines|<каталог с *_history.csv>] [--interval 1h]
+#                         [--root market_data] [--processes N] [--trades trades.csv]
+
+
+def exit_model(tp_levels, tp_percentages, sl_percent, trailing_activation_percent, trailing_percent,
+               fee_percent=None, notional=None):
+    """Параметры выхода из позиции (доли TP нормируются: последний TP закрывает остаток)."""
+    fractions = [p / 100 for p in list(tp_percentages)[:len(tp_levels)]]
+    if fractions:
+        fractions[-1] = max(0.0, 1.0 - sum(fractions[:-1]))
+    return {
+        "tp_levels": list(tp_levels),
+        "tp_fractions": fractions,
+        "sl_percent": sl_percent,
+        "trailing_activation_percent": trailing_activation_percent,
+        "trailing_percent": trailing_percent,
+        "fee_percent": config.BACKTEST_FEE_PERCENT if fee_percent is None else fee_percent,
+        "notional": config.TRADE_AMOUNT * config.LEVERAGE if notional is None else notional,
+    }
+
+
+def exit_model_from_config():
+    return exit_model(
+        config.TP_LEVELS, config.TP_PERCENTAGES, config.SL_PERCENT,
+        config.TRAILING_STOP_ACTIVATION_PERCENT if config.USE_TRAILING_STOP else 0,
+        config.TRAILING_STOP_PERCENT,
+    )
+
+
+# --- загрузка свечей ---
+
+def list_symbols(source="store", interval=config.TIMEFRAME, root=DEFAULT_ROOT):
+    if source == "store":
+        return ColumnarStore(root).keys(f"history_{format_interval(interval)}")
+    if source == "klines":
+        return ColumnarStore(root).keys("klines")
+    symbols = []
+    for filename in sorted(os.listdir(source)):
+        if filename.endswith("_history.csv"):
+            symbol, file_interval = filename[:-len("_history.csv")].rsplit("_", 1)
+            if file_interval in (interval, format_interval(interval)):
+                symbols.append(symbol)
+    return symbols
+
+
+def load_candles(symbol, source="store", interval=config.TIMEFRAME, root=DEFAULT_ROOT):
+    """{timestamp, high, low, close} numpy-массивы по возрастанию времени."""
+    columns = ["timestamp", "high", "low", "close"]
+    if source in ("store", "klines"):
+        dataset = f"history_{format_interval(interval)}" if source == "store" else "klines"
+        data = ColumnarStore(root).read(dataset, symbol, columns)
+        return {name: np.asarray(data[name]) for name in columns} if data else None
+    for file_interval in (interval, format_interval(interval)):
+        path = os.path.join(source, f"{symbol}_{file_interval}_history.csv")
+        if os.path.exists(path):
+            df = pd.read_csv(path, usecols=columns).drop_duplicates("timestamp", keep="last").sort_values("timestamp")
+            return {name: df[name].to_numpy() for name in columns}
+    return None
+
+
+def stack_candles(candles):
+    """{symbol: колонки} -> матрицы (символы × свечи), выровненные по правому краю и дополненные NaN слева."""
+    length = max(len(c["close"]) for c in candles.values())
+    matrices = {}
+    for col in ("high", "low", "close"):
+        m = np.full((len(candles), length), np.nan, dtype=np.float64)
+        for i, c in enumerate(candles.values()):
+            m[i, length - len(c[col]):] = c[col]
+        matrices[col] = m
+    return matrices
+
+
+# --- симуляция сделок ---
+
+def simulate_symbol(symbol, timestamp, high, low, close, signals, model, outcomes=None):
+    """
+    Проход по сигналам одного символа; возвращает список сделок (dict).
+    outcomes — готовые exit_outcomes по направлениям {1: ..., -1: ...} (оптимизатор считает их один раз
+    на модель выхода); без них каждая позиция моделируется пошагово только для реальных входов.
+    """
+    ts = timestamp.tolist()
+    trades = []
+    if outcomes is not None:
+        for i, d in walk_signals(signals, outcomes):
+            o = outcomes[d]
+            trades.append(_trade_record(symbol, ts, close, i, d, int(o["exit_bar"][i]), float(o["pnl_percent"][i]),
+                                        EXIT_REASONS[o["reason"][i]], int(o["tp_hits"][i]), model))
+        return trades
+    h, l, c = high.tolist(), low.tolist(), close.tolist()
+    next_allowed = 0
+    for i in np.flatnonzero(signals[:-1]).tolist():
+        if i < next_allowed:
+            continue
+        d = int(signals[i])
+        t = _simulate_position(i, d, h, l, c, model)
+        trades.append(_trade_record(symbol, ts, close, i, d, t["exit_bar"], t["pnl_percent"],
+                                    t["exit_reason"], t["tp_hits"], model))
+        # Новая позиция возможна по сигналу на закрытии свечи выхода
+        next_allowed = t["exit_bar"]
+    return trades
+
+
+def _trade_record(symbol, ts, close, i, d, exit_bar, pnl_percent, reason, tp_hits, model):
+    return {
+        "symbol": symbol,
+        "side": SIGNAL_NAMES[d],
+        "entry_ts": int(ts[i]),
+        "exit_ts": int(ts[exit_bar]),
+        "entry_price": float(close[i]),
+        "exit_bar": exit_bar,
+        "bars": exit_bar - i,
+        "tp_hits": tp_hits,
+        "exit_reason": reason,
+        "pnl_percent": pnl_percent,
+        "pnl_usd": pnl_percent / 100 * model["notional"],
+    }
+
+
+def walk_signals(signals, outcomes):
+    """
+    Последовательность входов при одной позиции на символ: [(бар входа, направление)].
+    Новая позиция возможна по сигналу на закрытии свечи выхода предыдущей.
+    """
+    entries = np.flatnonzero(signals[:-1]).tolist()
+    directions = signals.tolist()
+    exit_bars = {1: outcomes[1]["exit_bar"], -1: outcomes[-1]["exit_bar"]}
+    result = []
+    k = 0
+    while k < len(entries):
+        i = entries[k]
+        d = directions[i]
+        result.append((i, d))
+        k = bisect_left(entries, int(exit_bars[d][i]), k + 1)
+    return result
+
+
+EXIT_REASONS = ("end", "sl", "trailing", "tp")
+_END, _SL, _TRAILING, _TP = range(4)
+
+
+def exit_outcomes(high, low, close, model, d, entries=None, window=64, max_window=4096):
+    """
+    Исход позиции направления d (1 — long, -1 — short), открытой на close каждой свечи, по модели выхода.
+    Считается векторизованно сразу для всех свечей entries (по умолчанию — для всех) окнами вперёд
+    (window, затем ×8 для нерешённых); результат совпадает с пошаговой _simulate_position.
+    Возвращает {"exit_bar", "pnl_percent", "reason" (индекс EXIT_REASONS), "tp_hits"} массивами длины n.
+    """
+    n = len(close)
+    out = {
+        "exit_bar": np.full(n, n - 1, dtype=np.int64),
+        "pnl_percent": np.full(n, np.nan),
+        "reason": np.zeros(n, dtype=np.int8),
+        "tp_hits": np.zeros(n, dtype=np.int8),
+    }
+    pending = np.arange(max(n - 1, 0)) if entries is None else np.asarray(entries, dtype=np.int64)
+    pending = pending[pending < n - 1]
+    while len(pending) and window <= max_window:
+        pending = _resolve_window(pending, window, high, low, close, model, d, out)
+        window *= 8
+    if len(pending):
+        h, l, c = high.tolist(), low.tolist(), close.tolist()
+        for i in pending.tolist():
+            trade = _simulate_position(i, d, h, l, c, model)
+            out["exit_bar"][i] = trade["exit_bar"]
+            out["pnl_percent"][i] = trade["pnl_percent"]
+            out["reason"][i] = EXIT_REASONS.index(trade["exit_reason"])
+            out["tp_hits"][i] = trade["tp_hits"]
+    return out
+
+
+def _first_true(mask):
+    """Индекс первого True по строке; mask.shape[1], если нет."""
+    hit = mask.any(axis=1)
+    return np.where(hit, mask.argmax(axis=1), mask.shape[1])
+
+
+def _resolve_window(entries, window, high, low, close, model, d, out):
+    """Решает позиции, закрывшиеся в пределах window свечей после входа; возвращает нерешённые входы."""
+    n = len(close)
+    cols = entries[:, None] + 1 + np.arange(window)[None, :]
+    valid = cols < n
+    cols = np.minimum(cols, n - 1)
+    # В «знаковом» пространстве (цены × d) short считается как long
+    fav = np.where(valid, d * (high if d > 0 else low)[cols], np.nan)
+    adv = np.where(valid, d * (low if d > 0 else high)[cols], np.nan)
+    entry = close[entries]
+
+    sl_s = d * (entry * (1 - d * model["sl_percent"] / 100))
+    activation_percent = model["trailing_activation_percent"]
+    distance = entry * model["trailing_percent"] / 100
+    with np.errstate(invalid="ignore"):
+        if activation_percent:
+            act_s = d * (entry * (1 + d * activation_percent / 100))
+            activated = _first_true(fav >= act_s[:, None])
+            # Экстремум с бара активации; стоп бара j использует экстремум по бару j-1 включительно
+            running = np.where(np.arange(window)[None, :] >= activated[:, None], fav, -np.inf)
+            running = np.fmax.accumulate(running, axis=1)
+            extreme = np.empty_like(running)
+            extreme[:, 0] = -np.inf
+            extreme[:, 1:] = running[:, :-1]
+            stop_s = np.maximum(sl_s[:, None], extreme - distance[:, None])
+        else:
+            stop_s = np.broadcast_to(sl_s[:, None], fav.shape)
+        stop_hit = _first_true(adv <= stop_s)
+
+        remaining = np.ones(len(entries))
+        realized = np.zeros(len(entries))
+        tp_hits = np.zeros(len(entries), dtype=np.int8)
+        tp_close = np.full(len(entries), window)
+        previous_hit = np.zeros(len(entries), dtype=np.int64)
+        for tp_percent, fraction in zip(model["tp_levels"], model["tp_fractions"]):
+            tp_price = entry * (1 + d * tp_percent / 100)
+            # TP обрабатываются по порядку: уровень k не раньше уровня k-1
+            hit = np.maximum(_first_true(fav >= (d * tp_price)[:, None]), previous_hit)
+            previous_hit = hit
+            # После полного закрытия на баре b уровни, задетые тем же баром, учитываются с нулевым объёмом
+            taken = (hit < stop_hit) & (hit <= tp_close)
+            part = np.where(taken, np.minimum(fraction, remaining), 0.0)
+            realized += part * d * (tp_price / entry - 1)
+            remaining -= part
+            tp_hits += taken
+            tp_close = np.where(taken & (remaining <= 1e-12), np.minimum(hit, tp_close), tp_close)
+
+    by_tp = tp_close < window
+    by_stop = ~by_tp & (stop_hit < window)
+    # Окно дошло до последней свечи без выхода — закрытие по close последней свечи
+    at_end = ~by_tp & ~by_stop & (entries + window >= n - 1)
+    done = by_tp | by_stop | at_end
+
+    stop_s_at_hit = stop_s[np.arange(len(entries)), np.minimum(stop_hit, window - 1)]
+    exit_price = np.where(by_stop, d * stop_s_at_hit, close[-1])
+    realized = realized + np.where(by_tp, 0.0, np.maximum(remaining, 0.0) * d * (exit_price / entry - 1))
+    reason = np.select([by_tp, by_stop & (stop_s_at_hit != sl_s), by_stop], [_TP, _TRAILING, _SL], _END)
+    exit_bar = np.where(by_tp, entries + 1 + tp_close, np.where(by_stop, entries + 1 + stop_hit, n - 1))
+
+    idx = entries[done]
+    out["exit_bar"][idx] = exit_bar[done]
+    out["pnl_percent"][idx] = realized[done] * 100 - 2 * model["fee_percent"]
+    out["reason"][idx] = reason[done]
+    out["tp_hits"][idx] = tp_hits[done]
+    return entries[~done]
+
+
+def _simulate_position(i, d, h, l, c, model):
+    entry = c[i]
+    sl = entry * (1 - d * model["sl_percent"] / 100)
+    tp_prices = [entry * (1 + d * p / 100) for p in model["tp_levels"]]
+    fractions = model["tp_fractions"]
+    activation_percent = model["trailing_activation_percent"]
+    activation = entry * (1 + d * activation_percent / 100) if activation_percent else None
+    distance = entry * model["trailing_percent"] / 100
+
+    remaining = 1.0
+    realized = 0.0
+    next_tp = 0
+    trailing = False
+    extreme = 0.0
+    reason = "end"
+    j = i
+    for j in range(i + 1, len(c)):
+        favorable, adverse = (h[j], l[j]) if d > 0 else (l[j], h[j])
+        stop = sl
+        if trailing:
+            trail_stop = extreme - d * distance
+            stop = max(stop, trail_stop) if d > 0 else min(stop, trail_stop)
+        if (adverse - stop) * d <= 0:
+            realized += remaining * d * (stop / entry - 1)
+            remaining = 0.0
+            reason = "trailing" if stop != sl else "sl"
+            break
+        while next_tp < len(tp_prices) and (favorable - tp_prices[next_tp]) * d >= 0:
+            part = min(fractions[next_tp], remaining)
+            realized += part * d * (tp_prices[next_tp] / entry - 1)
+            remaining -= part
+            next_tp += 1
+        if remaining <= 1e-12:
+            remaining = 0.0
+            reason = "tp"
+            break
+        if activation is not None:
+            if trailing:
+                extreme = max(extreme, favorable) if d > 0 else min(extreme, favorable)
+            elif (favorable - activation) * d >= 0:
+                trailing = True
+                extreme = favorable
+    if remaining > 0:
+        realized += remaining * d * (c[j] / entry - 1)
+
+    return {
+        "exit_bar": j,
+        "tp_hits": next_tp,
+        "exit_reason": reason,
+        "pnl_percent": realized * 100 - 2 * model["fee_percent"],
+    }
+
+
+def backtest_symbols(symbols, source="store", interval=config.TIMEFRAME, root=DEFAULT_ROOT, model=None):
+    """Бэктест пачки символов в текущем процессе (единица работы пула)."""
+    model = model or exit_model_from_config()
+    candles = {}
+    for symbol in symbols:
+        data = load_candles(symbol, source, interval, root)
+        if data is not None and len(data["close"]):
+            candles[symbol] = data
+    if not candles:
+        return []
+    m = stack_candles(candles)
+    indicators = {f"tema_{k+1}": tema_matrix(m["close"], p) for k, p in enumerate(config.TEMA_PERIODS)}
+    indicators["adx"] = adx_matrix(m["high"], m["low"], m["close"])
+    indicators["cmo"] = cmo_matrix(m["close"])
+    signals = check_signal_vectorized(indicators, index=None)
+
+    trades = []
+    length = m["close"].shape[1]
+    for row, (symbol, data) in enumerate(candles.items()):
+        start = length - len(data["close"])
+        trades.extend(simulate_symbol(
+            symbol, data["timestamp"], data["high"], data["low"], data["close"], signals[row, start:], model
+        ))
+    return trades
+
+
+def run_backtest(source="store", interval=config.TIMEFRAME, root=DEFAULT_ROOT, symbols=None, processes=None,
+                 chunk_size=25, model=None):
+    """Бэктест вселенной по пулу процессов; возвращает список сделок, отсортированный по времени выхода."""
+    symbols = symbols or list_symbols(source, interval, root)
+    model = model or exit_model_from_config()
+    chunks = [symbols[k:k + chunk_size] for k in range(0, len(symbols), chunk_size)]
+    trades = []
+    if processes == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            trades.extend(backtest_symbols(chunk, source, interval, root, model))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [pool.submit(backtest_symbols, chunk, source, interval, root, model) for chunk in chunks]
+            for fut in futures:
+                trades.extend(fut.result())
+    trades.sort(key=lambda t: (t["exit_ts"], t["symbol"]))
+    return trades
+
+
+# --- статистика ---
+
+def summarize(trades):
+    if not trades:
+        return {"trades": 0}
+    pnl = np.array([t["pnl_usd"] for t in trades])
+    pnl_percent = np.array([t["pnl_percent"] for t in trades])
+    equity = np.cumsum(pnl)
+    drawdown = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:] - equity
+    gross_profit = pnl[pnl > 0].sum()
+    gross_loss = -pnl[pnl < 0].sum()
+    reasons = {}
+    for t in trades:
+        reasons[t["exit_reason"]] = reasons.get(t["exit_reason"], 0) + 1
+    return {
+        "trades": len(trades),
+        "long": sum(t["side"] == "long" for t in trades),
+        "short": sum(t["side"] == "short" for t in trades),
+        "symbols": len({t["symbol"] for t in trades}),
+        "win_rate": float((pnl > 0).mean() * 100),
+        "total_pnl_usd": float(pnl.sum()),
+        "avg_pnl_percent": float(pnl_percent.mean()),
+        "profit_factor": float(gross_profit / gross_loss) if gross_loss > 0 else float("inf"),
+        "max_drawdown_usd": float(drawdown.max()),
+        "avg_bars": float(np.mean([t["bars"] for t in trades])),
+        "exit_reasons": reasons,
+    }
+
+
+def write_trades(trades, path):
+    fields = ["symbol", "side", "entry_ts", "exit_ts", "entry_price", "bars", "tp_hits", "exit_reason",
+              "pnl_percent", "pnl_usd"]
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(trades)
+
+
+def _parse_args(args):
+    options = {"--source": "store", "--interval": config.TIMEFRAME, "--root": DEFAULT_ROOT,
+               "--processes": None, "--trades": None}
+    while args:
+        key = args.pop(0)
+        if key not in options or not args:
+            print("Использование: python -m core.backtest [--source store|klines|<каталог>] "
+                  "[--interval 1h] [--root market_data] [--processes N] [--trades trades.csv]")
+            sys.exit(1)
+        options[key] = args.pop(0)
+    return options
+
+
+if __name__ == "__main__":
+    opts = _parse_args(sys.argv[1:])
+    started = time.perf_counter()
+    result = run_backtest(opts["--source"], opts["--interval"], opts["--root"],
+                          processes=int(opts["--processes"]) if opts["--processes"] else None)
+    elapsed = time.perf_counter() - started
+    stats = summarize(result)
+    print(f"[BACKTEST] {opts['--source']} {opts['--interval']}: {elapsed:.2f} с")
+    for key, value in stats.items():
+        print(f"[BACKTEST] {key}: {value}")
+    if opts["--trades"]:
+        write_trades(result, opts["--trades"])
+        print(f"[BACKTEST] Сделки сохранены в {opts['--trades']}")
@@ -1,36 +1,47 @@
-import requests
-import concurrent.futures
+import asyncio
+from core.async_rest import get_shared_client
 
 def get_all_symbols():
-    url = "https://api.bybit.com/v5/market/tickers?category=linear"
-    resp = requests.get(url, timeout=10)
-    data = resp.json()
+    data = get_shared_client().get_tickers(category="linear")
     return [item["symbol"] for item in data["result"]["list"] if "USDT" in item["symbol"]]
 
-def symbol_has_kline(symbol, interval="1m"):
-    url = f"https://api.bybit.com/v5/market/kline?category=linear&symbol={symbol}&interval={interval}&limit=1"
+async def symbol_has_kline_async(client, symbol, interval="1m"):
     try:
-        resp = requests.get(url, timeout=5)
-        data = resp.json()
+        data = await client.get_kline_async(category="linear", symbol=symbol, interval=interval, limit=1)
         candles = data.get("result", {}).get("list", [])
         return len(candles) > 0
     except Exception as e:
         return False
 
+def symbol_has_kline(symbol, interval="1m"):
+    client = get_shared_client()
+    return client.run(symbol_has_kline_async(client, symbol, interval))
+
 def get_symbols_with_kline(symbols, interval="1m", max_workers=15):
+    # Все запросы идут через общий пул соединений и token bucket клиента;
+    # max_workers ограничивает число одновременных запросов.
+    client = get_shared_client()
+
+    async def check_all():
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def check(symbol):
+            async with semaphore:
+                return symbol, await symbol_has_kline_async(client, symbol, interval)
+
+        return await asyncio.gather(*(check(s) for s in symbols), return_exceptions=True)
+
     working = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        fut2symbol = {executor.submit(symbol_has_kline, s, interval): s for s in symbols}
-        for fut in concurrent.futures.as_completed(fut2symbol):
-            symbol = fut2symbol[fut]
-            try:
-                if fut.result():
-                    working.append(symbol)
-                    print(f"[KLINE:OK] {symbol}")
-                else:
-                    print(f"[KLINE:SKIP] {symbol}")
-            except Exception as e:
-                print(f"[KLINE:ERR] {symbol}: {e}")
+    for result in client.run(check_all()):
+        if isinstance(result, Exception):
+            print(f"[KLINE:ERR] {result}")
+            continue
+        symbol, ok = result
+        if ok:
+            working.append(symbol)
+            print(f"[KLINE:OK] {symbol}")
+        else:
+            print(f"[KLINE:SKIP] {symbol}")
     return working
 
 def scan_and_save_kline_symbols(filepath="symbols_with_kline.txt", interval="1m"):
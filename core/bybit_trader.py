@@ -5,10 +5,16 @@ import time
 import threading
 import config
 import math
+from core.instruments import InstrumentRegistry
+from core.private_state import PrivateStateStore, ACTIVE_ORDER_STATUSES
+from core.websocket_private import start_private_stream
+from core.latency import recorder as latency_recorder
 
 class BybitTrader:
-    def __init__(self, deposit):
+    def __init__(self, deposit, tickers=None):
         self.deposit = deposit
+        # Таблица тикеров из WS collector (core.ticker_state.TickerTable): цена без REST-запроса
+        self.tickers = tickers
         self.open_trades = []
         self.session = HTTP(
             api_key=config.BYBIT_API_KEY,
@@ -17,59 +23,141 @@ class BybitTrader:
         )
         self.category = "linear"
 
-        self._open_trades_cache = []
-        self._open_trades_lock = threading.Lock()
-        self._stop_update_thread = False
-        self._update_thread = threading.Thread(target=self._update_open_positions_loop, daemon=True)
-        self._update_thread.start()
+        # Справочник инструментов: один bulk-запрос при старте + фоновое обновление по TTL
+        self.instruments = InstrumentRegistry(self.session, self.category)
+        self.instruments.load()
+        self.instruments.start_background_refresh()
 
         # --- NEW: История трейдов для мёрджа ---
         self._trade_history = []  # список полных trade-объектов
 
-    def _update_open_positions_loop(self):
-        interval = getattr(config, "OPEN_TRADES_SCAN_INTERVAL", 1)
-        while not self._stop_update_thread:
+        # Позиции и ордера приходят событиями приватного WebSocket в локальное состояние,
+        # REST нужен только для начального снимка и редкой сверки
+        self.private_state = PrivateStateStore()
+        self.private_state.add_listener(self._on_private_event)
+        self._private_ws = None
+        if config.BYBIT_API_KEY and config.BYBIT_API_SECRET:
             try:
-                open_positions = self.fetch_real_open_positions()
-                with self._open_trades_lock:
-                    self._open_trades_cache = open_positions
-                #print(f"[LOG] Открытых сделок на бирже: {len(open_positions)} {[p['symbol'] for p in open_positions]}")
+                self._private_ws = start_private_stream(
+                    self.private_state.on_message, config.BYBIT_API_KEY, config.BYBIT_API_SECRET
+                )
             except Exception as e:
-                print(f"❌ Ошибка обновления открытых позиций (background): {e}")
-            time.sleep(interval)
+                print(f"❌ Ошибка подключения приватного WebSocket, позиции будут опрашиваться по REST: {e}")
+
+        self._leverage = {}  # symbol -> текущее плечо на бирже (из позиций), чтобы не вызывать set_leverage повторно
+
+        self._open_trades_cache = []
+        self._open_trades_lock = threading.Lock()
+        self._stop_update_thread = threading.Event()
+        # Первая (постраничная) сверка с REST идёт в фоновом потоке и не задерживает конструктор;
+        # пока она не завершилась (private_state.ready), чтения позиций/ордеров идут напрямую в REST
+        self._update_thread = threading.Thread(target=self._reconcile_loop, daemon=True)
+        self._update_thread.start()
+
+    def _reconcile_loop(self):
+        # Без приватного WS состояние обновляется только сверкой — опрашиваем так же часто, как раньше
+        if self._private_ws is not None:
+            interval = config.PRIVATE_STATE_RECONCILE_INTERVAL
+        else:
+            interval = getattr(config, "OPEN_TRADES_SCAN_INTERVAL", 1)
+        self.reconcile_private_state()
+        while not self._stop_update_thread.wait(interval):
+            self.reconcile_private_state()
+
+    def reconcile_private_state(self):
+        """Сверка локального состояния с REST: снимок позиций и активных ордеров заменяет накопленный по WS."""
+        # События WS, пришедшие во время постраничной загрузки, новее снимка — их не перезаписываем
+        since = self.private_state.sequence()
+        try:
+            positions = self._fetch_paginated(self.session.get_positions, limit=200)
+            orders = self._fetch_paginated(self.session.get_open_orders, limit=50)
+        except Exception as e:
+            print(f"❌ Ошибка сверки позиций/ордеров с REST: {e}")
+            return
+        self._remember_leverage(positions)
+        positions_mismatch = self.private_state.replace_positions(positions, since)
+        orders_mismatch = self.private_state.replace_orders(orders, since)
+        self.private_state.mark_ready()
+        if positions_mismatch or orders_mismatch:
+            print(f"[PRIVATE-STATE] ⚠️ Расхождение с REST (позиции: {positions_mismatch}, ордера: {orders_mismatch}) — состояние обновлено")
+        self._refresh_open_trades()
+
+    def _fetch_paginated(self, method, limit):
+        items = []
+        cursor = None
+        while True:
+            kwargs = dict(category=self.category, settleCoin="USDT", limit=limit)
+            if cursor:
+                kwargs["cursor"] = cursor
+            result = method(**kwargs)["result"]
+            items.extend(result.get("list", []))
+            cursor = result.get("nextPageCursor")
+            if not cursor:
+                return items
+
+    def _on_private_event(self, topic, items):
+        if topic.startswith("position"):
+            self._remember_leverage(items)
+            self._refresh_open_trades()
+
+    def _remember_leverage(self, positions):
+        for pos in positions:
+            if pos.get("symbol") and pos.get("leverage"):
+                self._leverage[pos["symbol"]] = float(pos["leverage"])
+
+    def ensure_leverage(self, symbol, leverage):
+        """set_leverage только если плечо отличается от известного; возвращает True, если был запрос."""
+        leverage = self.instruments.clamp_leverage(symbol, leverage)
+        if self._leverage.get(symbol) == float(leverage):
+            return False
+        try:
+            response = self.session.set_leverage(
+                category=self.category,
+                symbol=symbol,
+                buyLeverage=str(leverage),
+                sellLeverage=str(leverage)
+            )
+            print(f"✅ Установлено плечо {leverage}x: {response}")
+        except Exception as e:
+            # 110043 — плечо уже такое (leverage not modified)
+            if "110043" not in str(e):
+                print(f"❌ Ошибка установки плеча: {e}")
+                return True
+        self._leverage[symbol] = float(leverage)
+        return True
+
+    def _refresh_open_trades(self):
+        open_positions = self._positions_to_trades(self.private_state.open_positions())
+        with self._open_trades_lock:
+            self._open_trades_cache = open_positions
 
     def stop(self):
-        self._stop_update_thread = True
+        self._stop_update_thread.set()
+        self.instruments.stop()
+        if self._private_ws is not None:
+            self._private_ws.exit()
         if hasattr(self, '_update_thread'):
             self._update_thread.join(timeout=1)
 
     def get_symbol_info(self, symbol):
-        try:
-            res = self.session.get_instruments_info(category=self.category, symbol=symbol)
-            return res['result']['list'][0] if res['result']['list'] else {}
-        except Exception as e:
-            print(f"❌ Ошибка получения информации по символу {symbol}: {e}")
-            return {}
+        """Параметры инструмента из локального справочника (InstrumentInfo или None)."""
+        return self.instruments.get(symbol)
 
     def floor(self, value, decimals):
         factor = Decimal('1') / (Decimal('10') ** decimals)
         return (Decimal(str(value)) // factor) * factor
 
     def round_qty(self, symbol, qty):
-        info = self.get_symbol_info(symbol)
-        step_qty = Decimal(info.get('lotSizeFilter', {}).get('qtyStep', '0.001'))
-        qty_decimals = abs(step_qty.as_tuple().exponent)
-        adjusted_qty = self.floor(qty, qty_decimals)
-        return f"{adjusted_qty:.{qty_decimals}f}"
+        return self.instruments.round_qty(symbol, qty)
 
     def round_price(self, symbol, price):
-        info = self.get_symbol_info(symbol)
-        tick_size = Decimal(info.get('priceFilter', {}).get('tickSize', '0.0001'))
-        price_decimals = abs(tick_size.as_tuple().exponent)
-        adjusted_price = self.floor(price, price_decimals)
-        return f"{adjusted_price:.{price_decimals}f}"
+        return self.instruments.round_price(symbol, price)
 
     def get_price(self, symbol):
+        if self.tickers is not None:
+            quote = self.tickers.quote(symbol, max_age=config.TICKER_MAX_AGE)
+            if quote is not None and quote[1] > 0:
+                return quote[1]
         try:
             res = self.session.get_tickers(category=self.category, symbol=symbol)
             return float(res['result']['list'][0]['ask1Price'])
@@ -145,32 +233,34 @@ class BybitTrader:
         try:
             result = self.session.get_positions(category=self.category, settleCoin="USDT")
             #print("[BYBIT] Ответ get_positions:", result)
-            open_positions = []
-            for pos in result['result']['list']:
-                #print("[BYBIT] Позиция:", pos)
-                if float(pos.get('size', 0)) > 0:
-                    old_trade = self._find_trade_in_history(pos['symbol'], pos['side'])
-                    if old_trade:
-                        old_trade['amount'] = float(pos['size'])
-                        old_trade['entry_price'] = float(pos['avgPrice'])
-                        old_trade['leverage'] = float(pos['leverage'])
-                        old_trade['status'] = "open"
-                        open_positions.append(old_trade)
-                    else:
-                        open_positions.append({
-                            "symbol": pos['symbol'],
-                            "side": pos['side'].lower(),
-                            "entry_price": float(pos['avgPrice']),
-                            "amount": float(pos['size']),
-                            "leverage": float(pos['leverage']),
-                            "status": "open",
-                            "opened_at": time.time(),
-                        })
-            return open_positions
+            return self._positions_to_trades(result['result']['list'])
         except Exception as e:
             print(f"❌ Ошибка получения открытых позиций: {e}")
             return []
 
+    def _positions_to_trades(self, positions):
+        open_positions = []
+        for pos in positions:
+            if float(pos.get('size', 0)) > 0:
+                old_trade = self._find_trade_in_history(pos['symbol'], pos['side'])
+                if old_trade:
+                    old_trade['amount'] = float(pos['size'])
+                    old_trade['entry_price'] = float(pos['avgPrice'])
+                    old_trade['leverage'] = float(pos['leverage'])
+                    old_trade['status'] = "open"
+                    open_positions.append(old_trade)
+                else:
+                    open_positions.append({
+                        "symbol": pos['symbol'],
+                        "side": pos['side'].lower(),
+                        "entry_price": float(pos['avgPrice']),
+                        "amount": float(pos['size']),
+                        "leverage": float(pos['leverage']),
+                        "status": "open",
+                        "opened_at": time.time(),
+                    })
+        return open_positions
+
     def _find_trade_in_history(self, symbol, side):
         for trade in self._trade_history:
             if trade["symbol"] == symbol and trade["side"].lower() == side.lower():
@@ -178,16 +268,21 @@ class BybitTrader:
         return None
 
     def get_open_trades(self):
+        if not self.private_state.ready:
+            return self.fetch_real_open_positions()
         with self._open_trades_lock:
             return list(self._open_trades_cache)
 
     def get_tp_sl_orders(self, symbol, side):
-        """Получить реальные TP и SL ордера по символу"""
+        """Получить реальные TP и SL ордера по символу (из локального состояния приватного WS)"""
         try:
-            orders = self.session.get_open_orders(category=self.category, symbol=symbol)
+            if self.private_state.ready:
+                orders = self.private_state.open_orders(symbol)
+            else:
+                orders = self.session.get_open_orders(category=self.category, symbol=symbol).get('result', {}).get('list', [])
             tp_orders = []
             sl_order = None
-            for order in orders.get('result', {}).get('list', []):
+            for order in orders:
                 if order['orderType'].lower() == 'limit' and order.get('reduceOnly'):
                     tp_orders.append({
                         'price': float(order['price']),
@@ -211,8 +306,11 @@ class BybitTrader:
 
     def get_position_sl(self, symbol):
         try:
-            res = self.session.get_positions(category=self.category, symbol=symbol)
-            for pos in res['result']['list']:
+            if self.private_state.ready:
+                positions = [p for p in [self.private_state.position(symbol)] if p]
+            else:
+                positions = self.session.get_positions(category=self.category, symbol=symbol)['result']['list']
+            for pos in positions:
                 if float(pos.get('size', 0)) > 0:
                     stop_price = pos.get("stopLoss")
                     if stop_price and float(stop_price) > 0:
@@ -226,8 +324,6 @@ class BybitTrader:
             return None
 
     def set_stop_loss(self, symbol, entry_price, sl_percent, side):
-        info = self.get_symbol_info(symbol)
-        price_decimals = abs(Decimal(info.get('priceFilter', {}).get('tickSize', '0.0001')).as_tuple().exponent)
         if sl_percent <= 0:
             print("SL percent must be positive!")
             return None
@@ -236,12 +332,12 @@ class BybitTrader:
             sl_price = entry_price * (1 - sl_percent / 100)
         else:
             sl_price = entry_price * (1 + sl_percent / 100)
-        sl_price = round(sl_price, price_decimals)
+        sl_price = self.instruments.nearest_price(symbol, sl_price)
         try:
             response = self.session.set_trading_stop(
                 category=self.category,
                 symbol=symbol,
-                stop_loss=str(sl_price)
+                stop_loss=sl_price
             )
             print(f"✅ Установлен стоп-лосс {sl_price} ({sl_percent}%)", response)
             return response
@@ -252,21 +348,18 @@ class BybitTrader:
     # --- TRAILING STOP LOGIC ---
 
     def activate_trailing_stop(self, symbol, active_price):
-        info = self.get_symbol_info(symbol)
-        price_decimals = abs(Decimal(info.get('priceFilter', {}).get('tickSize', '0.0001')).as_tuple().exponent)
         current_price = self.get_price(symbol)
-        ts_callback = current_price * config.TRAILING_STOP_PERCENT / 100
-        ts_callback = round(ts_callback, price_decimals)
-        active_price = round(active_price, price_decimals)
-        if ts_callback <= 0:
+        ts_callback = self.instruments.nearest_price(symbol, current_price * config.TRAILING_STOP_PERCENT / 100)
+        active_price = self.instruments.nearest_price(symbol, active_price)
+        if Decimal(ts_callback) <= 0:
             print(f"Trailing stop too small: {ts_callback}")
             return None
         try:
             response = self.session.set_trading_stop(
                 category=self.category,
                 symbol=symbol,
-                trailingStop=str(ts_callback),
-                activePrice=str(active_price)
+                trailingStop=ts_callback,
+                activePrice=active_price
             )
             print(f"🟢 Трейлинг-стоп активируется при {active_price}, шаг: {ts_callback}", response)
             return response
@@ -274,21 +367,18 @@ class BybitTrader:
             print("❌ Ошибка установки отложенного трейлинг-стопа:", e)
             return None
 
-    def place_take_profits(self, symbol, entry_price, qty, side):
-        info = self.get_symbol_info(symbol)
-        price_decimals = abs(Decimal(info.get('priceFilter', {}).get('tickSize', '0.0001')).as_tuple().exponent)
-        min_qty = float(info.get('lotSizeFilter', {}).get('minOrderQty', 0.001))
-        tp_side = "Sell" if side.lower() == "buy" else "Buy"
+    def _take_profit_ladder(self, symbol, entry_price, qty, side):
+        """Лестница TP по config.TP_LEVELS / TP_PERCENTAGES: список (номер, цена, объём) с учётом minOrderQty."""
+        min_qty = self.instruments.min_qty(symbol)
         remaining_qty = qty
-        tp_qtys = []
-        actual_tp_percentages = []
+        ladder = []
 
         for i, (tp_percent, tp_amount) in enumerate(zip(config.TP_LEVELS, config.TP_PERCENTAGES), start=1):
             if side.lower() == "buy":
                 tp_price = entry_price * (1 + tp_percent / 100)
             else:
                 tp_price = entry_price * (1 - tp_percent / 100)
-            tp_price = round(tp_price, price_decimals)
+            tp_price = self.instruments.nearest_price(symbol, tp_price)
 
             # Для последнего TP — всё, что осталось
             if i == len(config.TP_LEVELS):
@@ -306,10 +396,20 @@ class BybitTrader:
                 print(f"❌ TP{i}: Объём {tp_qty} ниже минимального — пропущено")
                 continue
 
-            actual_percent = tp_qty / qty * 100
-            actual_tp_percentages.append(actual_percent)
-            tp_qtys.append(tp_qty)
+            ladder.append((i, tp_price, tp_qty))
+            remaining_qty -= tp_qty
+            if remaining_qty < min_qty:
+                break
+
+        if remaining_qty > 0 and ladder:
+            # (остаток меньше min_qty останется невыставленным, либо нужно модифицировать последний ордер вручную)
+            print(f"⚠️ Остаток {remaining_qty} не распределён по TP")
+        print(f"[INFO] Фактические проценты TP: {[tp_qty / qty * 100 for _, _, tp_qty in ladder]}")
+        return ladder
 
+    def place_take_profits(self, symbol, entry_price, qty, side):
+        tp_side = "Sell" if side.lower() == "buy" else "Buy"
+        for i, tp_price, tp_qty in self._take_profit_ladder(symbol, entry_price, qty, side):
             try:
                 order = self.session.place_order(
                     category=self.category,
@@ -317,28 +417,46 @@ class BybitTrader:
                     side=tp_side,
                     order_type="Limit",
                     qty=self.round_qty(symbol, tp_qty),
-                    price=str(tp_price),
+                    price=tp_price,
                     time_in_force="GTC",
                     reduce_only=True,
                     order_link_id=f"TP{i}_{symbol}_{int(time.time())}"
                 )
-                print(f"✅ TP{i} установлен по цене {tp_price} на {tp_qty} контрактов ({actual_percent:.2f}%):", order)
-                remaining_qty -= tp_qty
+                print(f"✅ TP{i} установлен по цене {tp_price} на {tp_qty} контрактов ({tp_qty / qty * 100:.2f}%):", order)
             except Exception as e:
                 print(f"❌ Ошибка установки TP{i}:", e)
-            if remaining_qty < min_qty:
-                break
-
-        # Добавить остаток к последнему TP, если есть
-        if remaining_qty > 0 and tp_qtys:
-            print(f"⚠️ Остаток {remaining_qty} добавлен к последнему TP")
-            last_tp_qty = tp_qtys[-1] + remaining_qty
-            actual_tp_percentages[-1] = last_tp_qty / qty * 100
-            # (реальный ордер уже отправлен — остаток останется невыставленным, если меньше min_qty, либо нужно модифицировать последний ордер вручную)
 
-        print(f"[INFO] Фактические проценты TP: {actual_tp_percentages}")
+    def place_take_profits_batch(self, symbol, entry_price, qty, side):
+        """Вся лестница TP одним place_batch_order (вместо запроса на каждый уровень)."""
+        tp_side = "Sell" if side.lower() == "buy" else "Buy"
+        request = [
+            {
+                "symbol": symbol,
+                "side": tp_side,
+                "orderType": "Limit",
+                "qty": self.round_qty(symbol, tp_qty),
+                "price": tp_price,
+                "timeInForce": "GTC",
+                "reduceOnly": True,
+                "orderLinkId": f"TP{i}_{symbol}_{int(time.time())}",
+            }
+            for i, tp_price, tp_qty in self._take_profit_ladder(symbol, entry_price, qty, side)
+        ]
+        if not request:
+            return None
+        try:
+            response = self.session.place_batch_order(category=self.category, request=request)
+            print(f"✅ TP ({len(request)} шт.) выставлены batch-ордером:", response)
+            return response
+        except Exception as e:
+            print("❌ Ошибка установки TP batch-ордером:", e)
+            return None
 
-    def open_trade(self, symbol, side, entry_price, amount, leverage, tp_levels, tp_percents, sl_percent, trailing_stop, trailing_percent):
+    def open_trade(self, symbol, side, entry_price, amount, leverage, tp_levels, tp_percents, sl_percent, trailing_stop, trailing_percent,
+                   signal_time=None):
+        if getattr(config, "FAST_ENTRY_ENABLED", False):
+            return self.open_trade_fast(symbol, side, entry_price, amount, leverage, tp_levels, tp_percents, sl_percent,
+                                        signal_time=signal_time)
         symbol = symbol.replace("_", "")
         try:
             notional = amount * leverage
@@ -354,7 +472,9 @@ class BybitTrader:
             except Exception as e:
                 print(f"❌ Ошибка установки плеча: {e}")
 
+            sent = time.perf_counter()
             response = self.place_market_order_by_base(symbol, qty, side)
+            latency_recorder.record_since("order_ack", sent)
             print("Ответ на открытие ордера:", response)
             if not response or not response.get("result"):
                 print(f"❌ Сделка по {symbol} не открыта — ошибка ордера.")
@@ -422,6 +542,139 @@ class BybitTrader:
             print(f"❌ Ошибка при открытии сделки по {symbol}: {e}")
             return None
 
+    def open_trade_fast(self, symbol, side, entry_price, amount, leverage, tp_levels, tp_percents, sl_percent,
+                        signal_time=None):
+        """
+        Быстрый вход: set_leverage только при смене плеча, SL прикреплён к рыночному ордеру
+        (позиция защищена с момента подтверждения ордера), исполнение — из execution-стрима,
+        лестница TP — одним place_batch_order, трейлинг-стоп и уточнение SL по цене исполнения — одним set_trading_stop.
+        signal_time — time.monotonic() момента сигнала; задержка сигнал→защита пишется в trade["latency"].
+        """
+        symbol = symbol.replace("_", "")
+        signal_time = signal_time if signal_time is not None else time.monotonic()
+        latency = {}
+        try:
+            self.ensure_leverage(symbol, leverage)
+
+            qty = self.round_qty(symbol, amount * leverage / entry_price)
+            if side.lower() == "buy":
+                sl_price = entry_price * (1 - sl_percent / 100)
+            else:
+                sl_price = entry_price * (1 + sl_percent / 100)
+            order_link_id = f"entry_{symbol}_{int(time.time() * 1000)}"
+            sent = time.perf_counter()
+            response = self.session.place_order(
+                category=self.category,
+                symbol=symbol,
+                side=side.capitalize(),
+                orderType="Market",
+                qty=qty,
+                stopLoss=self.instruments.nearest_price(symbol, sl_price),
+                tpslMode="Full",
+                slOrderType="Market",
+                orderLinkId=order_link_id
+            )
+            latency["protected_ms"] = (time.monotonic() - signal_time) * 1000
+            latency_recorder.record_since("order_ack", sent)
+            latency_recorder.record("signal_to_protected", latency["protected_ms"] / 1000)
+            if not response or response.get("retCode", 0) != 0:
+                print(f"❌ Сделка по {symbol} не открыта — ошибка ордера: {response}")
+                return None
+
+            fill = self.private_state.wait_for_fill(order_link_id, float(qty), config.FILL_WAIT_TIMEOUT)
+            if fill is not None and fill[1] <= 0:
+                print(f"❌ Сделка по {symbol} не открыта — ордер {order_link_id} завершён без исполнения")
+                return None
+            if fill is None:
+                # Нет события исполнения (нет приватного WS или таймаут) — ищем исполнение этого ордера по REST
+                print(f"⚠️ {symbol}: исполнение не пришло по WS за {config.FILL_WAIT_TIMEOUT} с, читаем ордер {order_link_id} по REST")
+                fill = self._fill_from_rest(symbol, order_link_id)
+                if fill is None or fill[1] <= 0:
+                    # TP, стоп и запись сделки без подтверждённого исполнения не ставим (SL уже в самом ордере)
+                    print(f"❌ Сделка по {symbol} не открыта — исполнение ордера {order_link_id} не найдено и по REST")
+                    return None
+            entry_price_actual, real_qty = fill
+            latency["filled_ms"] = (time.monotonic() - signal_time) * 1000
+            print(f"✅ Открыта позиция по {symbol} @ {entry_price_actual:.4f}")
+
+            self.place_take_profits_batch(symbol, entry_price_actual, real_qty, side)
+            latency["tp_ms"] = (time.monotonic() - signal_time) * 1000
+
+            # SL по фактической цене входа + отложенный трейлинг-стоп — одним запросом, без запроса тикера
+            stop_args = {}
+            if side.lower() == "buy":
+                stop_args["stopLoss"] = self.instruments.nearest_price(symbol, entry_price_actual * (1 - sl_percent / 100))
+            else:
+                stop_args["stopLoss"] = self.instruments.nearest_price(symbol, entry_price_actual * (1 + sl_percent / 100))
+            trailing_activation_percent = getattr(config, "TRAILING_STOP_ACTIVATION_PERCENT", None)
+            if trailing_activation_percent is not None and trailing_activation_percent > 0:
+                if side.lower() == "buy":
+                    activation_price = entry_price_actual * (1 + trailing_activation_percent / 100)
+                else:
+                    activation_price = entry_price_actual * (1 - trailing_activation_percent / 100)
+                stop_args["trailingStop"] = self.instruments.nearest_price(
+                    symbol, entry_price_actual * config.TRAILING_STOP_PERCENT / 100
+                )
+                stop_args["activePrice"] = self.instruments.nearest_price(symbol, activation_price)
+            try:
+                response = self.session.set_trading_stop(category=self.category, symbol=symbol, positionIdx=0, **stop_args)
+                print(f"✅ SL/трейлинг-стоп по цене входа: {stop_args}", response)
+            except Exception as e:
+                print("❌ Ошибка установки SL/трейлинг-стопа:", e)
+            latency["done_ms"] = (time.monotonic() - signal_time) * 1000
+            latency_recorder.record("signal_to_done", latency["done_ms"] / 1000)
+            print(f"[LATENCY] {symbol}: сигнал→защита {latency['protected_ms']:.1f} мс, "
+                  f"исполнение {latency['filled_ms']:.1f} мс, TP {latency['tp_ms']:.1f} мс, всё {latency['done_ms']:.1f} мс")
+
+            real_amount = real_qty * entry_price_actual
+            trade = {
+                "symbol": symbol,
+                "side": side,
+                "entry_price": entry_price_actual,
+                "amount": real_amount,
+                "qty": real_qty,
+                "remaining_amount": real_amount,
+                "leverage": leverage,
+                "tp_levels": tp_levels,
+                "tp_percents": tp_percents,
+                "opened_at": time.time(),
+                "status": "open",
+                "latency": latency,
+            }
+            self.open_trades.append(trade)
+            self._trade_history.append(trade)
+            return trade
+
+        except Exception as e:
+            print(f"❌ Ошибка при открытии сделки по {symbol}: {e}")
+            return None
+
+    def _fill_from_rest(self, symbol, order_link_id):
+        """
+        Исполнение именно этого ордера по REST: история ордеров, затем список исполнений по orderLinkId.
+        Позиция по символу не подходит — в ней может быть объём, открытый раньше.
+        Возвращает (средняя цена, объём); (0.0, 0.0) — ордер завершён без исполнения; None — ордер не найден.
+        """
+        orders = self.session.get_order_history(
+            category=self.category, symbol=symbol, orderLinkId=order_link_id
+        )['result']['list']
+        order = next((o for o in orders if o.get('orderLinkId') == order_link_id), None)
+        if order is not None:
+            qty = float(order.get('cumExecQty') or 0)
+            if qty > 0 and float(order.get('avgPrice') or 0) > 0:
+                return float(order['avgPrice']), qty
+            if qty <= 0 and order.get('orderStatus') not in ACTIVE_ORDER_STATUSES:
+                return 0.0, 0.0
+        executions = self.session.get_executions(
+            category=self.category, symbol=symbol, orderLinkId=order_link_id
+        )['result']['list']
+        trades = [e for e in executions if e.get('orderLinkId') == order_link_id and float(e.get('execQty') or 0) > 0]
+        if not trades:
+            return None
+        qty = sum(float(e['execQty']) for e in trades)
+        value = sum(float(e['execQty']) * float(e['execPrice']) for e in trades)
+        return value / qty, qty
+
     # --- Коррекция: TP/SL/TS срабатывают только один раз ---
     def mark_tp_triggered(self, trade, tp_index):
         if "tp_triggered" in trade and len(trade["tp_triggered"]) > tp_index:
@@ -0,0 +1,54 @@
+import time
+import numpy as np
+
+class CandleCloseScheduler:
+    """
+    Событийный планировщик стратегии вместо опроса раз в 30 секунд.
+    Следит за last_closed_ts символов в shared memory (core.shared_candles), который collector
+    обновляет по флагу confirm, и вызывает on_close(symbols) только для символов, чья свеча
+    только что закрылась. Пока ничего не меняется, проверка стоит одного чтения global_seq.
+    Если задан intrabar_interval > 0, раз в intrabar_interval секунд вызывается on_intrabar(symbols)
+    по всем символам сегмента (проверка по формирующейся свече; пустые запасные слоты пропускаются).
+    baseline — снимок closed_timestamps(), снятый до прогрева истории: закрытия за время прогрева
+    придут в on_close первой же проверкой (без него точка отсчёта — момент создания планировщика).
+    """
+
+    def __init__(self, shared_candles, on_close, on_intrabar=None, poll_interval=0.005, intrabar_interval=0,
+                 baseline=None):
+        self.shared = shared_candles
+        self.on_close = on_close
+        self.on_intrabar = on_intrabar
+        self.poll_interval = poll_interval
+        self.intrabar_interval = intrabar_interval
+        if baseline is None:
+            self._last_seq = self.shared.global_sequence()
+            self._closed = self.shared.closed_timestamps()
+        else:
+            self._last_seq = None  # первая проверка сравнивает с baseline
+            self._closed = np.array(baseline, copy=True)
+        self._next_intrabar = time.monotonic() + intrabar_interval
+
+    def poll_once(self):
+        """Одна проверка; возвращает список символов, по которым только что закрылась свеча."""
+        closed_symbols = []
+        seq = self.shared.global_sequence()
+        if seq != self._last_seq:
+            self._last_seq = seq
+            current = self.shared.closed_timestamps()
+            changed = np.flatnonzero(current > self._closed)
+            if len(changed):
+                self._closed = np.maximum(self._closed, current)
+                closed_symbols = [self.shared.symbols[i] for i in changed]
+                self.on_close(closed_symbols)
+
+        if self.on_intrabar is not None and self.intrabar_interval > 0:
+            now = time.monotonic()
+            if now >= self._next_intrabar:
+                self._next_intrabar = now + self.intrabar_interval
+                self.on_intrabar([s for s in self.shared.symbols if s])
+        return closed_symbols
+
+    def run(self, stop_event=None):
+        while not (stop_event and stop_event.is_set()):
+            if not self.poll_once():
+                time.sleep(self.poll_interval)
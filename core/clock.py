@@ -0,0 +1,58 @@
+import time
+import threading
+from config import CLOCK_SYNC_SAMPLES, CLOCK_MAX_OFFSET_MS
+
+# Смещение локальных часов относительно сервера Bybit (GET /v5/market/time) вместо sudo ntpdate при старте.
+# Несколько запросов подряд, берётся замер с минимальным RTT: offset = время сервера - середина запроса.
+# Замер идёт в фоновом потоке и не задерживает старт; системные часы не меняются —
+# при большом смещении печатается предупреждение (синхронизация NTP — настройка хоста, timedatectl set-ntp true),
+# а время биржи для проверок свежести берётся как now_ms() с поправкой.
+
+
+class ClockOffset:
+    def __init__(self):
+        self.offset_ms = 0.0  # время сервера - локальное время, мс
+        self.rtt_ms = None
+        self.measured_at = None
+
+    def now_ms(self):
+        """Текущее время по часам биржи (локальное + измеренное смещение), мс."""
+        return time.time() * 1000 + self.offset_ms
+
+    def measure(self, client, samples=CLOCK_SYNC_SAMPLES):
+        """Замер по samples запросам (client — core.async_rest.BybitAsyncClient). Возвращает (offset_ms, rtt_ms)."""
+        best = None
+        for _ in range(max(int(samples), 1)):
+            sent = time.time()
+            response = client.get_server_time()
+            received = time.time()
+            result = response.get("result", {})
+            server_ms = int(result["timeNano"]) / 1e6 if result.get("timeNano") else float(response["time"])
+            rtt_ms = (received - sent) * 1000
+            if best is None or rtt_ms < best[1]:
+                best = (server_ms - (sent + received) * 500, rtt_ms)
+        self.offset_ms, self.rtt_ms = best
+        self.measured_at = time.time()
+        return best
+
+    def check(self, client, samples=CLOCK_SYNC_SAMPLES):
+        try:
+            offset_ms, rtt_ms = self.measure(client, samples)
+        except Exception as e:
+            print(f"[TIME] Не удалось измерить смещение часов относительно Bybit: {e}")
+            return
+        if abs(offset_ms) > CLOCK_MAX_OFFSET_MS:
+            print(f"[TIME] ⚠️ Часы расходятся с сервером Bybit на {offset_ms:+.0f} мс (RTT {rtt_ms:.0f} мс) — "
+                  f"включите NTP на хосте (timedatectl set-ntp true); до тех пор используется поправка")
+        else:
+            print(f"[TIME] Смещение часов относительно Bybit {offset_ms:+.1f} мс (RTT {rtt_ms:.0f} мс)")
+
+    def start_check(self, client, samples=CLOCK_SYNC_SAMPLES):
+        """Замер в фоновом потоке; старт бота его не ждёт."""
+        thread = threading.Thread(target=self.check, args=(client, samples), daemon=True)
+        thread.start()
+        return thread
+
+
+# Смещение часов процесса (замеряет main при старте)
+clock = ClockOffset()
@@ -0,0 +1,238 @@
+import os
+import sys
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+# Колоночное бинарное хранилище свечей/рыночных данных.
+# Раскладка: {root}/{dataset}/{key}/{column}.bin — сырые little-endian массивы по колонкам,
+#            {root}/{dataset}/{key}/_meta.json  — схема колонок и число зафиксированных строк.
+# Добавление дописывает байты в конец файлов колонок и только потом атомарно обновляет _meta.json,
+# поэтому оборванная запись не видна читателю и обрезается при следующем добавлении.
+# Чтение — np.memmap без парсинга: год минутных свечей по символу открывается за миллисекунды.
+
+DEFAULT_ROOT = "market_data"
+META_FILE = "_meta.json"
+
+KLINE_SCHEMA = {
+    "timestamp": "<i8",
+    "open": "<f8",
+    "high": "<f8",
+    "low": "<f8",
+    "close": "<f8",
+    "volume": "<f8",
+    "turnover": "<f8",
+}
+
+
+class ColumnarStore:
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+
+    def _dir(self, dataset, key):
+        return os.path.join(self.root, dataset, key)
+
+    def _meta(self, dataset, key):
+        path = os.path.join(self._dir(dataset, key), META_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_meta(self, dataset, key, meta):
+        path = os.path.join(self._dir(dataset, key), META_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+
+    def keys(self, dataset):
+        base = os.path.join(self.root, dataset)
+        if not os.path.isdir(base):
+            return []
+        return sorted(k for k in os.listdir(base) if os.path.exists(os.path.join(base, k, META_FILE)))
+
+    def schema(self, dataset, key):
+        """{ колонка: dtype } набора dataset/key или None, если набора ещё нет."""
+        meta = self._meta(dataset, key)
+        return dict(meta["columns"]) if meta else None
+
+    def rows(self, dataset, key):
+        meta = self._meta(dataset, key)
+        return meta["rows"] if meta else 0
+
+    def append(self, dataset, key, columns, schema=None, dedupe=False):
+        """
+        Дописывает строки в набор dataset/key.
+        columns: { колонка: массив } одинаковой длины (DataFrame тоже подходит).
+        schema: { колонка: dtype } для нового набора (по умолчанию — dtype переданных массивов).
+        dedupe=True: добавляются только строки с timestamp больше последнего сохранённого.
+        Возвращает число добавленных строк.
+        """
+        directory = self._dir(dataset, key)
+        os.makedirs(directory, exist_ok=True)
+        meta = self._meta(dataset, key)
+        if meta is None:
+            if schema is None:
+                schema = {name: np.asarray(columns[name]).dtype.newbyteorder("<").str for name in columns}
+            meta = {"columns": dict(schema), "rows": 0}
+
+        arrays = {name: np.asarray(columns[name], dtype=dtype) for name, dtype in meta["columns"].items()}
+        if dedupe and meta["rows"] and "timestamp" in arrays:
+            last_ts = self.last_timestamp(dataset, key)
+            mask = arrays["timestamp"] > last_ts
+            arrays = {name: a[mask] for name, a in arrays.items()}
+        added = len(next(iter(arrays.values()))) if arrays else 0
+        if not added:
+            return 0
+
+        for name, a in arrays.items():
+            path = os.path.join(directory, f"{name}.bin")
+            committed = meta["rows"] * a.dtype.itemsize
+            with open(path, "ab") as f:
+                # Хвост от оборванной записи (после последнего коммита) отбрасывается
+                if f.tell() != committed:
+                    f.truncate(committed)
+                    f.seek(committed)
+                f.write(np.ascontiguousarray(a).tobytes())
+        meta["rows"] += added
+        self._write_meta(dataset, key, meta)
+        return added
+
+    def delete(self, dataset, key):
+        """Удаляет набор dataset/key целиком (например, перед перезаписью истории)."""
+        shutil.rmtree(self._dir(dataset, key), ignore_errors=True)
+
+    def read(self, dataset, key, columns=None, start_ts=None):
+        """
+        { колонка: read-only memmap } по зафиксированным строкам (без копирования и парсинга).
+        start_ts — вернуть только строки с timestamp >= start_ts (срез по отсортированному timestamp).
+        """
+        meta = self._meta(dataset, key)
+        if meta is None:
+            return {}
+        rows = meta["rows"]
+        names = columns or list(meta["columns"])
+        result = {}
+        for name in names:
+            dtype = np.dtype(meta["columns"][name])
+            if rows == 0:
+                result[name] = np.empty(0, dtype=dtype)
+            else:
+                path = os.path.join(self._dir(dataset, key), f"{name}.bin")
+                result[name] = np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+        if start_ts is not None and rows:
+            ts = result["timestamp"] if "timestamp" in result else self.read(dataset, key, ["timestamp"])["timestamp"]
+            start = int(np.searchsorted(ts, start_ts, side="left"))
+            result = {name: a[start:] for name, a in result.items()}
+        return result
+
+    def read_frame(self, dataset, key, columns=None, start_ts=None):
+        data = self.read(dataset, key, columns, start_ts)
+        return pd.DataFrame({name: np.asarray(a) for name, a in data.items()})
+
+    def last_timestamp(self, dataset, key):
+        meta = self._meta(dataset, key)
+        if not meta or not meta["rows"] or "timestamp" not in meta["columns"]:
+            return None
+        ts = self.read(dataset, key, ["timestamp"])["timestamp"]
+        return int(ts[-1])
+
+
+# --- Конвертация существующих CSV ---
+
+def _csv_target(filename):
+    """По имени CSV определяет (dataset, key, collapse) или None; collapse — схлопывать повторы timestamp (свечи)."""
+    name = filename[:-4]
+    if name.endswith("_history"):
+        symbol, interval = name[:-len("_history")].rsplit("_", 1)
+        return f"history_{interval}", symbol, True
+    for suffix, dataset in (("_kline", "klines"), ("_ticker", "tickers"), ("_trades", "trades")):
+        if name.endswith(suffix):
+            return dataset, name[:-len(suffix)], dataset == "klines"
+    return None
+
+
+def convert_csv_file(path, store):
+    """
+    Переносит один CSV (history_data / collector) в колоночное хранилище.
+    Берутся числовые колонки, в том числе целиком пустые (NaN), чтобы схема не зависела от файла;
+    side (Buy/Sell) кодируется как 1/-1. Если набор уже есть, колонки приводятся к его схеме.
+    Для свечей повторы по timestamp (обновления формирующейся свечи) схлопываются в последнюю запись.
+    Повторный запуск ничего не дублирует: для свечей добавляются строки новее сохранённых, для сделок
+    и тикеров (timestamp в секундах, строк с одной секундой может быть много) в последней сохранённой
+    секунде пропускается столько строк, сколько их уже в хранилище.
+    """
+    target = _csv_target(os.path.basename(path))
+    if target is None:
+        return 0
+    dataset, key, collapse = target
+    df = pd.read_csv(path)
+    if df.empty:
+        return 0
+    if "side" in df:
+        df["side"] = df["side"].map({"Buy": 1, "Sell": -1}).fillna(0).astype(np.int8)
+    columns = {}
+    for col in df.columns:
+        if col == "timestamp":
+            columns[col] = df[col].astype(np.int64).to_numpy()
+        elif col == "side":
+            columns[col] = df[col].to_numpy()
+        else:
+            values = pd.to_numeric(df[col], errors="coerce")
+            # Текстовые колонки отбрасываются, пустая числовая (read_csv даёт float NaN) остаётся
+            if pd.api.types.is_numeric_dtype(df[col]) or values.notna().any():
+                columns[col] = values.astype(np.float64).to_numpy()
+    schema = store.schema(dataset, key)
+    if schema is not None:
+        n = len(df)
+        columns = {c: columns[c] if c in columns else np.full(n, np.nan) for c in schema}
+    if collapse:
+        frame = pd.DataFrame(columns).drop_duplicates("timestamp", keep="last").sort_values("timestamp")
+        columns = {c: frame[c].to_numpy() for c in frame.columns}
+        return store.append(dataset, key, columns, dedupe=True)
+    return store.append(dataset, key, _skip_stored_rows(store, dataset, key, columns))
+
+
+def _skip_stored_rows(store, dataset, key, columns):
+    """Строки CSV, которых ещё нет в наборе: новее последней секунды плюс недостающие в ней самой."""
+    last_ts = store.last_timestamp(dataset, key)
+    if last_ts is None:
+        return columns
+    stored = store.read(dataset, key, ["timestamp"])["timestamp"]
+    stored_in_last = len(stored) - int(np.searchsorted(stored, last_ts, side="left"))
+    ts = columns["timestamp"]
+    same = ts == last_ts
+    mask = (ts > last_ts) | (same & (np.cumsum(same) > stored_in_last))
+    return {c: a[mask] for c, a in columns.items()}
+
+
+def convert_csv_dir(directory, store):
+    total = 0
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".csv"):
+            continue
+        try:
+            added = convert_csv_file(os.path.join(directory, filename), store)
+            total += added
+            print(f"[CONVERT] {filename}: добавлено {added} строк")
+        except Exception as e:
+            print(f"[CONVERT] Ошибка конвертации {filename}: {e}")
+    return total
+
+
+if __name__ == "__main__":
+    # python -m core.columnar_store <каталог с CSV> [...] [--root market_data]
+    args = sys.argv[1:]
+    root = DEFAULT_ROOT
+    if "--root" in args:
+        i = args.index("--root")
+        root = args[i + 1]
+        del args[i:i + 2]
+    if not args:
+        print("Использование: python -m core.columnar_store <каталог с CSV> [...] [--root market_data]")
+        sys.exit(1)
+    store = ColumnarStore(root)
+    for directory in args:
+        print(f"[CONVERT] {directory}: всего добавлено {convert_csv_dir(directory, store)} строк")
@@ -1,54 +1,74 @@
-from indicators.tema import calculate_tema_lines
-from indicators.adx import calculate_adx
-from indicators.cmo import calculate_cmo
-from indicators.ema_slope import calculate_ema_slope
+from indicators.streaming import SymbolIndicators
+from strategies.tema_adx_cmo import check_signal_state, signal_from_values, TEMA_ADX_CMO_ENABLED
 from core.bybit_rest import BybitRestClient
 
 class IndicatorCache:
     def __init__(self, symbols, rest_client, timeframe):
-        self.cache = {}  # { symbol: {"df": df, "tema": ..., "adx": ..., "cmo": ..., "ema_slope": ..., "ema": ...} }
+        self.cache = {}  # { symbol: {"state": SymbolIndicators, "tema": {...}, "adx": ..., "cmo": ..., "ema_slope": ..., "ema": ...} }
         self.symbols = symbols
         self.rest_client = rest_client
         self.timeframe = timeframe
 
+    def _store(self, symbol, state):
+        values = state.values()
+        self.cache[symbol] = {
+            "state": state,
+            "tema": {k: v for k, v in values.items() if k.startswith("tema_")},
+            "adx": values["adx"],
+            "cmo": values["cmo"],
+            "ema_slope": values["ema_slope"],
+            "ema": values["ema"]
+        }
+
     def initialize(self):
         for symbol in self.symbols:
             df = self.rest_client.get_historical_candles(symbol, self.timeframe, limit=100)
             if df is not None and len(df) > 0:
-                tema = calculate_tema_lines(df['close'])
-                adx = calculate_adx(df)
-                cmo = calculate_cmo(df['close'])
-                # --- EMA slope ---
-                try:
-                    ema_slope, ema = calculate_ema_slope(df['close'])
-                except Exception:
-                    ema_slope, ema = None, None
-                self.cache[symbol] = {
-                    "df": df,
-                    "tema": tema,
-                    "adx": adx,
-                    "cmo": cmo,
-                    "ema_slope": ema_slope,
-                    "ema": ema
-                }
+                self._store(symbol, SymbolIndicators().feed_frame(df))
+
+    def initialize_from_history(self, history_cache):
+        """Прогрев потоковых индикаторов по уже загруженной истории { symbol: DataFrame }."""
+        for symbol, df in history_cache.items():
+            if df is not None and len(df) > 0:
+                self._store(symbol, SymbolIndicators().feed_frame(df))
 
     def update(self, symbol, new_candle):
+        # O(1) на свечу: обновляется только состояние индикаторов, история не пересчитывается
         if symbol in self.cache:
-            df = self.cache[symbol]["df"]
-            df = df.append(new_candle, ignore_index=True)
-            tema = calculate_tema_lines(df['close'])
-            adx = calculate_adx(df)
-            cmo = calculate_cmo(df['close'])
-            # --- EMA slope ---
-            try:
-                ema_slope, ema = calculate_ema_slope(df['close'])
-            except Exception:
-                ema_slope, ema = None, None
-            self.cache[symbol] = {
-                "df": df,
-                "tema": tema,
-                "adx": adx,
-                "cmo": cmo,
-                "ema_slope": ema_slope,
-                "ema": ema
-            }
+            state = self.cache[symbol]["state"]
+            if state.update_candle(new_candle):
+                self._store(symbol, state)
+
+    def update_from_shared(self, symbol, shared_candles):
+        """Догоняет состояние по закрытым свечам из shared memory (core.shared_candles); возвращает число новых свечей."""
+        if symbol not in self.cache:
+            return 0
+        state = self.cache[symbol]["state"]
+        added = 0
+        for candle in shared_candles.closed_candles_since(symbol, state.last_timestamp):
+            if state.update_candle(candle):
+                added += 1
+        if added:
+            self._store(symbol, state)
+        return added
+
+    def get_signal(self, symbol):
+        if symbol not in self.cache:
+            return None
+        return check_signal_state(self.cache[symbol]["state"])
+
+    def get_intrabar_signal(self, symbol, shared_candles):
+        """Сигнал с учётом текущей (незакрытой) свечи из shared memory; состояние не меняется."""
+        if symbol not in self.cache or not TEMA_ADX_CMO_ENABLED:
+            return None
+        state = self.cache[symbol]["state"]
+        snapshot = shared_candles.read(symbol, 1)
+        if snapshot is None:
+            return None
+        columns, _ = snapshot
+        if not len(columns["timestamp"]) or (
+            state.last_timestamp is not None and columns["timestamp"][-1] <= state.last_timestamp
+        ):
+            return self.get_signal(symbol)
+        values = state.preview(columns["high"][-1], columns["low"][-1], columns["close"][-1])
+        return signal_from_values(values["tema_1"], values["tema_2"], values["tema_3"], values["adx"], values["cmo"])
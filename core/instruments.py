@@ -0,0 +1,166 @@
+import time
+import threading
+from decimal import Decimal, ROUND_FLOOR, ROUND_HALF_UP
+from config import INSTRUMENTS_CACHE_TTL
+
+class InstrumentInfo:
+    """Параметры торговли инструментом (tickSize, qtyStep, лимиты объёма и плеча)."""
+    __slots__ = (
+        "symbol", "tick_size", "qty_step", "min_order_qty", "max_order_qty",
+        "min_leverage", "max_leverage", "leverage_step", "price_decimals", "qty_decimals",
+    )
+
+    def __init__(self, symbol, tick_size, qty_step, min_order_qty, max_order_qty,
+                 min_leverage, max_leverage, leverage_step):
+        self.symbol = symbol
+        self.tick_size = tick_size
+        self.qty_step = qty_step
+        self.min_order_qty = min_order_qty
+        self.max_order_qty = max_order_qty
+        self.min_leverage = min_leverage
+        self.max_leverage = max_leverage
+        self.leverage_step = leverage_step
+        self.price_decimals = max(0, -tick_size.as_tuple().exponent)
+        self.qty_decimals = max(0, -qty_step.as_tuple().exponent)
+
+    @classmethod
+    def from_api(cls, item):
+        price_filter = item.get("priceFilter", {})
+        lot_filter = item.get("lotSizeFilter", {})
+        leverage_filter = item.get("leverageFilter", {})
+        return cls(
+            symbol=item["symbol"],
+            tick_size=Decimal(price_filter.get("tickSize") or "0.0001"),
+            qty_step=Decimal(lot_filter.get("qtyStep") or "0.001"),
+            min_order_qty=Decimal(lot_filter.get("minOrderQty") or "0.001"),
+            max_order_qty=Decimal(lot_filter.get("maxOrderQty") or "0") or None,
+            min_leverage=Decimal(leverage_filter.get("minLeverage") or "1"),
+            max_leverage=Decimal(leverage_filter.get("maxLeverage") or "1"),
+            leverage_step=Decimal(leverage_filter.get("leverageStep") or "0.01"),
+        )
+
+
+def quantize_to_step(value, step, rounding=ROUND_FLOOR):
+    """
+    Округление value до кратного step (Decimal, без погрешностей float).
+    float берётся с 15 значащими цифрами (точность double): 0.7 * 3 = 2.0999999999999996 считается 2.1,
+    иначе ROUND_FLOOR срезал бы его на целый шаг вниз.
+    """
+    value = Decimal(format(value, ".15g")) if isinstance(value, float) else Decimal(str(value))
+    return (value / step).to_integral_value(rounding=rounding) * step
+
+
+class InstrumentRegistry:
+    """
+    Кэш параметров всех инструментов категории: один bulk get_instruments_info (с пагинацией по cursor)
+    при старте, фоновое обновление раз в ttl секунд, округление цен/объёмов локально через Decimal.
+    Для символа, которого нет в кэше (новый листинг), делается одиночный запрос.
+    """
+
+    def __init__(self, session, category="linear", ttl=INSTRUMENTS_CACHE_TTL):
+        self.session = session
+        self.category = category
+        self.ttl = ttl
+        self._items = {}
+        self._lock = threading.Lock()
+        self._loaded_at = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load(self):
+        """Полная загрузка всех инструментов; возвращает их количество (0 при ошибке — кэш не трогаем)."""
+        items = {}
+        cursor = None
+        try:
+            while True:
+                kwargs = dict(category=self.category, limit=1000)
+                if cursor:
+                    kwargs["cursor"] = cursor
+                res = self.session.get_instruments_info(**kwargs)
+                result = res.get("result", {})
+                for item in result.get("list", []):
+                    items[item["symbol"]] = InstrumentInfo.from_api(item)
+                cursor = result.get("nextPageCursor")
+                if not cursor:
+                    break
+        except Exception as e:
+            print(f"❌ Ошибка загрузки справочника инструментов: {e}")
+            return 0
+        with self._lock:
+            self._items = items
+            self._loaded_at = time.time()
+        print(f"[INSTRUMENTS] Загружено инструментов: {len(items)}")
+        return len(items)
+
+    def start_background_refresh(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.ttl):
+            self.load()
+
+    def get(self, symbol):
+        info = self._items.get(symbol)
+        if info is not None:
+            return info
+        try:
+            res = self.session.get_instruments_info(category=self.category, symbol=symbol)
+            lst = res.get("result", {}).get("list", [])
+            if not lst:
+                return None
+            info = InstrumentInfo.from_api(lst[0])
+        except Exception as e:
+            print(f"❌ Ошибка получения информации по символу {symbol}: {e}")
+            return None
+        with self._lock:
+            self._items = {**self._items, symbol: info}
+        return info
+
+    def __contains__(self, symbol):
+        return symbol in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    # --- округление ---
+
+    def round_qty(self, symbol, qty):
+        """Объём вниз до кратного qtyStep, строкой с нужным числом знаков."""
+        info = self.get(symbol)
+        step = info.qty_step if info else Decimal("0.001")
+        decimals = info.qty_decimals if info else 3
+        return f"{quantize_to_step(qty, step):.{decimals}f}"
+
+    def round_price(self, symbol, price, rounding=ROUND_FLOOR):
+        """Цена до кратного tickSize (по умолчанию вниз), строкой с нужным числом знаков."""
+        info = self.get(symbol)
+        step = info.tick_size if info else Decimal("0.0001")
+        decimals = info.price_decimals if info else 4
+        return f"{quantize_to_step(price, step, rounding):.{decimals}f}"
+
+    def nearest_price(self, symbol, price):
+        """Цена до ближайшего кратного tickSize (для SL/TP/трейлинга)."""
+        return self.round_price(symbol, price, ROUND_HALF_UP)
+
+    def min_qty(self, symbol):
+        info = self.get(symbol)
+        return float(info.min_order_qty) if info else 0.001
+
+    def clamp_leverage(self, symbol, leverage):
+        """Плечо в пределах [minLeverage, maxLeverage] инструмента, кратное leverageStep."""
+        info = self.get(symbol)
+        if info is None:
+            return leverage
+        value = quantize_to_step(leverage, info.leverage_step)
+        value = min(max(value, info.min_leverage), info.max_leverage)
+        return float(value)
@@ -0,0 +1,176 @@
+import math
+import time
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Замеры задержек по этапам конвейера: биржевой ts → recv → parse → dispatch (ring/shared/persist)
+# → обновление индикаторов → check_signal → open_trade → ack биржи.
+# Каждый процесс (collector, стратегия) ведёт свой LatencyRecorder и печатает сводку [LATENCY]
+# раз в interval секунд; при заданном порту сводка также отдаётся JSON по http://127.0.0.1:<port>/.
+# Запись — одно вычисление логарифма и инкремент счётчика, без блокировок и аллокаций.
+
+BUCKET_RATIO = 1.01  # шаг корзин ~1% (как HDR-гистограмма с двумя значащими цифрами)
+_INV_LOG_RATIO = 1 / math.log(BUCKET_RATIO)
+MAX_BUCKETS = 2400   # верхняя граница ~1.01^2400 мкс ≈ 7 часов
+
+
+class LatencyHistogram:
+    """Гистограмма задержек в микросекундах с логарифмическими корзинами."""
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * MAX_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def record(self, us):
+        self.count += 1
+        self.total += us
+        if us < self.min:
+            self.min = us
+        if us > self.max:
+            self.max = us
+        index = int(math.log(us) * _INV_LOG_RATIO) + 1 if us >= 1 else 0
+        self.counts[min(index, MAX_BUCKETS - 1)] += 1
+
+    def percentile(self, q):
+        """Верхняя граница корзины, в которую попадает q-й процентиль (погрешность ≤ 1%)."""
+        if not self.count:
+            return 0.0
+        target = self.count * q / 100
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= target:
+                if index == MAX_BUCKETS - 1:
+                    return self.max  # последняя корзина собирает всё выше границы — её верх неизвестен
+                return min(BUCKET_RATIO ** index if index else 1.0, self.max)
+        return self.max
+
+    def summary(self):
+        """{count, mean/p50/p99/max} в миллисекундах."""
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count / 1000,
+            "p50_ms": self.percentile(50) / 1000,
+            "p99_ms": self.percentile(99) / 1000,
+            "max_ms": self.max / 1000,
+        }
+
+
+class LatencyRecorder:
+    def __init__(self, name="main"):
+        self.name = name
+        self.stages = {}   # этап -> LatencyHistogram
+        self.feed_lag = {}  # symbol -> [последний, максимум, EWMA] лаг ленты в мс
+        self.sources = {}  # имя -> функция без аргументов; результат добавляется в JSON-снимок
+        self._reporter = None
+        self._server = None
+        self._stop = threading.Event()
+
+    # --- запись ---
+
+    def record(self, stage, seconds):
+        hist = self.stages.get(stage)
+        if hist is None:
+            hist = self.stages[stage] = LatencyHistogram()
+        hist.record(seconds * 1e6 if seconds > 0 else 0.0)
+
+    def record_since(self, stage, started):
+        """Задержка от started (time.perf_counter()) до текущего момента."""
+        self.record(stage, time.perf_counter() - started)
+
+    def record_feed_lag(self, symbol, exchange_ts_ms, received=None):
+        """Лаг ленты: локальное время получения минус биржевой ts сообщения (оба — epoch)."""
+        lag_ms = (received if received is not None else time.time()) * 1000 - exchange_ts_ms
+        self.record("feed_lag", lag_ms / 1000)
+        entry = self.feed_lag.get(symbol)
+        if entry is None:
+            self.feed_lag[symbol] = [lag_ms, lag_ms, lag_ms]
+        else:
+            entry[0] = lag_ms
+            entry[1] = max(entry[1], lag_ms)
+            entry[2] += (lag_ms - entry[2]) * 0.05
+
+    # --- отчёт ---
+
+    def add_source(self, name, fn):
+        """Дополнительные метрики процесса (например, здоровье WS-шардов) в JSON-снимке."""
+        self.sources[name] = fn
+
+    def snapshot(self, top=10):
+        lags = sorted(self.feed_lag.items(), key=lambda item: -item[1][2])[:top]
+        snap = {
+            "process": self.name,
+            "stages": {stage: hist.summary() for stage, hist in list(self.stages.items())},
+            "feed_lag_top": {s: {"last_ms": v[0], "max_ms": v[1], "ewma_ms": v[2]} for s, v in lags},
+        }
+        for name, fn in list(self.sources.items()):
+            snap[name] = fn()
+        return snap
+
+    def summary(self):
+        snap = self.snapshot(top=5)
+        lines = [f"[LATENCY] {self.name}:"]
+        for stage, s in snap["stages"].items():
+            if s["count"]:
+                lines.append(f"  {stage:<20} n={s['count']:<8} p50={s['p50_ms']:.3f} мс  "
+                             f"p99={s['p99_ms']:.3f} мс  max={s['max_ms']:.3f} мс")
+        if snap["feed_lag_top"]:
+            worst = ", ".join(f"{s}={v['ewma_ms']:.0f}" for s, v in snap["feed_lag_top"].items())
+            lines.append(f"  лаг ленты (EWMA, мс): {worst}")
+        return "\n".join(lines)
+
+    def start_reporter(self, interval=60, port=0):
+        """Периодическая печать сводки и (если port) HTTP-endpoint с JSON-снимком."""
+        if interval and self._reporter is None:
+            self._stop.clear()
+            self._reporter = threading.Thread(target=self._report_loop, args=(interval,),
+                                              name=f"latency-{self.name}", daemon=True)
+            self._reporter.start()
+        if port and self._server is None:
+            self._server = self._serve(port)
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+        self._reporter = None
+
+    def _report_loop(self, interval):
+        while not self._stop.wait(interval):
+            print(self.summary())
+
+    def _serve(self, port):
+        recorder = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(recorder.snapshot(top=50)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        except OSError as e:
+            print(f"[LATENCY] Не удалось открыть порт {port} для метрик: {e}")
+            return None
+        threading.Thread(target=server.serve_forever, name=f"latency-http-{port}", daemon=True).start()
+        print(f"[LATENCY] Метрики {self.name}: http://127.0.0.1:{port}/")
+        return server
+
+
+# Один регистратор на процесс; имя задаётся при старте процесса (collector / strategy)
+recorder = LatencyRecorder()
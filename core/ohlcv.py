@@ -1,7 +1,9 @@
+import numpy as np
 import pandas as pd
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 import os  # <--- добавлено
+from core.columnar_store import ColumnarStore, KLINE_SCHEMA
 
 # Мапа для перевода формата таймфрейма в нужный для Bybit REST API
 TF_MAP = {
@@ -10,10 +12,34 @@ TF_MAP = {
     "1d": "D", "1w": "W", "1M": "M"
 }
 
+# Длительность свечи в секундах по интервалу Bybit (у "M" длина плавающая — инкрементальная догрузка не применяется)
+INTERVAL_SECONDS = {
+    "1": 60, "3": 180, "5": 300, "15": 900, "30": 1800,
+    "60": 3600, "120": 7200, "240": 14400, "360": 21600, "720": 43200,
+    "D": 86400, "W": 604800
+}
+
+# Максимум свечей в одном ответе get_kline
+KLINE_PAGE_LIMIT = 1000
+
+# Каталог прежних CSV-выгрузок истории
+HISTORY_CSV_DIR = "history_data"
+
 def format_interval(interval):
     """Преобразует '1m', '5m', '1h' и т.д. в формат для Bybit REST API."""
     return TF_MAP.get(str(interval), str(interval))
 
+def kline_list_to_frame(kline_list):
+    """Ответ get_kline (list of lists, от новых к старым) -> DataFrame по возрастанию timestamp (сек)."""
+    df = pd.DataFrame(
+        kline_list,
+        columns=["timestamp", "open", "high", "low", "close", "volume", "turnover"]
+    )
+    df["timestamp"] = (df["timestamp"].astype("int64") // 1000).astype(int)
+    for col in ["open", "high", "low", "close", "volume", "turnover"]:
+        df[col] = df[col].astype(float)
+    return df.sort_values("timestamp")
+
 def fetch_ohlcv_pybit(session, symbol, interval, limit=200):
     """
     Получение исторических OHLCV данных через REST API pybit по одной паре.
@@ -26,14 +52,7 @@ def fetch_ohlcv_pybit(session, symbol, interval, limit=200):
         if not kline_list:
             print(f"[PYBIT] Нет свечей для {symbol}")
             return pd.DataFrame()
-        df = pd.DataFrame(
-            kline_list,
-            columns=["timestamp", "open", "high", "low", "close", "volume", "turnover"]
-        )
-        df["timestamp"] = (df["timestamp"].astype("int64") // 1000).astype(int)
-        for col in ["open", "high", "low", "close", "volume", "turnover"]:
-            df[col] = df[col].astype(float)
-        df = df.sort_values("timestamp")
+        df = kline_list_to_frame(kline_list)
         print(f"[DEBUG] {symbol} Last 5 candles MSK:\n",
               df.tail(5).assign(
                 msk_time=lambda x: pd.to_datetime(x["timestamp"], unit="s") + pd.Timedelta(hours=3)
@@ -65,9 +84,12 @@ def chunked(iterable, n):
     for i in range(0, len(iterable), n):
         yield iterable[i:i + n]
 
-def load_initial_history_pybit(session, symbols, interval, limit, max_workers, chunk_size=110, chunk_delay=1):
+def load_initial_history_pybit(session, symbols, interval, limit, max_workers, chunk_size=110, chunk_delay=1,
+                               store=None, save_csv=True):
     """
     Получение исторических свечей по всем рабочим парам через ThreadPoolExecutor с обработкой чанками.
+    История сохраняется в колоночное хранилище (store, по умолчанию ColumnarStore()) в набор history_{interval}
+    и, как раньше, в history_data/*.csv (save_csv=False — только хранилище).
     """
     interval = format_interval(interval)
     candles_cache = {}
@@ -90,8 +112,22 @@ def load_initial_history_pybit(session, symbols, interval, limit, max_workers, c
                     candles_cache[symbol] = df
         time.sleep(chunk_delay)  # Пауза между чанками для обхода лимита
 
-    # === Сохранение всех данных в отдельные файлы после сбора ===
-    save_dir = "history_data"
+    # === Сохранение в колоночное хранилище (бинарные колонки, чтение через memmap) ===
+    store = store or ColumnarStore()
+    for symbol, df in candles_cache.items():
+        try:
+            # Формирующаяся свеча не сохраняется — иначе её закрытая версия не попадёт в хранилище
+            added = store.append(f"history_{interval}", symbol, closed_candles(df, interval), schema=KLINE_SCHEMA, dedupe=True)
+            print(f"[SAVE] История для {symbol}: добавлено {added} свечей в {store.root}/history_{interval}")
+        except Exception as e:
+            print(f"[SAVE] Ошибка при сохранении {symbol}: {e}")
+
+    if save_csv:
+        save_history_csv(candles_cache, interval)
+    return candles_cache
+
+def save_history_csv(candles_cache, interval, save_dir=HISTORY_CSV_DIR):
+    """Прежний формат истории для внешних читателей: history_data/{symbol}_{interval}_history.csv на пару."""
     os.makedirs(save_dir, exist_ok=True)
     for symbol, df in candles_cache.items():
         # Имя файла с подстановкой символа и таймфрейма
@@ -103,4 +139,133 @@ def load_initial_history_pybit(session, symbols, interval, limit, max_workers, c
         except Exception as e:
             print(f"[SAVE] Ошибка при сохранении {symbol}: {e}")
 
-    return candles_cache
\ No newline at end of file
+def closed_candles(df, interval, now=None):
+    """Оставляет только закрытые свечи (timestamp + длительность <= now)."""
+    seconds = INTERVAL_SECONDS.get(format_interval(interval))
+    if seconds is None or df.empty:
+        return df
+    now = time.time() if now is None else now
+    return df[df["timestamp"] + seconds <= now]
+
+def fetch_ohlcv_paged_pybit(session, symbol, interval, limit, start_ts=None, end_ts=None):
+    """
+    Свечи с постраничной загрузкой сверх лимита KLINE_PAGE_LIMIT одного запроса.
+    Идёт от новых к старым: не больше limit свечей, не старше start_ts и не новее end_ts (сек).
+    Возвращает (DataFrame по возрастанию timestamp, число запросов).
+    """
+    interval = format_interval(interval)
+    frames = []
+    requests_made = 0
+    remaining = limit
+    end_ms = end_ts * 1000 if end_ts is not None else None
+    while remaining > 0:
+        kwargs = dict(category="linear", symbol=symbol, interval=str(interval), limit=min(KLINE_PAGE_LIMIT, remaining))
+        if start_ts is not None:
+            kwargs["start"] = int(start_ts) * 1000
+        if end_ms is not None:
+            kwargs["end"] = int(end_ms)
+        data = session.get_kline(**kwargs)
+        requests_made += 1
+        kline_list = data.get("result", {}).get("list", [])
+        if not kline_list:
+            break
+        page = kline_list_to_frame(kline_list)
+        frames.append(page)
+        remaining -= len(page)
+        oldest = int(page["timestamp"].iloc[0])
+        if len(page) < kwargs["limit"] or (start_ts is not None and oldest <= start_ts):
+            break
+        end_ms = oldest * 1000 - 1
+    if not frames:
+        return pd.DataFrame(), requests_made
+    df = pd.concat(frames).drop_duplicates("timestamp").sort_values("timestamp").reset_index(drop=True)
+    if start_ts is not None:
+        df = df[df["timestamp"] >= start_ts]
+    return df.tail(limit).reset_index(drop=True), requests_made
+
+def find_history_gaps(timestamps, seconds):
+    """Разрывы непрерывности: список (timestamp до разрыва, timestamp после разрыва)."""
+    ts = pd.Series(timestamps).reset_index(drop=True)
+    diffs = ts.diff()
+    idx = diffs[diffs != seconds].index[1:] if len(ts) > 1 else []
+    return [(int(ts[i - 1]), int(ts[i])) for i in idx]
+
+def load_history_incremental(session, symbols, interval, limit, max_workers, chunk_size=110, chunk_delay=1, store=None,
+                             save_csv=True):
+    """
+    Тёплый старт истории: сначала читается локальное колоночное хранилище (history_{interval}),
+    по каждой паре догружаются только недостающие закрытые свечи после последнего сохранённого timestamp
+    (постранично, если разрыв больше лимита одного запроса). Если окно из limit свечей не непрерывно
+    (пропуски после простоя/старых запусков), история пары перезагружается целиком и перезаписывается.
+    session — pybit HTTP или core.async_rest.BybitAsyncClient (общий пул соединений и token bucket,
+    паузы chunk_delay тогда не нужны).
+    Возвращает { symbol: DataFrame } с последними limit закрытыми свечами;
+    save_csv — как load_initial_history_pybit, окно пишется и в history_data/*.csv.
+    """
+    interval = format_interval(interval)
+    seconds = INTERVAL_SECONDS.get(interval)
+    store = store or ColumnarStore()
+    dataset = f"history_{interval}"
+    candles_cache = {}
+
+    def stored_tail(symbol):
+        data = store.read(dataset, symbol)
+        if not data:
+            return pd.DataFrame()
+        return pd.DataFrame({k: np.array(v[-limit:]) for k, v in data.items()})
+
+    def worker(symbol):
+        requests_made = 0
+        try:
+            now = time.time()
+            last_ts = store.last_timestamp(dataset, symbol)
+            rewrite = seconds is None or last_ts is None or (now - last_ts) / seconds > limit
+            if not rewrite:
+                new, requests_made = fetch_ohlcv_paged_pybit(session, symbol, interval, limit, start_ts=last_ts + seconds)
+                new = closed_candles(new, interval, now)
+                if not new.empty:
+                    store.append(dataset, symbol, new, schema=KLINE_SCHEMA, dedupe=True)
+                df = stored_tail(symbol)
+                gaps = find_history_gaps(df["timestamp"], seconds)
+                if gaps:
+                    print(f"[HISTORY] {symbol}: разрывы в истории {gaps[:3]} — полная перезагрузка")
+                    rewrite = True
+                else:
+                    # Последняя закрытая свеча — та, что закончилась не позже now
+                    lag = int((now - seconds - int(df["timestamp"].iloc[-1])) // seconds)
+                    if lag > 0:
+                        print(f"[HISTORY] {symbol}: биржа не отдала последние {lag} закрытых свечей")
+                    print(f"[HISTORY] {symbol}: из хранилища {len(df) - len(new)} свечей, догружено {len(new)} ({requests_made} запр.)")
+            if rewrite:
+                # end — до последней закрытой свечи: формирующаяся не занимает место в limit
+                end_ts = int(now) - seconds if seconds is not None else None
+                full, n = fetch_ohlcv_paged_pybit(session, symbol, interval, limit, end_ts=end_ts)
+                requests_made += n
+                full = closed_candles(full, interval, now)
+                if full.empty:
+                    print(f"[HISTORY] {symbol}: свечи не получены!")
+                    return symbol, full, requests_made
+                store.delete(dataset, symbol)
+                store.append(dataset, symbol, full, schema=KLINE_SCHEMA)
+                df = full.reset_index(drop=True)
+                if seconds is not None and find_history_gaps(df["timestamp"], seconds):
+                    print(f"[HISTORY] {symbol}: биржа отдаёт историю с пропусками — используем как есть")
+                print(f"[HISTORY] {symbol}: загружено {len(df)} свечей ({requests_made} запр.)")
+            return symbol, df, requests_made
+        except Exception as e:
+            print(f"[HISTORY] Ошибка загрузки истории {symbol}: {e}")
+            return symbol, pd.DataFrame(), requests_made
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for chunk in chunked(symbols, chunk_size):
+            chunk_requests = 0
+            for fut in as_completed([executor.submit(worker, symbol) for symbol in chunk]):
+                symbol, df, requests_made = fut.result()
+                chunk_requests += requests_made
+                if not df.empty:
+                    candles_cache[symbol] = df
+            if chunk_requests > len(chunk):
+                time.sleep(chunk_delay)  # пауза только если чанк реально нагрузил REST
+    if save_csv:
+        save_history_csv(candles_cache, interval)
+    return candles_cache
@@ -0,0 +1,281 @@
+import sys
+import csv
+import json
+import time
+import random
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from core.columnar_store import DEFAULT_ROOT
+from core.backtest import list_symbols, load_candles, stack_candles, exit_model, exit_outcomes, walk_signals
+from indicators.vectorized import tema_matrix, adx_matrix, cmo_matrix
+from strategies.tema_adx_cmo import check_signal_vectorized
+import config
+
+# Перебор параметров стратегии (сетка или случайная выборка из сетки) по сохранённой истории.
+# Дорогие части считаются один раз и переиспользуются всеми комбинациями:
+# - TEMA / ADX / CMO — один раз на каждый встретившийся период (а не на комбинацию);
+# - исходы позиций (exit_outcomes) — один раз на каждую модель выхода (SL / TP / трейлинг)
+#   и только для свечей, где сигнал есть хотя бы в одной комбинации;
+# на каждую комбинацию остаются только векторные сравнения с порогами и проход по входам.
+# Единица работы пула процессов — пачка символов со всеми комбинациями; частичные агрегаты
+# (число сделок, PnL, дневной PnL для просадки) сливаются в основном процессе.
+#
+# python -m core.optimizer [--grid grid.json] [--samples N] [--seed S] [--source store|klines|<каталог>]
+#                          [--interval 1h] [--root market_data] [--processes N] [--sort total_pnl_usd]
+#                          [--out optimizer_results.csv]
+#
+# grid.json — { параметр: [значения] }, например {"adx_long": [20, 25, 30], "tema_periods": [[8, 14, 21], [5, 13, 34]]}
+
+SIGNAL_PARAMS = ("tema_periods", "adx_period", "cmo_period", "adx_long", "adx_short", "cmo_long", "cmo_short")
+EXIT_PARAMS = ("sl_percent", "tp_levels", "tp_percentages", "trailing_activation_percent", "trailing_percent")
+
+# Сетка по умолчанию: пороги и SL вокруг текущих значений config
+DEFAULT_GRID = {
+    "adx_long": [20, 25, 30],
+    "cmo_long": [0, 10, 20],
+    "sl_percent": [3.0, 5.0, 7.0],
+}
+
+
+def default_params():
+    return {
+        "tema_periods": tuple(config.TEMA_PERIODS),
+        "adx_period": config.ADX_PERIOD,
+        "cmo_period": config.CMO_PERIOD,
+        "adx_long": config.TEMA_ADX_THRESHOLD_LONG,
+        "adx_short": config.TEMA_ADX_THRESHOLD_SHORT,
+        "cmo_long": config.TEMA_CMO_THRESHOLD_LONG,
+        "cmo_short": config.TEMA_CMO_THRESHOLD_SHORT,
+        "sl_percent": config.SL_PERCENT,
+        "tp_levels": tuple(config.TP_LEVELS),
+        "tp_percentages": tuple(config.TP_PERCENTAGES),
+        "trailing_activation_percent": config.TRAILING_STOP_ACTIVATION_PERCENT if config.USE_TRAILING_STOP else 0,
+        "trailing_percent": config.TRAILING_STOP_PERCENT,
+    }
+
+
+def build_combinations(grid, samples=None, seed=0):
+    """Полная сетка или samples случайных различных комбинаций из неё; списки значений приводятся к tuple."""
+    base = default_params()
+    unknown = set(grid) - set(base)
+    if unknown:
+        raise ValueError(f"Неизвестные параметры сетки: {sorted(unknown)}")
+    keys = list(grid)
+    values = [[tuple(v) if isinstance(v, list) else v for v in grid[k]] for k in keys]
+    total = int(np.prod([len(v) for v in values])) if values else 1
+    if samples is None or samples >= total:
+        picks = itertools.product(*values)
+    else:
+        rng = random.Random(seed)
+        chosen = set()
+        while len(chosen) < samples:
+            chosen.add(tuple(rng.randrange(len(v)) for v in values))
+        picks = (tuple(v[i] for v, i in zip(values, idx)) for idx in sorted(chosen))
+    return [{**base, **dict(zip(keys, pick))} for pick in picks]
+
+
+def _signal_key(params):
+    return tuple(params[k] for k in SIGNAL_PARAMS)
+
+
+def _exit_key(params):
+    return tuple(params[k] for k in EXIT_PARAMS)
+
+
+# --- работа процесса пула ---
+
+def evaluate_chunk(symbols, combos, source="store", interval=config.TIMEFRAME, root=DEFAULT_ROOT):
+    """
+    Все комбинации по пачке символов. Возвращает частичные агрегаты по каждой комбинации:
+    (сделок, прибыльных, сумма PnL %, прибыль %, убыток %, дни, дневной PnL %).
+    """
+    candles = {}
+    for symbol in symbols:
+        data = load_candles(symbol, source, interval, root)
+        if data is not None and len(data["close"]) > 1:
+            candles[symbol] = data
+    if not candles:
+        return [None] * len(combos)
+    m = stack_candles(candles)
+    length = m["close"].shape[1]
+    starts = [length - len(c["close"]) for c in candles.values()]
+    days = [np.asarray(c["timestamp"], dtype=np.int64) // 86400 for c in candles.values()]
+
+    # Индикаторы — по одному разу на период
+    tema, adx, cmo = {}, {}, {}
+
+    def signals_for(key):
+        params = dict(zip(SIGNAL_PARAMS, key))
+        indicators = {}
+        for k, p in enumerate(params["tema_periods"]):
+            if p not in tema:
+                tema[p] = tema_matrix(m["close"], p)
+            indicators[f"tema_{k+1}"] = tema[p]
+        if params["adx_period"] not in adx:
+            adx[params["adx_period"]] = adx_matrix(m["high"], m["low"], m["close"], params["adx_period"])
+        if params["cmo_period"] not in cmo:
+            cmo[params["cmo_period"]] = cmo_matrix(m["close"], params["cmo_period"])
+        indicators["adx"] = adx[params["adx_period"]]
+        indicators["cmo"] = cmo[params["cmo_period"]]
+        thresholds = {k: params[k] for k in ("adx_long", "adx_short", "cmo_long", "cmo_short")}
+        return check_signal_vectorized(indicators, index=None, thresholds=thresholds)
+
+    # Свечи-кандидаты на вход по направлениям (объединение по всем комбинациям сигналов)
+    signal_keys = list(dict.fromkeys(_signal_key(c) for c in combos))
+    candidates = {1: np.zeros(m["close"].shape, dtype=bool), -1: np.zeros(m["close"].shape, dtype=bool)}
+    for key in signal_keys:
+        signals = signals_for(key)
+        candidates[1] |= signals == 1
+        candidates[-1] |= signals == -1
+
+    results = [None] * len(combos)
+    groups = {}  # модель выхода -> { сигнальные параметры -> [индексы комбинаций] }
+    for index, combo in enumerate(combos):
+        groups.setdefault(_exit_key(combo), {}).setdefault(_signal_key(combo), []).append(index)
+
+    for exit_key, by_signal in groups.items():
+        model = exit_model(**dict(zip(EXIT_PARAMS, exit_key)))
+        outcomes = []
+        for row, c in enumerate(candles.values()):
+            start = starts[row]
+            outcomes.append({
+                d: exit_outcomes(c["high"], c["low"], c["close"], model, d,
+                                 entries=np.flatnonzero(candidates[d][row, start:]))
+                for d in (1, -1)
+            })
+        for signal_key, indices in by_signal.items():
+            signals = signals_for(signal_key)
+            pnl, exit_days = [np.empty(0)], [np.empty(0, dtype=np.int64)]
+            for row in range(len(candles)):
+                out = outcomes[row]
+                walked = walk_signals(signals[row, starts[row]:], out)
+                if not walked:
+                    continue
+                bars, directions = np.array(walked).T
+                for d in (1, -1):
+                    entries = bars[directions == d]
+                    pnl.append(out[d]["pnl_percent"][entries])
+                    exit_days.append(days[row][out[d]["exit_bar"][entries]])
+            partial = _partial_stats(np.concatenate(pnl), np.concatenate(exit_days))
+            for i in indices:
+                results[i] = partial
+    return results
+
+
+def _partial_stats(pnl, exit_days):
+    if not len(pnl):
+        return None
+    unique_days, inverse = np.unique(exit_days, return_inverse=True)
+    return {
+        "trades": len(pnl),
+        "wins": int((pnl > 0).sum()),
+        "pnl_sum": float(pnl.sum()),
+        "profit": float(pnl[pnl > 0].sum()),
+        "loss": float(-pnl[pnl < 0].sum()),
+        "days": unique_days,
+        "daily": np.bincount(inverse, weights=pnl),
+    }
+
+
+# --- слияние и отчёт ---
+
+def _merge(totals, partial):
+    if partial is None:
+        return totals
+    if totals is None:
+        return {**partial, "days": [partial["days"]], "daily": [partial["daily"]]}
+    for k in ("trades", "wins", "pnl_sum", "profit", "loss"):
+        totals[k] += partial[k]
+    totals["days"].append(partial["days"])
+    totals["daily"].append(partial["daily"])
+    return totals
+
+
+def _final_stats(totals, notional):
+    if totals is None:
+        return {"trades": 0, "win_rate": 0.0, "total_pnl_usd": 0.0, "avg_pnl_percent": 0.0,
+                "profit_factor": 0.0, "max_drawdown_usd": 0.0}
+    days = np.concatenate(totals["days"])
+    daily = np.concatenate(totals["daily"])
+    order_days, inverse = np.unique(days, return_inverse=True)
+    equity = np.cumsum(np.bincount(inverse, weights=daily)) / 100 * notional
+    drawdown = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:] - equity
+    return {
+        "trades": totals["trades"],
+        "win_rate": totals["wins"] / totals["trades"] * 100,
+        "total_pnl_usd": totals["pnl_sum"] / 100 * notional,
+        "avg_pnl_percent": totals["pnl_sum"] / totals["trades"],
+        "profit_factor": totals["profit"] / totals["loss"] if totals["loss"] > 0 else float("inf"),
+        "max_drawdown_usd": float(drawdown.max()),
+    }
+
+
+def run_optimizer(combos, source="store", interval=config.TIMEFRAME, root=DEFAULT_ROOT, symbols=None,
+                  processes=None, chunk_size=10, sort_by="total_pnl_usd"):
+    """Оценивает все комбинации по вселенной; возвращает список строк {параметры..., метрики...} по убыванию sort_by."""
+    symbols = symbols or list_symbols(source, interval, root)
+    chunks = [symbols[k:k + chunk_size] for k in range(0, len(symbols), chunk_size)]
+    totals = [None] * len(combos)
+
+    def merge(chunk_results):
+        for index, partial in enumerate(chunk_results):
+            totals[index] = _merge(totals[index], partial)
+
+    if processes == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            merge(evaluate_chunk(chunk, combos, source, interval, root))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [pool.submit(evaluate_chunk, chunk, combos, source, interval, root) for chunk in chunks]
+            for fut in futures:
+                merge(fut.result())
+
+    notional = config.TRADE_AMOUNT * config.LEVERAGE
+    rows = [{**combo, **_final_stats(total, notional)} for combo, total in zip(combos, totals)]
+    rows.sort(key=lambda r: r[sort_by], reverse=sort_by != "max_drawdown_usd")
+    return rows
+
+
+def write_results(rows, path):
+    if not rows:
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: "/".join(map(str, v)) if isinstance(v, tuple) else v for k, v in row.items()})
+
+
+def _parse_args(args):
+    options = {"--grid": None, "--samples": None, "--seed": "0", "--source": "store", "--interval": config.TIMEFRAME,
+               "--root": DEFAULT_ROOT, "--processes": None, "--sort": "total_pnl_usd",
+               "--out": "optimizer_results.csv"}
+    while args:
+        key = args.pop(0)
+        if key not in options or not args:
+            print("Использование: python -m core.optimizer [--grid grid.json] [--samples N] [--seed S] "
+                  "[--source store|klines|<каталог>] [--interval 1h] [--root market_data] [--processes N] "
+                  "[--sort total_pnl_usd] [--out optimizer_results.csv]")
+            sys.exit(1)
+        options[key] = args.pop(0)
+    return options
+
+
+if __name__ == "__main__":
+    opts = _parse_args(sys.argv[1:])
+    grid = DEFAULT_GRID
+    if opts["--grid"]:
+        with open(opts["--grid"]) as f:
+            grid = json.load(f)
+    combos = build_combinations(grid, int(opts["--samples"]) if opts["--samples"] else None, int(opts["--seed"]))
+    print(f"[OPTIMIZER] Комбинаций: {len(combos)}")
+    started = time.perf_counter()
+    rows = run_optimizer(combos, opts["--source"], opts["--interval"], opts["--root"],
+                         processes=int(opts["--processes"]) if opts["--processes"] else None, sort_by=opts["--sort"])
+    print(f"[OPTIMIZER] Готово за {time.perf_counter() - started:.1f} с, результаты в {opts['--out']}")
+    write_results(rows, opts["--out"])
+    for row in rows[:10]:
+        params = ", ".join(f"{k}={row[k]}" for k in grid)
+        print(f"[OPTIMIZER] {params}: сделок={row['trades']}, PnL={row['total_pnl_usd']:.2f}$, "
+              f"win={row['win_rate']:.1f}%, PF={row['profit_factor']:.2f}, DD={row['max_drawdown_usd']:.2f}$")
@@ -0,0 +1,197 @@
+import numpy as np
+from bisect import bisect_left
+
+# L2-стакан по символу из публичного WS Bybit v5 (orderbook.1 / 50 / 200).
+# Каждая сторона — отсортированные numpy-массивы ключей и объёмов фиксированной ёмкости:
+# ключ = цена для ask и -цена для bid, поэтому обе стороны идут по возрастанию ключа
+# и лучший уровень всегда в позиции 0.
+#
+# Семантика Bybit:
+#   snapshot (или u == 1 — рестарт сервиса биржи) полностью заменяет стакан;
+#   delta: объём "0" — удалить уровень, иначе вставить/заменить;
+#   u (update id) у delta должен быть ровно предыдущий u + 1, seq (cross sequence) не убывает.
+# Разрыв u или откат seq — стакан помечается невалидным, delta игнорируются до нового snapshot
+# (collector переподписывает топик, биржа присылает snapshot).
+
+
+class BookSide:
+    """Одна сторона стакана: ключи по возрастанию и объёмы, n активных уровней."""
+    __slots__ = ("keys", "sizes", "n", "sign", "_cum")
+
+    def __init__(self, capacity, sign):
+        self.keys = np.empty(capacity, dtype=np.float64)
+        self.sizes = np.empty(capacity, dtype=np.float64)
+        self.n = 0
+        self.sign = sign  # 1 — ask, -1 — bid
+        self._cum = None  # накопленные объёмы, пересчитываются лениво после изменений
+
+    def load(self, levels):
+        """Полная замена стороны уровнями [[price, size], ...] (строки или числа)."""
+        capacity = len(self.keys)
+        if levels:
+            arr = np.asarray(levels, dtype=np.float64).reshape(-1, 2)
+            arr = arr[arr[:, 1] > 0]
+            keys = arr[:, 0] * self.sign
+            order = np.argsort(keys, kind="stable")[:capacity]
+            n = len(order)
+            self.keys[:n] = keys[order]
+            self.sizes[:n] = arr[order, 1]
+            self.n = n
+        else:
+            self.n = 0
+        self._cum = None
+
+    def apply(self, levels):
+        """Применение delta-уровней к стороне."""
+        keys, sizes, capacity = self.keys, self.sizes, len(self.keys)
+        n = self.n
+        for price, size in levels:
+            key = float(price) * self.sign
+            size = float(size)
+            i = bisect_left(keys, key, 0, n)
+            hit = i < n and keys[i] == key
+            if size == 0:
+                if hit:
+                    keys[i:n - 1] = keys[i + 1:n]
+                    sizes[i:n - 1] = sizes[i + 1:n]
+                    n -= 1
+            elif hit:
+                sizes[i] = size
+            else:
+                if n == capacity:
+                    if i >= capacity:
+                        continue  # уровень хуже всех хранимых
+                    n -= 1  # вытесняем худший
+                keys[i + 1:n + 1] = keys[i:n]
+                sizes[i + 1:n + 1] = sizes[i:n]
+                keys[i] = key
+                sizes[i] = size
+                n += 1
+        self.n = n
+        self._cum = None
+
+    def best(self):
+        """(цена, объём) лучшего уровня или None"""
+        if not self.n:
+            return None
+        return float(self.keys[0] * self.sign), float(self.sizes[0])
+
+    def depth(self, levels):
+        """Суммарный объём лучших levels уровней (O(1) после первого запроса с момента изменения)."""
+        if not self.n or levels <= 0:
+            return 0.0
+        if self._cum is None:
+            self._cum = np.cumsum(self.sizes[:self.n])
+        return float(self._cum[min(levels, self.n) - 1])
+
+    def levels(self, n=None):
+        """Копия (цены, объёмы) лучших n уровней, от лучшего к худшему."""
+        n = self.n if n is None else min(n, self.n)
+        return self.keys[:n] * self.sign, self.sizes[:n].copy()
+
+
+class L2Book:
+    """Стакан символа: две стороны BookSide и состояние последовательности u/seq."""
+    __slots__ = ("symbol", "depth_limit", "bids", "asks", "update_id", "seq", "ts", "valid",
+                 "snapshots", "deltas", "resyncs")
+
+    def __init__(self, symbol, depth=50):
+        self.symbol = symbol
+        self.depth_limit = depth
+        # Запас ёмкости: в delta уровень может войти раньше, чем биржа удалит вытесненный
+        self.bids = BookSide(depth * 2, -1)
+        self.asks = BookSide(depth * 2, 1)
+        self.update_id = 0
+        self.seq = 0
+        self.ts = 0
+        self.valid = False
+        self.snapshots = 0
+        self.deltas = 0
+        self.resyncs = 0
+
+    def apply(self, msg_type, data, ts=0):
+        """
+        Применяет сообщение orderbook (data — поле "data" сообщения Bybit).
+        Возвращает False, если обнаружен разрыв и нужен новый snapshot (переподписка).
+        """
+        u = int(data.get("u", 0))
+        seq = int(data.get("seq", 0))
+        if msg_type == "snapshot" or u == 1:
+            self.bids.load(data.get("b", ()))
+            self.asks.load(data.get("a", ()))
+            self.update_id, self.seq, self.ts = u, seq, ts
+            self.valid = True
+            self.snapshots += 1
+            return True
+        if not self.valid:
+            return True  # ждём snapshot после переподписки
+        if u != self.update_id + 1 or (seq and seq < self.seq):
+            self.valid = False
+            self.resyncs += 1
+            return False
+        self.bids.apply(data.get("b", ()))
+        self.asks.apply(data.get("a", ()))
+        self.update_id, self.ts = u, ts
+        if seq:
+            self.seq = seq
+        self.deltas += 1
+        return True
+
+    # --- запросы ---
+
+    def best_bid(self):
+        return self.bids.best()
+
+    def best_ask(self):
+        return self.asks.best()
+
+    def mid(self):
+        if not (self.bids.n and self.asks.n):
+            return None
+        return float(self.asks.keys[0] - self.bids.keys[0]) / 2
+
+    def spread(self):
+        if not (self.bids.n and self.asks.n):
+            return None
+        return float(self.asks.keys[0] + self.bids.keys[0])
+
+    def depth(self, levels):
+        """(объём bid, объём ask) по лучшим levels уровням"""
+        return self.bids.depth(levels), self.asks.depth(levels)
+
+    def imbalance(self, levels=1):
+        """(bid - ask) / (bid + ask) по объёму лучших levels уровней, от -1 до 1"""
+        bid, ask = self.depth(levels)
+        total = bid + ask
+        return (bid - ask) / total if total else 0.0
+
+    def snapshot(self, levels=None):
+        """Копия стакана: {bids: (цены, объёмы), asks: (цены, объёмы), u, seq, ts}"""
+        levels = self.depth_limit if levels is None else levels
+        return {
+            "bids": self.bids.levels(levels),
+            "asks": self.asks.levels(levels),
+            "u": self.update_id,
+            "seq": self.seq,
+            "ts": self.ts,
+        }
+
+
+class OrderBookStore:
+    """Стаканы всех символов процесса; создаются при первом сообщении по символу."""
+
+    def __init__(self, depth=50):
+        self.depth = depth
+        self._books = {}
+
+    def __contains__(self, symbol):
+        return symbol in self._books
+
+    def get(self, symbol):
+        book = self._books.get(symbol)
+        if book is None:
+            book = self._books[symbol] = L2Book(symbol, self.depth)
+        return book
+
+    def symbols(self):
+        return list(self._books)
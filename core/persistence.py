@@ -0,0 +1,144 @@
+import os
+import csv
+import time
+import queue
+import threading
+from collections import OrderedDict
+
+class CsvWriteBehind:
+    """
+    Write-behind запись CSV для collector.
+    submit() только кладёт строку в очередь (без I/O в event loop), фоновый поток-писатель
+    держит файлы открытыми (LRU до max_open_files) и сбрасывает строки пачками:
+    по накоплению flush_rows строк или раз в flush_interval секунд.
+    Если очередь переполнена, строка отбрасывается и учитывается в метрике dropped.
+    """
+
+    def __init__(self, flush_rows=1000, flush_interval=1.0, max_queue=200_000, max_open_files=256,
+                 metrics_interval=60.0):
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_open_files = max_open_files
+        self.metrics_interval = metrics_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._files = OrderedDict()  # path -> (file, csv.writer)
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._metrics = {
+            "rows_written": 0,
+            "flushes": 0,
+            "dropped": 0,
+            "write_errors": 0,  # строки, не записанные из-за ошибки файла
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "max_queue_depth": 0,
+        }
+
+    # --- вызывается из event loop ---
+
+    def submit(self, path, row):
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait((path, row))
+        except queue.Full:
+            self._metrics["dropped"] += 1
+
+    def metrics(self):
+        with self._lock:
+            result = dict(self._metrics)
+        result["queue_depth"] = self._queue.qsize()
+        return result
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="csv-write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        """Останавливает писателя, дописывая всё, что осталось в очереди."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    # --- поток-писатель ---
+
+    def _run(self):
+        batch = {}
+        pending = 0
+        last_flush = time.monotonic()
+        last_report = last_flush
+        while True:
+            stopping = self._stop.is_set()
+            try:
+                path, row = self._queue.get(timeout=0.05 if not stopping else 0)
+                batch.setdefault(path, []).append(row)
+                pending += 1
+            except queue.Empty:
+                if stopping:
+                    break
+            now = time.monotonic()
+            if pending and (pending >= self.flush_rows or now - last_flush >= self.flush_interval):
+                self._flush(batch, pending)
+                batch = {}
+                pending = 0
+                last_flush = now
+            if self.metrics_interval and now - last_report >= self.metrics_interval:
+                last_report = now
+                m = self.metrics()
+                print(f"[PERSIST] очередь={m['queue_depth']} (max {m['max_queue_depth']}), "
+                      f"записано={m['rows_written']}, сбросов={m['flushes']}, "
+                      f"flush={m['last_flush_ms']:.1f} мс (max {m['max_flush_ms']:.1f}), потеряно={m['dropped']}, "
+                      f"ошибок записи={m['write_errors']}")
+        if pending:
+            self._flush(batch, pending)
+        for f, _ in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def _writer(self, path, fieldnames):
+        entry = self._files.get(path)
+        if entry is not None:
+            self._files.move_to_end(path)
+            return entry[1]
+        if len(self._files) >= self.max_open_files:
+            _, (old_file, _) = self._files.popitem(last=False)
+            old_file.close()
+        header = not os.path.exists(path) or os.path.getsize(path) == 0
+        f = open(path, "a", newline="")
+        writer = csv.writer(f)
+        if header:
+            writer.writerow(fieldnames)
+        self._files[path] = (f, writer)
+        return writer
+
+    def _flush(self, batch, pending):
+        started = time.perf_counter()
+        depth = self._queue.qsize()
+        written = failed = 0
+        for path, rows in batch.items():
+            try:
+                fieldnames = list(rows[0].keys())
+                self._writer(path, fieldnames).writerows([list(r.values()) for r in rows])
+                self._files[path][0].flush()
+                written += len(rows)
+            except Exception as e:
+                failed += len(rows)
+                print(f"[PERSIST] Ошибка записи в {path}: {e}")
+                entry = self._files.pop(path, None)  # при следующей пачке файл откроется заново
+                if entry is not None:
+                    entry[0].close()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            m = self._metrics
+            m["rows_written"] += written
+            m["write_errors"] += failed
+            m["flushes"] += 1
+            m["last_flush_ms"] = elapsed_ms
+            m["max_flush_ms"] = max(m["max_flush_ms"], elapsed_ms)
+            m["max_queue_depth"] = max(m["max_queue_depth"], depth + pending)
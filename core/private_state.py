@@ -0,0 +1,208 @@
+import time
+import threading
+from collections import OrderedDict
+
+# Локальное состояние аккаунта по приватному WebSocket Bybit v5 (position / order / wallet / execution).
+# BybitTrader читает позиции, TP/SL-ордера и стоп-лосс отсюда, без REST-запросов;
+# REST используется только для редкой сверки (replace_positions / replace_orders).
+# Каждое сообщение WS получает порядковый номер (sequence); сверка передаёт номер на момент начала
+# REST-запроса, и позиции/ордера, изменённые по WS за время запроса, снимком не перезаписываются.
+
+ACTIVE_ORDER_STATUSES = {"New", "PartiallyFilled", "Untriggered", "Active"}
+MAX_TRACKED_FILLS = 1000  # сколько последних orderLinkId хранить для wait_for_fill
+
+
+class PrivateStateStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._positions = {}  # (symbol, positionIdx) -> position dict
+        self._orders = {}     # orderId -> order dict (только активные)
+        self._wallet = {}     # coin -> coin dict
+        self._fills = OrderedDict()  # orderLinkId -> накопленные исполнения (execution + финальный статус order)
+        self._fill_cond = threading.Condition(self._lock)
+        self._seq = 0  # номер последнего применённого WS-сообщения
+        self._position_seq = {}  # (symbol, positionIdx) -> номер сообщения, последним изменившего позицию
+        self._order_seq = {}     # orderId -> номер сообщения, последним изменившего ордер
+        self._listeners = []
+        self.ready = False    # True после первой сверки с REST
+        self.last_update = 0.0
+        self.stats = {"messages": 0, "reconciliations": 0, "mismatches": 0}
+
+    # --- приём событий ---
+
+    def add_listener(self, callback):
+        """callback(topic, items) вызывается после применения каждого приватного сообщения."""
+        self._listeners.append(callback)
+
+    def on_message(self, msg):
+        topic = msg.get("topic", "")
+        items = msg.get("data", [])
+        if isinstance(items, dict):
+            items = [items]
+        with self._lock:
+            self._seq += 1
+            if topic.startswith("position"):
+                for p in items:
+                    self._apply_position(p)
+            elif topic.startswith("order"):
+                for o in items:
+                    self._apply_order(o)
+                self._fill_cond.notify_all()
+            elif topic.startswith("execution"):
+                for e in items:
+                    self._apply_execution(e)
+                self._fill_cond.notify_all()
+            elif topic.startswith("wallet"):
+                for account in items:
+                    for coin in account.get("coin", []):
+                        self._wallet[coin.get("coin")] = coin
+            self.stats["messages"] += 1
+            self.last_update = time.time()
+        for callback in self._listeners:
+            try:
+                callback(topic, items)
+            except Exception as e:
+                print(f"[PRIVATE-STATE] Ошибка обработчика {topic}: {e}")
+
+    def _apply_position(self, p):
+        key = (p.get("symbol"), int(p.get("positionIdx", 0) or 0))
+        self._position_seq[key] = self._seq
+        if float(p.get("size") or 0) > 0:
+            self._positions[key] = p
+        else:
+            self._positions.pop(key, None)
+
+    def _apply_order(self, o):
+        order_id = o.get("orderId")
+        self._order_seq[order_id] = self._seq
+        if o.get("orderStatus") in ACTIVE_ORDER_STATUSES:
+            self._orders[order_id] = o
+        else:
+            self._orders.pop(order_id, None)
+            link = o.get("orderLinkId")
+            if link:
+                fill = self._fill(link)
+                fill["done"] = True
+                fill["cum_qty"] = float(o.get("cumExecQty") or 0)
+                fill["avg_price"] = float(o.get("avgPrice") or 0)
+
+    def _apply_execution(self, e):
+        link = e.get("orderLinkId")
+        if not link or e.get("execType", "Trade") != "Trade":
+            return
+        qty = float(e.get("execQty") or 0)
+        fill = self._fill(link)
+        fill["qty"] += qty
+        fill["value"] += qty * float(e.get("execPrice") or 0)
+
+    def _fill(self, link):
+        fill = self._fills.get(link)
+        if fill is None:
+            fill = self._fills[link] = {"qty": 0.0, "value": 0.0, "done": False, "cum_qty": 0.0, "avg_price": 0.0}
+            if len(self._fills) > MAX_TRACKED_FILLS:
+                self._fills.popitem(last=False)
+        return fill
+
+    def wait_for_fill(self, order_link_id, qty, timeout):
+        """
+        Ждёт исполнения ордера по execution-стриму (без REST).
+        Возвращает (средняя цена, исполненный объём), когда исполнен весь qty или ордер завершён
+        (для рыночного IOC — частичное исполнение и отмена остатка);
+        (0.0, 0.0) — ордер завершён без исполнения (Cancelled / Rejected); None — таймаут.
+        """
+        deadline = time.monotonic() + timeout
+        with self._fill_cond:
+            while True:
+                fill = self._fills.get(order_link_id)
+                if fill is not None:
+                    if fill["qty"] > 0 and fill["qty"] >= qty * (1 - 1e-9):
+                        return fill["value"] / fill["qty"], fill["qty"]
+                    if fill["done"]:
+                        if fill["cum_qty"] <= 0:
+                            return 0.0, 0.0
+                        return fill["avg_price"] or fill["value"] / max(fill["qty"], 1e-12), fill["cum_qty"]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._fill_cond.wait(remaining)
+
+    # --- сверка с REST ---
+
+    def sequence(self):
+        """Номер последнего WS-сообщения — берётся перед REST-запросом сверки (since в replace_*)."""
+        with self._lock:
+            return self._seq
+
+    def replace_positions(self, positions, since=None):
+        """
+        Сверка: REST-снимок позиций заменяет локальный; возвращает True, если было расхождение.
+        since — sequence() до начала запроса: позиции, изменённые по WS позже, остаются локальными.
+        """
+        fresh = {}
+        for p in positions:
+            if float(p.get("size") or 0) > 0:
+                fresh[(p.get("symbol"), int(p.get("positionIdx", 0) or 0))] = p
+        with self._lock:
+            self._keep_newer(fresh, self._positions, self._position_seq, since)
+            mismatch = self.ready and self._position_digest(self._positions) != self._position_digest(fresh)
+            self._positions = fresh
+            self._count_mismatch(mismatch)
+        return mismatch
+
+    def replace_orders(self, orders, since=None):
+        fresh = {o.get("orderId"): o for o in orders if o.get("orderStatus", "New") in ACTIVE_ORDER_STATUSES}
+        with self._lock:
+            self._keep_newer(fresh, self._orders, self._order_seq, since)
+            mismatch = self.ready and set(self._orders) != set(fresh)
+            self._orders = fresh
+            self._count_mismatch(mismatch)
+        return mismatch
+
+    def mark_ready(self):
+        """Вызывается после каждой сверки: с этого момента состояние считается полным."""
+        self.ready = True
+        self.stats["reconciliations"] += 1
+
+    @staticmethod
+    def _keep_newer(fresh, local, seqs, since):
+        """
+        Ключи, изменённые по WS после since, берутся из локального состояния (в том числе удаление —
+        закрытая за время запроса позиция не возвращается из снимка). Номера старше since больше не нужны.
+        """
+        for key, seq in list(seqs.items()):
+            if since is not None and seq > since:
+                if key in local:
+                    fresh[key] = local[key]
+                else:
+                    fresh.pop(key, None)
+            else:
+                del seqs[key]
+
+    def _count_mismatch(self, mismatch):
+        if mismatch:
+            self.stats["mismatches"] += 1
+
+    @staticmethod
+    def _position_digest(positions):
+        return {k: (p.get("side"), str(p.get("size")), str(p.get("stopLoss"))) for k, p in positions.items()}
+
+    # --- чтение ---
+
+    def open_positions(self):
+        with self._lock:
+            return list(self._positions.values())
+
+    def position(self, symbol):
+        with self._lock:
+            for (s, _), p in self._positions.items():
+                if s == symbol:
+                    return p
+        return None
+
+    def open_orders(self, symbol=None):
+        with self._lock:
+            return [o for o in self._orders.values() if symbol is None or o.get("symbol") == symbol]
+
+    def coin(self, coin="USDT"):
+        with self._lock:
+            return self._wallet.get(coin)
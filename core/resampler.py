@@ -0,0 +1,174 @@
+from core.ring_buffer import RingBufferStore
+
+# Инкрементальный ресемплер: из потока 1m-свечей (kline.1) поддерживает свечи старших таймфреймов
+# (5m / 15m / 1h / 4h / 1d / 1w), выровненные по границам биржи (UTC, неделя — с понедельника).
+# По каждой 1m-свече (формирующейся или закрытой) для каждого таймфрейма обновляется формирующаяся свеча;
+# когда закрывается последняя минута интервала (или приходит минута следующего интервала после пропуска),
+# свеча таймфрейма закрывается: событие close, свеча уходит в кольцевой буфер таймфрейма.
+# Один поток подписки вместо подписки на каждый таймфрейм.
+
+BASE_SECONDS = 60
+WEEK_OFFSET = 4 * 86400  # 1970-01-01 — четверг, недельные свечи Bybit начинаются в понедельник
+
+
+def bucket_start(ts, seconds):
+    """Начало интервала таймфрейма (сек), в который попадает ts."""
+    if seconds == 604800:
+        return ts - (ts - WEEK_OFFSET) % seconds
+    return ts - ts % seconds
+
+
+def timeframe_seconds(tf):
+    from core.ohlcv import INTERVAL_SECONDS, format_interval  # core.ohlcv тянет pandas — только в режиме ресемплинга
+    seconds = INTERVAL_SECONDS.get(format_interval(tf))
+    if seconds is None or seconds % BASE_SECONDS:
+        raise ValueError(f"таймфрейм {tf} не собирается из 1m-свечей")
+    return seconds
+
+
+def resample_frame(df, tf):
+    """
+    Пакетный ресемплинг DataFrame 1m-свечей [timestamp, open, high, low, close, volume, turnover]
+    в свечи таймфрейма tf с теми же границами, что и у инкрементального ресемплера.
+    """
+    import pandas as pd
+    seconds = timeframe_seconds(tf)
+    start = df["timestamp"].to_numpy()
+    start = start - (start - WEEK_OFFSET) % seconds if seconds == 604800 else start - start % seconds
+    grouped = df.groupby(start, sort=True)
+    out = pd.DataFrame({
+        "open": grouped["open"].first(),
+        "high": grouped["high"].max(),
+        "low": grouped["low"].min(),
+        "close": grouped["close"].last(),
+        "volume": grouped["volume"].sum(),
+        "turnover": grouped["turnover"].sum(),
+    })
+    out.index.name = "timestamp"
+    return out.reset_index()
+
+
+class _Bucket:
+    """Свеча таймфрейма: агрегат закрытых минут интервала + формирующаяся минута поверх него."""
+    __slots__ = ("start", "open", "high", "low", "close", "volume", "turnover", "minutes",
+                 "last_minute", "forming", "emitted")
+
+    def __init__(self, start):
+        self.start = start
+        self.minutes = 0
+        self.last_minute = -1
+        self.forming = None
+        self.emitted = False
+        self.volume = self.turnover = 0.0
+
+    def fold(self, ts, open_, high, low, close, volume, turnover):
+        if not self.minutes:
+            self.open, self.high, self.low = open_, high, low
+        else:
+            self.high = max(self.high, high)
+            self.low = min(self.low, low)
+        self.close = close
+        self.volume += volume
+        self.turnover += turnover
+        self.minutes += 1
+        self.last_minute = ts
+        self.forming = None
+
+    def row(self):
+        """(timestamp, open, high, low, close, volume, turnover) с учётом формирующейся минуты"""
+        f = self.forming
+        if f is None:
+            return self.start, self.open, self.high, self.low, self.close, self.volume, self.turnover
+        if not self.minutes:
+            return self.start, f[1], f[2], f[3], f[4], f[5], f[6]
+        return (self.start, self.open, max(self.high, f[2]), min(self.low, f[3]), f[4],
+                self.volume + f[5], self.turnover + f[6])
+
+
+class MultiTimeframeResampler:
+    def __init__(self, timeframes=("5m", "15m", "1h", "4h", "1d"), capacity=1000):
+        self.timeframes = [tf for tf in dict.fromkeys(timeframes) if timeframe_seconds(tf) > BASE_SECONDS]
+        self._seconds = {tf: timeframe_seconds(tf) for tf in self.timeframes}
+        self._buckets = {}  # symbol -> { tf: _Bucket }
+        self.buffers = {tf: RingBufferStore(capacity) for tf in self.timeframes}
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """callback(symbol, tf, row) на каждое закрытие свечи таймфрейма"""
+        self._listeners.append(callback)
+
+    def update(self, symbol, timestamp, open_, high, low, close, volume, turnover, closed=False):
+        """
+        1m-свеча из потока (closed — флаг confirm).
+        Возвращает [(tf, row, closed), ...] по таймфреймам, чья свеча изменилась или закрылась.
+        """
+        buckets = self._buckets.get(symbol)
+        if buckets is None:
+            buckets = self._buckets[symbol] = {}
+        events = []
+        for tf in self.timeframes:
+            seconds = self._seconds[tf]
+            start = bucket_start(timestamp, seconds)
+            bucket = buckets.get(tf)
+            if bucket is None or start > bucket.start:
+                if bucket is not None and not bucket.emitted and (bucket.minutes or bucket.forming):
+                    # Минута следующего интервала пришла раньше закрытия последней минуты (пропуск в потоке)
+                    events.append(self._close(symbol, tf, bucket))
+                bucket = buckets[tf] = _Bucket(start)
+            elif start < bucket.start or bucket.emitted or timestamp <= bucket.last_minute:
+                continue  # устаревшая или повторная минута
+            if closed:
+                bucket.fold(timestamp, open_, high, low, close, volume, turnover)
+                if timestamp + BASE_SECONDS >= start + seconds:
+                    events.append(self._close(symbol, tf, bucket))
+                    continue
+            else:
+                bucket.forming = (timestamp, open_, high, low, close, volume, turnover)
+            events.append((tf, bucket.row(), False))
+        return events
+
+    def _close(self, symbol, tf, bucket):
+        bucket.emitted = True
+        row = bucket.row()
+        self.buffers[tf].get(symbol).upsert(*row)
+        for callback in self._listeners:
+            callback(symbol, tf, row)
+        return tf, row, True
+
+    def seed(self, symbol, df):
+        """
+        Прогрев по закрытым 1m-свечам из истории (DataFrame по возрастанию timestamp):
+        формирующиеся интервалы всех таймфреймов начинаются с уже прошедших минут.
+        События прогрева не возвращаются и слушателям не передаются.
+        """
+        if df is None or df.empty:
+            return
+        last = int(df["timestamp"].iloc[-1])
+        since = min(bucket_start(last, seconds) for seconds in self._seconds.values())
+        tail = df[df["timestamp"] >= since]
+        listeners, self._listeners = self._listeners, []
+        try:
+            for row in tail[["timestamp", "open", "high", "low", "close", "volume", "turnover"]].itertuples(index=False):
+                self.update(symbol, int(row[0]), *row[1:], closed=True)
+        finally:
+            self._listeners = listeners
+
+    def forget(self, symbol):
+        """Сброс формирующихся свечей символа (пара вышла из вселенной — после возврата начнётся с прогрева)."""
+        self._buckets.pop(symbol, None)
+
+    def seed_minutes(self):
+        """Сколько 1m-свечей истории нужно для прогрева самого длинного таймфрейма."""
+        return max(self._seconds.values(), default=BASE_SECONDS) // BASE_SECONDS
+
+    def forming(self, symbol, tf):
+        bucket = self._buckets.get(symbol, {}).get(tf)
+        if bucket is None or bucket.emitted or not (bucket.minutes or bucket.forming):
+            return None
+        return bucket.row()
+
+    def candles(self, symbol, tf, n=100):
+        """Последние n закрытых свечей таймфрейма { колонка: numpy view }"""
+        if symbol in self.buffers[tf]:
+            return self.buffers[tf].get(symbol).last(n)
+        return {}
@@ -0,0 +1,182 @@
+import numpy as np
+
+# Колоночные кольцевые буферы фиксированной ёмкости на numpy.
+# Каждое значение пишется дважды (в i и i + capacity), поэтому последние N записей
+# всегда лежат в памяти подряд и отдаются как view без копирования.
+# Память на буфер: 2 * capacity * sum(itemsize колонок) — известна заранее.
+
+KLINE_COLUMNS = {
+    "timestamp": np.int64,
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "volume": np.float64,
+    "turnover": np.float64,
+}
+
+TICKER_COLUMNS = {
+    "timestamp": np.int64,
+    "lastPrice": np.float64,
+    "markPrice": np.float64,
+    "indexPrice": np.float64,
+    "bid1Price": np.float64,
+    "bid1Size": np.float64,
+    "ask1Price": np.float64,
+    "ask1Size": np.float64,
+    "openInterest": np.float64,
+    "turnover24h": np.float64,
+    "volume24h": np.float64,
+    "fundingRate": np.float64,
+}
+
+ORDERBOOK_COLUMNS = {
+    "ts_ms": np.int64,  # биржевой ts сообщения, мс
+    "update_id": np.int64,
+    "bid1Price": np.float64,
+    "bid1Size": np.float64,
+    "ask1Price": np.float64,
+    "ask1Size": np.float64,
+    "bidDepth": np.float64,  # объём лучших ORDERBOOK_RECORD_LEVELS уровней
+    "askDepth": np.float64,
+    "imbalance": np.float64,
+}
+
+TRADE_BAR_COLUMNS = {
+    "start_ms": np.int64,
+    "end_ms": np.int64,  # время последней сделки бара
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "volume": np.float64,
+    "buy_volume": np.float64,
+    "sell_volume": np.float64,
+    "turnover": np.float64,
+    "vwap": np.float64,
+    "cvd": np.float64,  # накопленная дельта объёма символа на закрытии бара
+    "trades": np.int64,
+}
+
+TRADE_COLUMNS = {
+    "timestamp": np.int64,
+    "price": np.float64,
+    "size": np.float64,
+    "side": np.int8,  # 1 — Buy, -1 — Sell, 0 — неизвестно
+}
+
+
+class RingBuffer:
+    """Кольцевой буфер с колонками из preallocated numpy-массивов; append за O(1)."""
+    __slots__ = ("capacity", "names", "_columns", "_pos", "_size")
+
+    def __init__(self, capacity, columns):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.names = tuple(columns)
+        self._columns = {name: np.zeros(2 * capacity, dtype=dtype) for name, dtype in columns.items()}
+        self._pos = 0   # куда будет записан следующий элемент, 0..capacity-1
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self._columns.values())
+
+    def append(self, *values):
+        """Добавляет строку; значения — в порядке колонок (self.names)."""
+        i = self._pos
+        j = i + self.capacity
+        for name, value in zip(self.names, values):
+            column = self._columns[name]
+            column[i] = value
+            column[j] = value
+        self._pos = (i + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def update_last(self, **fields):
+        """Обновление последней строки на месте (например, формирующейся свечи)."""
+        if not self._size:
+            raise IndexError("update_last on empty buffer")
+        i = (self._pos - 1) % self.capacity
+        j = i + self.capacity
+        for name, value in fields.items():
+            column = self._columns[name]
+            column[i] = value
+            column[j] = value
+
+    def last(self, n=None):
+        """
+        Последние n строк как { колонка: read-only view } без копирования.
+        View смотрит в память буфера: последующие append/update_last меняют его содержимое на месте
+        (строки сдвигаются не в view, а перезаписываются) — если данные нужны дольше, чем до следующей
+        записи, их нужно скопировать.
+        """
+        n = self._size if n is None else max(0, min(n, self._size))
+        end = self._pos + self.capacity
+        result = {}
+        for name, column in self._columns.items():
+            view = column[end - n:end]
+            view.flags.writeable = False
+            result[name] = view
+        return result
+
+    def last_value(self, name):
+        if not self._size:
+            return None
+        return self._columns[name][(self._pos - 1) % self.capacity].item()
+
+
+class CandleBuffer(RingBuffer):
+    """Буфер свечей: свеча с тем же timestamp обновляется на месте, более старые игнорируются."""
+    __slots__ = ()
+
+    def __init__(self, capacity):
+        super().__init__(capacity, KLINE_COLUMNS)
+
+    def upsert(self, timestamp, open_, high, low, close, volume, turnover):
+        """Возвращает True, если добавлена новая свеча, False — если обновлена/пропущена."""
+        if self._size:
+            last_ts = self.last_value("timestamp")
+            if timestamp == last_ts:
+                self.update_last(open=open_, high=high, low=low, close=close, volume=volume, turnover=turnover)
+                return False
+            if timestamp < last_ts:
+                return False
+        self.append(timestamp, open_, high, low, close, volume, turnover)
+        return True
+
+
+class RingBufferStore:
+    """{ symbol: буфер } — буфер на символ создаётся при первом обращении с фиксированной ёмкостью."""
+    __slots__ = ("capacity", "columns", "_buffers")
+
+    def __init__(self, capacity, columns=None):
+        self.capacity = capacity
+        self.columns = columns  # None — буферы свечей (CandleBuffer)
+        self._buffers = {}
+
+    def get(self, symbol):
+        buf = self._buffers.get(symbol)
+        if buf is None:
+            if self.columns is None:
+                buf = CandleBuffer(self.capacity)
+            else:
+                buf = RingBuffer(self.capacity, self.columns)
+            self._buffers[symbol] = buf
+        return buf
+
+    def __contains__(self, symbol):
+        return symbol in self._buffers
+
+    def items(self):
+        return self._buffers.items()
+
+    @property
+    def nbytes_per_symbol(self):
+        columns = KLINE_COLUMNS if self.columns is None else self.columns
+        return 2 * self.capacity * sum(np.dtype(d).itemsize for d in columns.values())
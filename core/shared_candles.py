@@ -0,0 +1,219 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+# Мост свечей между процессом WebSocket collector и основным процессом через shared memory.
+# Раскладка сегмента:
+#   header       int64[8]              — MAGIC, VERSION, n_symbols, capacity, (резерв), registered, ...
+#   symbols      S32[n_symbols]        — таблица символов (читатель подключается только по имени сегмента);
+#                                        пустое имя — запасной слот под пару, добавленную во вселенную на ходу
+#   slots        int64[n_symbols, 4]   — seq, size, pos, last_closed_ts для каждого символа
+#   candles      float64[n_symbols, capacity, 7] — кольцо свечей timestamp/open/high/low/close/volume/turnover
+# Консистентность — seqlock: писатель делает seq нечётным на время записи и чётным после,
+# читатель копирует данные и повторяет чтение, если seq изменился или был нечётным.
+# У каждого символа один писатель (процесс collector, в шарды которого входит символ),
+# читателей может быть сколько угодно.
+
+MAGIC = 0x43414E444C45  # "CANDLE"
+VERSION = 1
+HEADER_SIZE = 8
+SYMBOL_BYTES = 32
+CANDLE_FIELDS = ("timestamp", "open", "high", "low", "close", "volume", "turnover")
+READ_RETRIES = 100
+
+# Индексы в header; H_GLOBAL_SEQ зарезервирован и не пишется: общий счётчик при нескольких
+# процессах collector терял бы инкременты, global_sequence() считается по seq слотов
+H_MAGIC, H_VERSION, H_SYMBOLS, H_CAPACITY, H_GLOBAL_SEQ, H_REGISTERED = 0, 1, 2, 3, 4, 5
+# Индексы в слоте символа
+S_SEQ, S_SIZE, S_POS, S_CLOSED_TS = 0, 1, 2, 3
+
+
+def _segment_size(n_symbols, capacity):
+    return (
+        HEADER_SIZE * 8
+        + n_symbols * SYMBOL_BYTES
+        + n_symbols * 4 * 8
+        + n_symbols * capacity * len(CANDLE_FIELDS) * 8
+    )
+
+
+class SharedCandles:
+    """Свечи всех символов в одном сегменте shared memory (см. раскладку выше)."""
+
+    def __init__(self, shm, owner=False, writable=False):
+        self.shm = shm
+        self.name = shm.name
+        self.owner = owner
+        buf = shm.buf
+        self._header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=buf)
+        if self._header[H_MAGIC] != MAGIC or self._header[H_VERSION] != VERSION:
+            raise ValueError(f"shared memory {shm.name}: неизвестный формат сегмента")
+        n_symbols = int(self._header[H_SYMBOLS])
+        self.capacity = int(self._header[H_CAPACITY])
+        offset = HEADER_SIZE * 8
+        self._names = np.ndarray((n_symbols,), dtype=f"S{SYMBOL_BYTES}", buffer=buf, offset=offset)
+        self.symbols = [n.decode() for n in self._names]
+        self._index = {s: i for i, s in enumerate(self.symbols) if s}
+        offset += n_symbols * SYMBOL_BYTES
+        self._slots = np.ndarray((n_symbols, 4), dtype=np.int64, buffer=buf, offset=offset)
+        offset += n_symbols * 4 * 8
+        self._candles = np.ndarray(
+            (n_symbols, self.capacity, len(CANDLE_FIELDS)), dtype=np.float64, buffer=buf, offset=offset
+        )
+        if not writable:
+            for view in (self._header, self._slots, self._candles):
+                view.flags.writeable = False
+
+    @classmethod
+    def create(cls, symbols, capacity=1000, spare=0):
+        """
+        Создаёт сегмент (вызывает процесс-владелец, он же делает unlink при остановке).
+        spare — запасные слоты под пары, которые добавятся позже (register).
+        """
+        n_symbols = len(symbols) + spare
+        shm = shared_memory.SharedMemory(create=True, size=_segment_size(n_symbols, capacity))
+        header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[H_MAGIC] = MAGIC
+        header[H_VERSION] = VERSION
+        header[H_SYMBOLS] = n_symbols
+        header[H_CAPACITY] = capacity
+        header[H_REGISTERED] = len(symbols)
+        names = np.ndarray((n_symbols,), dtype=f"S{SYMBOL_BYTES}", buffer=shm.buf, offset=HEADER_SIZE * 8)
+        names[:len(symbols)] = [s.encode()[:SYMBOL_BYTES] for s in symbols]
+        del header, names
+        # Новый сегмент заполнен нулями — слоты символов пустые
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name, writable=False):
+        """Подключение к существующему сегменту: writable=True — для collector, иначе только чтение."""
+        # Дочерние процессы делят resource_tracker с владельцем, поэтому unlink делает только владелец
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, owner=False, writable=writable)
+
+    def close(self):
+        del self._header, self._names, self._slots, self._candles
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __contains__(self, symbol):
+        return self._lookup(symbol) is not None
+
+    def _lookup(self, symbol):
+        i = self._index.get(symbol)
+        if i is None and self._refresh():
+            i = self._index.get(symbol)
+        return i
+
+    def _refresh(self):
+        """Перечитывает таблицу символов, если владелец занял запасные слоты; True — таблица изменилась."""
+        if int(self._header[H_REGISTERED]) == len(self._index):
+            return False
+        self.symbols[:] = [n.decode() for n in self._names]
+        self._index = {s: i for i, s in enumerate(self.symbols) if s}
+        return True
+
+    def register(self, symbol):
+        """
+        Занимает запасной слот под новую пару (только процесс-владелец, до того как collector начнёт её публиковать).
+        Возвращает False, если свободных слотов не осталось.
+        """
+        if self._lookup(symbol) is not None:
+            return True
+        if "" not in self.symbols:
+            return False
+        i = self.symbols.index("")
+        names = np.ndarray(self._names.shape, dtype=self._names.dtype, buffer=self.shm.buf, offset=HEADER_SIZE * 8)
+        header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=self.shm.buf)
+        names[i] = symbol.encode()[:SYMBOL_BYTES]
+        header[H_REGISTERED] += 1  # после имени: читатель, увидевший счётчик, увидит и имя
+        del names, header
+        self.symbols[i] = symbol
+        self._index[symbol] = i
+        return True
+
+    # --- писатель ---
+
+    def publish(self, symbol, timestamp, open_, high, low, close, volume, turnover, closed=False):
+        """
+        Публикация свечи: тот же timestamp обновляет формирующуюся свечу на месте,
+        более новый — добавляет свечу в кольцо. closed=True (confirm) двигает last_closed_ts.
+        """
+        i = self._lookup(symbol)
+        if i is None:
+            return False
+        slot = self._slots[i]
+        candles = self._candles[i]
+        slot[S_SEQ] += 1  # нечётный — идёт запись
+        try:
+            size, pos = int(slot[S_SIZE]), int(slot[S_POS])
+            last = (pos - 1) % self.capacity
+            row = (timestamp, open_, high, low, close, volume, turnover)
+            if size and candles[last, 0] == timestamp:
+                candles[last] = row
+            elif not size or timestamp > candles[last, 0]:
+                candles[pos] = row
+                slot[S_POS] = (pos + 1) % self.capacity
+                slot[S_SIZE] = min(size + 1, self.capacity)
+            if closed and timestamp > slot[S_CLOSED_TS]:
+                slot[S_CLOSED_TS] = timestamp
+        finally:
+            slot[S_SEQ] += 1
+        return True
+
+    # --- читатель ---
+
+    def global_sequence(self):
+        """
+        Растёт при каждой публикации — дешёвая проверка «что-то изменилось».
+        Сумма seq по слотам: у каждого слота один писатель, поэтому счётчик не теряет
+        обновлений и при нескольких процессах collector (общий счётчик в header — теряет).
+        """
+        return int(self._slots[:, S_SEQ].sum())
+
+    def closed_timestamps(self):
+        """Копия last_closed_ts всех символов (в порядке self.symbols) — для поиска только что закрытых свечей."""
+        return self._slots[:, S_CLOSED_TS].copy()
+
+    def sequence(self, symbol):
+        return int(self._slots[self._index[symbol], S_SEQ])
+
+    def read(self, symbol, n=None):
+        """
+        Консистентная копия последних n свечей символа.
+        Возвращает ({ колонка: np.ndarray }, last_closed_ts) или None, если символа нет
+        или писатель не дал прочитать снимок за READ_RETRIES попыток.
+        """
+        i = self._lookup(symbol)
+        if i is None:
+            return None
+        slot = self._slots[i]
+        candles = self._candles[i]
+        for _ in range(READ_RETRIES):
+            seq = int(slot[S_SEQ])
+            if seq & 1:
+                continue
+            size, pos, closed_ts = int(slot[S_SIZE]), int(slot[S_POS]), int(slot[S_CLOSED_TS])
+            take = size if n is None else max(0, min(n, size))
+            rows = candles[(pos - take + np.arange(take)) % self.capacity]
+            if int(slot[S_SEQ]) == seq:
+                columns = {name: rows[:, k] for k, name in enumerate(CANDLE_FIELDS)}
+                columns["timestamp"] = columns["timestamp"].astype(np.int64)
+                return columns, closed_ts
+        return None
+
+    def closed_candles_since(self, symbol, after_ts=None, n=None):
+        """Закрытые свечи (timestamp <= last_closed_ts) новее after_ts — список dict для IndicatorCache.update."""
+        snapshot = self.read(symbol, n)
+        if snapshot is None:
+            return []
+        columns, closed_ts = snapshot
+        ts = columns["timestamp"]
+        mask = ts <= closed_ts
+        if after_ts is not None:
+            mask &= ts > after_ts
+        return [
+            {name: columns[name][k].item() for name in CANDLE_FIELDS}
+            for k in np.flatnonzero(mask)
+        ]
@@ -0,0 +1,54 @@
+import os
+import time
+from config import STARTUP_SUBSCRIBE_BUDGET
+
+# Разбивка времени старта: импорт, снимок тикеров, shared memory, запуск collector, история, индикаторы...
+# Отсчёт — от первого импорта этого модуля в основном процессе (main импортирует его первым).
+# Момент старта передаётся процессам collector через окружение, чтобы они могли отметить
+# время до первой подписки WS и сверить его с бюджетом STARTUP_SUBSCRIBE_BUDGET.
+
+STARTED = float(os.environ.setdefault("BOT_STARTED_AT", repr(time.time())))
+
+
+class StartupTimer:
+    def __init__(self, started=STARTED):
+        self.started = started
+        self.last = started
+        self.phases = []  # [(этап, сек)]
+
+    def mark(self, phase):
+        """Завершение этапа: время с предыдущей отметки."""
+        now = time.time()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+        return now - self.started
+
+    def elapsed(self):
+        return time.time() - self.started
+
+    def summary(self):
+        parts = " | ".join(f"{phase} {seconds:.2f}с" for phase, seconds in self.phases)
+        return f"[STARTUP] {parts} | всего {self.last - self.started:.2f}с"
+
+
+timer = StartupTimer()
+_subscribed = False
+
+
+def report_first_subscription(budget=STARTUP_SUBSCRIBE_BUDGET):
+    """
+    Время от старта бота до первой подписки WS в этом процессе (печатается один раз).
+    В работающем боте превышение бюджета — только предупреждение в логе (бот не останавливается);
+    жёстко бюджет проверяет tests/test_startup.py. Возвращает True, если бюджет соблюдён
+    (None — подписка уже была отмечена раньше).
+    """
+    global _subscribed
+    if _subscribed:
+        return None
+    _subscribed = True
+    elapsed = timer.elapsed()
+    if budget and elapsed > budget:
+        print(f"[STARTUP] ⚠️ Первая подписка WS через {elapsed:.2f}с — бюджет {budget:.1f}с превышен")
+        return False
+    print(f"[STARTUP] Первая подписка WS через {elapsed:.2f}с от старта")
+    return True
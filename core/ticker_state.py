@@ -0,0 +1,216 @@
+import math
+import numpy as np
+from multiprocessing import shared_memory
+from core.clock import clock
+
+# Типизированное состояние тикеров всей вселенной: строка float64 на символ в одном массиве
+# (символы × поля), по умолчанию — в shared memory, чтобы collector писал, а стратегия и трейдер
+# читали last/mark/bid/ask без REST-запросов.
+# Раскладка сегмента:
+#   header   int64[8]                    — MAGIC, VERSION, n_symbols, n_fields, registered
+#   symbols  S32[n_symbols]              — пустое имя — запасной слот (register)
+#   seq      int64[n_symbols]            — seqlock строки (нечётный — идёт запись)
+#   values   float64[n_symbols, n_fields] — поля TICKER_FIELDS, NaN — поле ещё не приходило
+# Snapshot и delta Bybit применяются одинаково: обновляются только пришедшие поля,
+# у каждого поля свой разборщик (строка -> число), без промежуточных dict.
+
+MAGIC = 0x5449434B4552  # "TICKER"
+VERSION = 1
+HEADER_SIZE = 8
+SYMBOL_BYTES = 32
+READ_RETRIES = 100
+H_REGISTERED = 4
+
+TICKER_FIELDS = (
+    "ts",  # биржевой ts последнего обновления, мс
+    "lastPrice", "markPrice", "indexPrice",
+    "bid1Price", "bid1Size", "ask1Price", "ask1Size",
+    "prevPrice24h", "highPrice24h", "lowPrice24h", "prevPrice1h", "price24hPcnt",
+    "openInterest", "openInterestValue", "turnover24h", "volume24h",
+    "fundingRate", "nextFundingTime", "tickDirection",
+)
+FIELD_INDEX = {name: k for k, name in enumerate(TICKER_FIELDS)}
+TS = FIELD_INDEX["ts"]
+
+TICK_DIRECTIONS = {"PlusTick": 2.0, "ZeroPlusTick": 1.0, "MinusTick": -2.0, "ZeroMinusTick": -1.0}
+
+
+def _number(value):
+    return float(value) if value != "" else math.nan
+
+
+def _tick_direction(value):
+    return TICK_DIRECTIONS.get(value, 0.0)
+
+
+# Поле сообщения -> (колонка, разборщик); поля, которых нет в таблице (curPreListingPhase и т.п.), пропускаются
+_SETTERS = {name: (k, _number) for name, k in FIELD_INDEX.items() if name != "ts"}
+_SETTERS["tickDirection"] = (FIELD_INDEX["tickDirection"], _tick_direction)
+
+
+def _segment_size(n_symbols):
+    return HEADER_SIZE * 8 + n_symbols * SYMBOL_BYTES + n_symbols * 8 + n_symbols * len(TICKER_FIELDS) * 8
+
+
+class TickerTable:
+    """Тикеры всех символов (см. раскладку выше); писатель у символа один — процесс collector."""
+
+    def __init__(self, buf, shm=None, owner=False):
+        self.shm = shm
+        self.name = shm.name if shm is not None else None
+        self.owner = owner
+        self._header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=buf)
+        if self._header[0] != MAGIC or self._header[1] != VERSION or self._header[3] != len(TICKER_FIELDS):
+            raise ValueError(f"ticker table {self.name}: неизвестный формат сегмента")
+        n_symbols = int(self._header[2])
+        offset = HEADER_SIZE * 8
+        self._names = np.ndarray((n_symbols,), dtype=f"S{SYMBOL_BYTES}", buffer=buf, offset=offset)
+        self.symbols = [n.decode() for n in self._names]
+        self._index = {s: i for i, s in enumerate(self.symbols) if s}
+        offset += n_symbols * SYMBOL_BYTES
+        self._seq = np.ndarray((n_symbols,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += n_symbols * 8
+        self._values = np.ndarray((n_symbols, len(TICKER_FIELDS)), dtype=np.float64, buffer=buf, offset=offset)
+
+    @staticmethod
+    def _init_buffer(buf, symbols, spare):
+        n_symbols = len(symbols) + spare
+        header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=buf)
+        header[:] = 0
+        header[:5] = (MAGIC, VERSION, n_symbols, len(TICKER_FIELDS), len(symbols))
+        offset = HEADER_SIZE * 8
+        names = np.ndarray((n_symbols,), dtype=f"S{SYMBOL_BYTES}", buffer=buf, offset=offset)
+        names[:len(symbols)] = [s.encode()[:SYMBOL_BYTES] for s in symbols]
+        offset += n_symbols * (SYMBOL_BYTES + 8)
+        values = np.ndarray((n_symbols, len(TICKER_FIELDS)), dtype=np.float64, buffer=buf, offset=offset)
+        values[:] = np.nan
+        values[:, TS] = 0
+        del header, names, values
+
+    @classmethod
+    def create(cls, symbols, spare=0):
+        """
+        Таблица в новом сегменте shared memory (владелец делает unlink в close).
+        spare — запасные слоты под пары, которые добавятся позже (register).
+        """
+        shm = shared_memory.SharedMemory(create=True, size=_segment_size(len(symbols) + spare))
+        cls._init_buffer(shm.buf, symbols, spare)
+        return cls(shm.buf, shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm.buf, shm)
+
+    @classmethod
+    def local(cls, symbols, spare=0):
+        """Таблица в памяти процесса (без shared memory)."""
+        buf = bytearray(_segment_size(len(symbols) + spare))
+        cls._init_buffer(buf, symbols, spare)
+        return cls(buf)
+
+    def close(self):
+        del self._header, self._names, self._seq, self._values
+        if self.shm is not None:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+
+    def __contains__(self, symbol):
+        return self._lookup(symbol) is not None
+
+    def _lookup(self, symbol):
+        i = self._index.get(symbol)
+        if i is None and self._refresh():
+            i = self._index.get(symbol)
+        return i
+
+    def _refresh(self):
+        """Перечитывает таблицу символов, если заняты запасные слоты; True — таблица изменилась."""
+        if int(self._header[H_REGISTERED]) == len(self._index):
+            return False
+        self.symbols[:] = [n.decode() for n in self._names]
+        self._index = {s: i for i, s in enumerate(self.symbols) if s}
+        return True
+
+    def register(self, symbol):
+        """
+        Занимает запасной слот под новую пару (владелец таблицы — до того как писатель начнёт её обновлять).
+        Возвращает False, если свободных слотов не осталось.
+        """
+        if self._lookup(symbol) is not None:
+            return True
+        if "" not in self.symbols:
+            return False
+        i = self.symbols.index("")
+        self._names[i] = symbol.encode()[:SYMBOL_BYTES]
+        self._header[H_REGISTERED] += 1  # после имени: читатель, увидевший счётчик, увидит и имя
+        self.symbols[i] = symbol
+        self._index[symbol] = i
+        return True
+
+    # --- писатель ---
+
+    def apply(self, symbol, data, ts=0):
+        """Snapshot или delta тикера (data — поле "data" сообщения / элемент ответа get_tickers)."""
+        i = self._lookup(symbol)
+        if i is None:
+            return False
+        row = self._values[i]
+        seq = self._seq
+        seq[i] += 1  # нечётный — идёт запись
+        try:
+            for key, value in data.items():
+                setter = _SETTERS.get(key)
+                if setter is not None:
+                    k, parse = setter
+                    row[k] = parse(value)
+            if ts:
+                row[TS] = ts
+        finally:
+            seq[i] += 1
+        return True
+
+    def row(self, symbol):
+        """Строка символа как view (для писателя — без копирования)."""
+        i = self._lookup(symbol)
+        return None if i is None else self._values[i]
+
+    # --- читатель ---
+
+    def get(self, symbol):
+        """Консистентная копия всех полей { поле: float } или None."""
+        i = self._lookup(symbol)
+        if i is None:
+            return None
+        for _ in range(READ_RETRIES):
+            seq = int(self._seq[i])
+            if seq & 1:
+                continue
+            values = self._values[i].tolist()
+            if int(self._seq[i]) == seq:
+                return dict(zip(TICKER_FIELDS, values))
+        return None
+
+    def value(self, symbol, field):
+        """Одно поле (float, NaN — ещё не приходило); чтение одного float64 атомарно, seqlock не нужен."""
+        i = self._lookup(symbol)
+        if i is None:
+            return math.nan
+        return float(self._values[i, FIELD_INDEX[field]])
+
+    def quote(self, symbol, max_age=None):
+        """
+        (bid, ask, last, mark) или None, если символа нет, тикер ещё не приходил
+        или старше max_age секунд (по часам биржи с поправкой core.clock).
+        """
+        data = self.get(symbol)
+        if data is None or not data["ts"]:
+            return None
+        if max_age is not None and clock.now_ms() - data["ts"] > max_age * 1000:
+            return None
+        return data["bid1Price"], data["ask1Price"], data["lastPrice"], data["markPrice"]
+
+    def column(self, field):
+        """Копия поля по всем слотам (в порядке self.symbols, запасные — NaN) — для фильтров по всей вселенной."""
+        return self._values[:, FIELD_INDEX[field]].copy()
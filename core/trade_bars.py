@@ -0,0 +1,136 @@
+import math
+
+# Потоковая агрегация ленты сделок (publicTrade) в бары: по времени, по объёму и по обороту (dollar bars).
+# В каждом баре — OHLC, объём с разбивкой buy/sell (по стороне агрессора), оборот, VWAP,
+# число сделок и накопленная дельта объёма (CVD) символа на момент закрытия бара.
+# Память на символ постоянная: несколько чисел на каждый вид баров, сами сделки не хранятся.
+
+TIME, VOLUME, DOLLAR = "time", "volume", "dollar"
+
+# Порядок полей готового бара (совпадает с TRADE_BAR_COLUMNS в core.ring_buffer)
+BAR_FIELDS = (
+    "start_ms", "end_ms", "open", "high", "low", "close",
+    "volume", "buy_volume", "sell_volume", "turnover", "vwap", "cvd", "trades",
+)
+
+
+class BarBuilder:
+    """
+    Накопитель одного вида баров.
+    kind=TIME: бар закрывается первой сделкой следующего интервала threshold мс (границы кратны интервалу)
+    или flush по часам после конца интервала + grace_ms; сделки старше конца уже закрытого бара
+    (опоздавшие после flush) не открывают второй бар с тем же start_ms, а сделки из интервала раньше
+    открытого бара не вливаются в него (end_ms не идёт назад) — и те и другие отбрасываются (счётчик late);
+    kind=VOLUME / DOLLAR: бар закрывается сделкой, после которой объём / оборот бара достиг threshold.
+    """
+    __slots__ = ("kind", "threshold", "start_ms", "end_ms", "open", "high", "low", "close",
+                 "volume", "buy_volume", "sell_volume", "turnover", "trades", "emitted_end", "late")
+
+    def __init__(self, kind, threshold):
+        if kind not in (TIME, VOLUME, DOLLAR):
+            raise ValueError(f"неизвестный вид баров: {kind}")
+        if threshold <= 0:
+            raise ValueError("threshold must be positive")
+        self.kind = kind
+        self.threshold = threshold
+        self.trades = 0
+        self.emitted_end = 0  # TIME: конец интервала последнего закрытого бара, мс
+        self.late = 0
+
+    def _reset(self, ts_ms, price):
+        self.start_ms = ts_ms - ts_ms % self.threshold if self.kind == TIME else ts_ms
+        self.end_ms = ts_ms
+        self.open = self.high = self.low = self.close = price
+        self.volume = self.buy_volume = self.sell_volume = self.turnover = 0.0
+        self.trades = 0
+
+    def _bar(self, cvd):
+        if self.kind == TIME:
+            self.emitted_end = self.start_ms + self.threshold
+        vwap = self.turnover / self.volume if self.volume else self.close
+        return (self.start_ms, self.end_ms, self.open, self.high, self.low, self.close,
+                self.volume, self.buy_volume, self.sell_volume, self.turnover, vwap, cvd, self.trades)
+
+    def update(self, ts_ms, price, size, side, cvd):
+        """
+        Добавляет сделку (side: 1 — Buy, -1 — Sell, 0 — неизвестно; cvd — накопленная дельта после сделки).
+        Возвращает закрытый бар (кортеж по BAR_FIELDS) или None.
+        """
+        closed = None
+        if self.kind == TIME and (ts_ms < self.emitted_end or (self.trades and ts_ms < self.start_ms)):
+            self.late += 1
+            return None
+        if not self.trades:
+            self._reset(ts_ms, price)
+        elif self.kind == TIME and ts_ms - self.start_ms >= self.threshold:
+            closed = self._bar(cvd - size * side)
+            self._reset(ts_ms, price)
+        self.end_ms = ts_ms
+        if price > self.high:
+            self.high = price
+        if price < self.low:
+            self.low = price
+        self.close = price
+        self.volume += size
+        if side > 0:
+            self.buy_volume += size
+        elif side < 0:
+            self.sell_volume += size
+        self.turnover += price * size
+        self.trades += 1
+        if self.kind == VOLUME and self.volume >= self.threshold:
+            closed = self._bar(cvd)
+            self.trades = 0
+        elif self.kind == DOLLAR and self.turnover >= self.threshold:
+            closed = self._bar(cvd)
+            self.trades = 0
+        return closed
+
+    def flush(self, now_ms, cvd, grace_ms=0):
+        """
+        Закрывает бар по времени без новой сделки (для тихих символов); только для TIME.
+        grace_ms — запас на задержку ленты: сделка с ts до границы может прийти уже после неё.
+        """
+        if self.kind == TIME and self.trades and now_ms >= self.start_ms + self.threshold + grace_ms:
+            self.trades, bar = 0, self._bar(cvd)
+            return bar
+        return None
+
+
+class TradeAggregator:
+    """Все виды баров одного символа и его накопленная дельта объёма (CVD)."""
+    __slots__ = ("symbol", "builders", "cvd", "last_ts")
+
+    def __init__(self, symbol, time_ms=1000, volume=0.0, dollar=0.0):
+        self.symbol = symbol
+        self.builders = []
+        if time_ms:
+            self.builders.append(BarBuilder(TIME, time_ms))
+        if volume:
+            self.builders.append(BarBuilder(VOLUME, volume))
+        if dollar:
+            self.builders.append(BarBuilder(DOLLAR, dollar))
+        self.cvd = 0.0
+        self.last_ts = 0
+
+    def on_trade(self, ts_ms, price, size, side):
+        """Возвращает список закрытых баров [(вид, бар), ...] — обычно пустой."""
+        if not (size > 0) or math.isnan(price):
+            return []
+        self.cvd += size * side
+        if ts_ms > self.last_ts:
+            self.last_ts = ts_ms
+        closed = []
+        for builder in self.builders:
+            bar = builder.update(ts_ms, price, size, side, self.cvd)
+            if bar is not None:
+                closed.append((builder.kind, bar))
+        return closed
+
+    def flush(self, now_ms, grace_ms=0):
+        closed = []
+        for builder in self.builders:
+            bar = builder.flush(now_ms, self.cvd, grace_ms)
+            if bar is not None:
+                closed.append((builder.kind, bar))
+        return closed
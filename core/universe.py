@@ -0,0 +1,104 @@
+import math
+
+# Живая вселенная торговых пар: состав строится по одному снимку тикеров (REST get_tickers)
+# и дальше поддерживается по объёмам из потока тикеров (core.ticker_state) и редким повторным снимкам
+# (новые листинги, делистинги, объёмы пар вне вселенной).
+# Менеджер только решает, кто входит во вселенную; подписка/отписка в collector и прогрев истории
+# новых пар — на стороне вызывающего кода (main). Новая пара сначала кандидат (pending) и становится
+# членом вселенной только после admit — когда история и индикаторы по ней уже прогреты.
+# Гистерезис: пара входит при volume24h >= min_volume24h, а выходит только при падении ниже
+# min_volume24h * drop_ratio — чтобы пара на границе фильтра не подписывалась и не отписывалась по кругу.
+
+
+def _volume(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class UniverseManager:
+    def __init__(self, min_volume24h=0.0, quote="USDT", drop_ratio=0.8):
+        self.min_volume24h = min_volume24h
+        self.quote = quote
+        self.drop_ratio = drop_ratio
+        self.catalog = set()  # все пары рынка из последнего снимка (с подходящей котировкой)
+        self.volumes = {}  # symbol -> последний известный volume24h
+        self.members = []  # текущая вселенная, в порядке добавления
+        self.pending = set()  # кандидаты из rebalance, ещё не прогретые (см. admit / reject)
+        self.excluded = set()  # пары, которые нельзя добавить (например, нет слота в shared memory)
+        self._members = set()
+
+    def __contains__(self, symbol):
+        return symbol in self._members
+
+    def __len__(self):
+        return len(self.members)
+
+    def load_snapshot(self, tickers):
+        """
+        Снимок тикеров рынка (result.list ответа get_tickers): обновляет каталог и объёмы.
+        Пары, пропавшие из снимка, считаются делистингом. Возвращает (added, removed).
+        """
+        catalog = set()
+        for ticker in tickers:
+            symbol = ticker.get("symbol", "")
+            if self.quote not in symbol:
+                continue
+            catalog.add(symbol)
+            self.volumes[symbol] = _volume(ticker.get("volume24h"))
+        for symbol in set(self.volumes) - catalog:
+            del self.volumes[symbol]
+        self.catalog = catalog
+        return self.rebalance()
+
+    def update_volumes(self, tickers):
+        """Объёмы пар вселенной из живой таблицы тикеров (core.ticker_state.TickerTable)."""
+        for symbol in self.members:
+            volume = tickers.value(symbol, "volume24h")
+            if not math.isnan(volume):
+                self.volumes[symbol] = volume
+
+    def rebalance(self):
+        """
+        Пересчёт состава по известным объёмам. Возвращает (added, removed) — списки пар.
+        removed сразу выходят из состава, added — только кандидаты: членами их делает admit.
+        """
+        removed = [
+            s for s in self.members
+            if s not in self.catalog or s in self.excluded
+            or self.volumes.get(s, 0.0) < self.min_volume24h * self.drop_ratio
+        ]
+        for symbol in removed:
+            self._members.discard(symbol)
+        if removed:
+            self.members = [s for s in self.members if s in self._members]
+        added = [
+            s for s in sorted(self.catalog)
+            if s not in self._members and s not in self.pending and s not in self.excluded
+            and self.volumes.get(s, 0.0) >= self.min_volume24h
+        ]
+        self.pending.update(added)
+        return added, removed
+
+    def admit(self, symbols):
+        """Кандидаты с прогретой историей становятся членами вселенной; возвращает принятые пары."""
+        admitted = [s for s in symbols if s in self.pending]
+        self.pending.difference_update(admitted)
+        self.members.extend(admitted)
+        self._members.update(admitted)
+        return admitted
+
+    def reject(self, symbols):
+        """Кандидаты, прогрев которых не удался: снимаются и будут предложены следующим rebalance."""
+        self.pending.difference_update(symbols)
+
+    def exclude(self, symbols):
+        """Исключает пары из вселенной навсегда (до перезапуска); возвращает снятые из состава пары."""
+        symbols = set(symbols)
+        self.excluded.update(symbols)
+        self.pending.difference_update(symbols)
+        removed = [s for s in self.members if s in symbols]
+        self.members = [s for s in self.members if s not in symbols]
+        self._members.difference_update(symbols)
+        return removed
@@ -1,9 +1,40 @@
 import os
 import json
-import csv
+import time
+import queue
+import zlib
 import asyncio
 import websockets
-from multiprocessing import Process, Event
+from multiprocessing import Process, Event, Queue
+from core.ring_buffer import RingBufferStore, TICKER_COLUMNS, TRADE_COLUMNS, ORDERBOOK_COLUMNS, TRADE_BAR_COLUMNS
+from core.orderbook import OrderBookStore
+from core.ticker_state import TickerTable, FIELD_INDEX as TICKER_FIELD_INDEX
+from core.trade_bars import TradeAggregator, TIME, VOLUME, DOLLAR
+from core.resampler import MultiTimeframeResampler
+from core.shared_candles import SharedCandles
+from core.persistence import CsvWriteBehind
+from core.latency import recorder as latency
+from core.startup import report_first_subscription
+from config import (
+    LATENCY_REPORT_INTERVAL, LATENCY_METRICS_PORT, WS_DEBUG_SAMPLE, WS_RATE_REPORT_INTERVAL,
+    WS_SHARD_SYMBOLS, WS_SUBSCRIBE_BATCH, WS_PROCESSES, WS_STALE_TIMEOUT, WS_CONTROL_POLL_INTERVAL, UNIVERSE_SPARE_SLOTS,
+    ORDERBOOK_DEPTH, ORDERBOOK_RECORD_INTERVAL_MS, ORDERBOOK_RECORD_LEVELS,
+    TRADE_BAR_INTERVAL_MS, TRADE_BAR_FLUSH_GRACE_MS, TRADE_DOLLAR_BAR, TRADE_VOLUME_BAR_SIZES, TRADE_RAW_CSV
+)
+
+# Быстрый JSON-декодер, если установлен (orjson / msgspec), иначе стандартный json
+try:
+    import orjson
+    decode = orjson.loads
+    DECODER = "orjson"
+except ImportError:
+    try:
+        import msgspec
+        decode = msgspec.json.Decoder().decode
+        DECODER = "msgspec"
+    except ImportError:
+        decode = json.loads
+        DECODER = "json"
 
 KLINE_CSV_PATH = "/root/my_emacross_bot/bybit_futures_data_multi_tf/klines"
 TICKER_CSV_PATH = "/root/my_emacross_bot/bybit_futures_data_multi_tf/tickers"
@@ -14,11 +45,41 @@ os.makedirs(TICKER_CSV_PATH, exist_ok=True)
 os.makedirs(TRADE_CSV_PATH, exist_ok=True)
 os.makedirs(ORDERBOOK_CSV_PATH, exist_ok=True)
 
-klines_buffer = {}
-tickers_buffer = {}
-trades_buffer = {}
-orderbook_buffer = {}
-last_ticker_state = {}
+# Ёмкость кольцевых буферов на символ (память на символ фиксирована заранее)
+KLINE_BUFFER_SIZE = 1000
+TICKER_BUFFER_SIZE = 1000
+TRADE_BUFFER_SIZE = 1000
+ORDERBOOK_BUFFER_SIZE = 1000
+TRADE_BAR_BUFFER_SIZE = 1000
+
+klines_buffer = RingBufferStore(KLINE_BUFFER_SIZE)
+tickers_buffer = RingBufferStore(TICKER_BUFFER_SIZE, TICKER_COLUMNS)
+trades_buffer = RingBufferStore(TRADE_BUFFER_SIZE, TRADE_COLUMNS)
+# Бары ленты сделок по видам (core.trade_bars) и агрегаторы по символам
+trade_bars_buffer = {kind: RingBufferStore(TRADE_BAR_BUFFER_SIZE, TRADE_BAR_COLUMNS) for kind in (TIME, VOLUME, DOLLAR)}
+trade_aggregators = {}
+orderbook_buffer = RingBufferStore(ORDERBOOK_BUFFER_SIZE, ORDERBOOK_COLUMNS)
+# L2-стаканы из orderbook.<ORDERBOOK_DEPTH>; символы с разрывом u/seq ждут переподписки своим шардом
+order_books = OrderBookStore(ORDERBOOK_DEPTH)
+book_resync = set()
+# Типизированное состояние тикеров (core.ticker_state): сегмент shared memory из основного процесса
+# или локальная таблица процесса; snapshot и delta применяются на месте, без пересборки dict
+tickers = None
+_TICKER_ROW_FIELDS = [TICKER_FIELD_INDEX[name] for name in TICKER_COLUMNS if name != "timestamp"]
+# Запись CSV вне event loop: поток-писатель, долгоживущие файлы, сброс пачками
+PERSIST_FLUSH_ROWS = 1000
+PERSIST_FLUSH_INTERVAL = 1.0
+persistence = CsvWriteBehind(flush_rows=PERSIST_FLUSH_ROWS, flush_interval=PERSIST_FLUSH_INTERVAL)
+
+# Сегмент shared memory для публикации свечей в основной процесс (подключается в websocket_collector_process)
+shared_candles = None
+# Режим ресемплинга: подписка на kline.1, старшие таймфреймы собираются из минут и публикуются
+# в свои сегменты { tf: SharedCandles }
+resampler = None
+shared_resampled = {}
+# Пары, чья 1m-история для прогрева ещё не пришла (seed по очереди команд): { symbol: { timestamp: 1m-свеча } }.
+# Минуты из потока копятся и передаются ресемплеру после прогрева, чтобы интервалы не начинались с середины
+resample_pending = {}
 
 def timeframe_to_ws_interval(tf):
     tf_map = {
@@ -31,7 +92,6 @@ def timeframe_to_ws_interval(tf):
 
 def save_kline_snapshot(symbol, kline):
     filename = os.path.join(KLINE_CSV_PATH, f"{symbol}_kline.csv")
-    header = not os.path.exists(filename)
     row = {
         "timestamp": int(kline["start"]) // 1000,
         "open": float(kline["open"]),
@@ -41,112 +101,239 @@ def save_kline_snapshot(symbol, kline):
         "volume": float(kline["volume"]),
         "turnover": float(kline["turnover"]),
     }
-    try:
-        with open(filename, "a", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=row.keys())
-            if header:
-                writer.writeheader()
-            writer.writerow(row)
-    except Exception as e:
-        print(f"[WS] Ошибка записи свечи в файл для {symbol}: {e}")
-
-    if symbol not in klines_buffer:
-        klines_buffer[symbol] = []
-    klines_buffer[symbol].append(row)
-    if len(klines_buffer[symbol]) > 1000:
-        klines_buffer[symbol] = klines_buffer[symbol][-1000:]
-
-def save_ticker_snapshot(symbol, ticker):
-    filename = os.path.join(TICKER_CSV_PATH, f"{symbol}_ticker.csv")
-    header = not os.path.exists(filename)
-    row = {
-        "timestamp": int(ticker.get("ts", 0)) // 1000 if "ts" in ticker else 0,
-        "symbol": ticker.get("symbol", ""),
-        "tickDirection": ticker.get("tickDirection", ""),
-        "price24hPcnt": ticker.get("price24hPcnt", ""),
-        "lastPrice": float(ticker.get("lastPrice", 0)) if ticker.get("lastPrice") not in (None, "") else 0.0,
-        "prevPrice24h": float(ticker.get("prevPrice24h", 0)) if ticker.get("prevPrice24h") not in (None, "") else 0.0,
-        "highPrice24h": float(ticker.get("highPrice24h", 0)) if ticker.get("highPrice24h") not in (None, "") else 0.0,
-        "lowPrice24h": float(ticker.get("lowPrice24h", 0)) if ticker.get("lowPrice24h") not in (None, "") else 0.0,
-        "prevPrice1h": float(ticker.get("prevPrice1h", 0)) if ticker.get("prevPrice1h") not in (None, "") else 0.0,
-        "markPrice": float(ticker.get("markPrice", 0)) if ticker.get("markPrice") not in (None, "") else 0.0,
-        "indexPrice": float(ticker.get("indexPrice", 0)) if ticker.get("indexPrice") not in (None, "") else 0.0,
-        "openInterest": float(ticker.get("openInterest", 0)) if ticker.get("openInterest") not in (None, "") else 0.0,
-        "openInterestValue": float(ticker.get("openInterestValue", 0)) if ticker.get("openInterestValue") not in (None, "") else 0.0,
-        "turnover24h": float(ticker.get("turnover24h", 0)) if ticker.get("turnover24h") not in (None, "") else 0.0,
-        "volume24h": float(ticker.get("volume24h", 0)) if ticker.get("volume24h") not in (None, "") else 0.0,
-        "nextFundingTime": int(ticker.get("nextFundingTime", 0)) if ticker.get("nextFundingTime") not in (None, "") else 0,
-        "fundingRate": float(ticker.get("fundingRate", 0)) if ticker.get("fundingRate") not in (None, "") else 0.0,
-        "bid1Price": float(ticker.get("bid1Price", 0)) if ticker.get("bid1Price") not in (None, "") else 0.0,
-        "bid1Size": float(ticker.get("bid1Size", 0)) if ticker.get("bid1Size") not in (None, "") else 0.0,
-        "ask1Price": float(ticker.get("ask1Price", 0)) if ticker.get("ask1Price") not in (None, "") else 0.0,
-        "ask1Size": float(ticker.get("ask1Size", 0)) if ticker.get("ask1Size") not in (None, "") else 0.0,
-        "preOpenPrice": ticker.get("preOpenPrice", ""),
-        "preQty": ticker.get("preQty", ""),
-        "curPreListingPhase": ticker.get("curPreListingPhase", ""),
-    }
-    try:
-        with open(filename, "a", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=row.keys())
-            if header:
-                writer.writeheader()
-            writer.writerow(row)
-    except Exception as e:
-        print(f"[WS] Ошибка записи тикера в файл для {symbol}: {e}")
-
-    if symbol not in tickers_buffer:
-        tickers_buffer[symbol] = []
-    tickers_buffer[symbol].append(row)
-    if len(tickers_buffer[symbol]) > 1000:
-        tickers_buffer[symbol] = tickers_buffer[symbol][-1000:]
+    persistence.submit(filename, row)
+
+    # Формирующаяся свеча (тот же timestamp) обновляется в буфере на месте
+    klines_buffer.get(symbol).upsert(
+        row["timestamp"], row["open"], row["high"], row["low"], row["close"], row["volume"], row["turnover"]
+    )
+    closed = bool(kline.get("confirm"))
+    if shared_candles is not None:
+        shared_candles.publish(
+            symbol, row["timestamp"], row["open"], row["high"], row["low"], row["close"],
+            row["volume"], row["turnover"], closed=closed
+        )
+    if resampler is not None:
+        candle = (row["timestamp"], row["open"], row["high"], row["low"], row["close"], row["volume"], row["turnover"])
+        held = resample_pending.get(symbol)
+        if held is not None:
+            held[row["timestamp"]] = (candle, closed)
+        else:
+            resample_candle(symbol, candle, closed)
+
+def resample_candle(symbol, candle, closed):
+    """1m-свеча (timestamp, open, high, low, close, volume, turnover) в ресемплер и сегменты старших таймфреймов."""
+    for tf, row, tf_closed in resampler.update(symbol, *candle, closed=closed):
+        segment = shared_resampled.get(tf)
+        if segment is not None:
+            segment.publish(symbol, *row, closed=tf_closed)
+
+def seed_resampler(symbols, seed):
+    """
+    Прогрев ожидающих пар (resample_pending) по 1m-истории seed и передача накопленных за это время минут.
+    Пара без истории в seed отпускается без прогрева. Возвращает число прогретых пар.
+    """
+    seeded = 0
+    for symbol in symbols:
+        held = resample_pending.pop(symbol, None)
+        if held is None:
+            continue  # пара другого процесса или уже прогрета
+        df = (seed or {}).get(symbol)
+        if df is not None and not df.empty:
+            resampler.seed(symbol, df)
+            seeded += 1
+        for ts in sorted(held):
+            resample_candle(symbol, *held[ts])
+    return seeded
+
+def save_ticker_snapshot(symbol, ts_ms):
+    """Строка истории тикера из типизированной таблицы после применения snapshot/delta."""
+    values = tickers.row(symbol)[_TICKER_ROW_FIELDS].tolist()
+    timestamp = ts_ms // 1000
+    persistence.submit(
+        os.path.join(TICKER_CSV_PATH, f"{symbol}_ticker.csv"), dict(zip(TICKER_COLUMNS, [timestamp, *values]))
+    )
+    tickers_buffer.get(symbol).append(timestamp, *values)
+
+def _trade_aggregator(symbol):
+    agg = trade_aggregators.get(symbol)
+    if agg is None:
+        agg = trade_aggregators[symbol] = TradeAggregator(
+            symbol, TRADE_BAR_INTERVAL_MS, TRADE_VOLUME_BAR_SIZES.get(symbol, 0), TRADE_DOLLAR_BAR
+        )
+    return agg
+
+def save_trade_bars(symbol, closed):
+    for kind, bar in closed:
+        persistence.submit(os.path.join(TRADE_CSV_PATH, f"{symbol}_{kind}_bars.csv"), dict(zip(TRADE_BAR_COLUMNS, bar)))
+        trade_bars_buffer[kind].get(symbol).append(*bar)
 
 def save_trade_snapshot(symbol, trade):
-    filename = os.path.join(TRADE_CSV_PATH, f"{symbol}_trades.csv")
-    header = not os.path.exists(filename)
-    row = {
-        "timestamp": int(trade.get("T", 0)) // 1000 if "T" in trade else 0,
-        "price": float(trade.get("price", 0)) if trade.get("price") not in (None, "") else 0.0,
-        "size": float(trade.get("size", 0)) if trade.get("size") not in (None, "") else 0.0,
-        "side": trade.get("side", ""),
-        "tradeId": trade.get("tradeId", ""),
-    }
-    try:
-        with open(filename, "a", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=row.keys())
-            if header:
-                writer.writeheader()
-            writer.writerow(row)
-    except Exception as e:
-        print(f"[WS] Ошибка записи трейда в файл для {symbol}: {e}")
-
-    if symbol not in trades_buffer:
-        trades_buffer[symbol] = []
-    trades_buffer[symbol].append(row)
-    if len(trades_buffer[symbol]) > 1000:
-        trades_buffer[symbol] = trades_buffer[symbol][-1000:]
-
-def save_orderbook_snapshot(symbol, orderbook):
-    filename = os.path.join(ORDERBOOK_CSV_PATH, f"{symbol}_orderbook.csv")
-    header = not os.path.exists(filename)
+    # Bybit v5 publicTrade: T — время, p — цена, v — объём, S — сторона агрессора, i — id сделки
+    ts_ms = int(trade.get("T", 0))
+    price = float(trade.get("p") or 0)
+    size = float(trade.get("v") or 0)
+    side_name = trade.get("S", "")
+    side = 1 if side_name == "Buy" else -1 if side_name == "Sell" else 0
+    if TRADE_RAW_CSV:
+        row = {"timestamp": ts_ms // 1000, "price": price, "size": size, "side": side_name, "tradeId": trade.get("i", "")}
+        persistence.submit(os.path.join(TRADE_CSV_PATH, f"{symbol}_trades.csv"), row)
+
+    trades_buffer.get(symbol).append(ts_ms // 1000, price, size, side)
+    closed = _trade_aggregator(symbol).on_trade(ts_ms, price, size, side)
+    if closed:
+        save_trade_bars(symbol, closed)
+
+def flush_trade_bars(now_ms=None):
+    """Закрывает бары по времени у символов без новых сделок."""
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    for symbol, agg in list(trade_aggregators.items()):
+        closed = agg.flush(now_ms, TRADE_BAR_FLUSH_GRACE_MS)
+        if closed:
+            save_trade_bars(symbol, closed)
+
+def save_orderbook_snapshot(symbol, book):
+    """Строка истории стакана после применения сообщения — не чаще ORDERBOOK_RECORD_INTERVAL_MS на символ."""
+    ring = orderbook_buffer.get(symbol)
+    if len(ring) and book.ts - ring.last_value("ts_ms") < ORDERBOOK_RECORD_INTERVAL_MS:
+        return
+    bid = book.best_bid() or (0.0, 0.0)
+    ask = book.best_ask() or (0.0, 0.0)
+    bid_depth, ask_depth = book.depth(ORDERBOOK_RECORD_LEVELS)
+    total = bid_depth + ask_depth
     row = {
-        "timestamp": int(orderbook.get("ts", 0)) // 1000 if "ts" in orderbook else 0,
-        "bids": json.dumps(orderbook.get("b", [])),
-        "asks": json.dumps(orderbook.get("a", [])),
+        "ts_ms": book.ts,
+        "update_id": book.update_id,
+        "bid1Price": float(bid[0]),
+        "bid1Size": float(bid[1]),
+        "ask1Price": float(ask[0]),
+        "ask1Size": float(ask[1]),
+        "bidDepth": bid_depth,
+        "askDepth": ask_depth,
+        "imbalance": (bid_depth - ask_depth) / total if total else 0.0,
     }
-    try:
-        with open(filename, "a", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=row.keys())
-            if header:
-                writer.writeheader()
-            writer.writerow(row)
-    except Exception as e:
-        print(f"[WS] Ошибка записи стакана в файл для {symbol}: {e}")
-
-    if symbol not in orderbook_buffer:
-        orderbook_buffer[symbol] = []
-    orderbook_buffer[symbol].append(row)
-    if len(orderbook_buffer[symbol]) > 100:
-        orderbook_buffer[symbol] = orderbook_buffer[symbol][-100:]
+    persistence.submit(os.path.join(ORDERBOOK_CSV_PATH, f"{symbol}_orderbook.csv"), row)
+    ring.append(*(row[name] for name in ORDERBOOK_COLUMNS))
+
+def _on_kline(symbol, data):
+    for kline in data.get("data", []):
+        save_kline_snapshot(symbol, kline)
+
+def _on_ticker(symbol, data):
+    # Bybit v5: "snapshot" — все поля, "delta" — только изменившиеся; таблица обновляет пришедшие поля,
+    # поля, которых ещё не было, остаются NaN
+    ticker = data.get("data", {})
+    if isinstance(ticker, list):
+        # На некоторых рынках Bybit присылает list из 1 dict
+        ticker = ticker[0] if ticker else {}
+    ts_ms = int(data.get("ts", 0))
+    if tickers.apply(symbol, ticker, ts_ms):
+        save_ticker_snapshot(symbol, ts_ms)
+
+def _on_trade(symbol, data):
+    for trade in data.get("data", []):
+        save_trade_snapshot(symbol, trade)
+
+def _on_orderbook(symbol, data):
+    book = order_books.get(symbol)
+    if not book.apply(data.get("type"), data.get("data", {}), int(data.get("ts", 0))):
+        print(f"[WS] ORDERBOOK {symbol}: разрыв u/seq (u={book.update_id}), переподписка")
+        book_resync.add(symbol)
+        return
+    if book.valid:
+        save_orderbook_snapshot(symbol, book)
+
+def build_subscriptions(symbols, interval):
+    """
+    Топики подписки и таблица маршрутизации { topic: (обработчик, symbol) }.
+    Строится один раз при подписке — на каждое сообщение остаётся один поиск в dict.
+    """
+    dispatch = {}
+    for s in symbols:
+        dispatch[f"kline.{interval}.{s}"] = (_on_kline, s)
+        dispatch[f"tickers.{s}"] = (_on_ticker, s)
+        dispatch[f"publicTrade.{s}"] = (_on_trade, s)
+        dispatch[f"orderbook.{ORDERBOOK_DEPTH}.{s}"] = (_on_orderbook, s)
+    return list(dispatch), dispatch
+
+def handle_message(data, dispatch):
+    """Передаёт разобранное сообщение обработчику топика. Возвращает symbol; None — топик не из таблицы (ответы op и т.п.)"""
+    route = dispatch.get(data.get("topic"))
+    if route is None:
+        return None
+    handler, symbol = route
+    handler(symbol, data)
+    return symbol
+
+class MessageRate:
+    """Счётчик сообщений: всего и сообщений/сек за последний интервал отчёта"""
+    __slots__ = ("total", "window", "window_start")
+
+    def __init__(self, now=None):
+        self.total = 0
+        self.window = 0
+        self.window_start = time.time() if now is None else now
+
+    def tick(self):
+        self.total += 1
+        self.window += 1
+
+    def roll(self, now):
+        """Сообщений/сек с прошлого вызова; окно начинается заново"""
+        rate = self.window / max(now - self.window_start, 1e-9)
+        self.window = 0
+        self.window_start = now
+        return rate
+
+class WsShard:
+    """
+    Одно соединение публичного WS со своей частью символов.
+    Переподключается и переподписывается независимо от остальных шардов; ведёт свои метрики здоровья.
+    """
+
+    def __init__(self, shard_id, symbols, interval):
+        self.id = shard_id
+        self.symbols = list(symbols)
+        self.interval = interval
+        self.blacklist = set()
+        self.connected = False
+        self.connects = 0
+        self.errors = 0
+        self.last_error = ""
+        self.last_message = 0.0
+        self.topics = 0
+        self.rate = MessageRate()
+        self.last_rate = 0.0
+        # Открытое соединение и его таблица маршрутизации — для подписки/отписки без переподключения
+        self.ws = None
+        self.dispatch = {}
+        self.running = False
+
+    def health(self, now=None):
+        now = time.time() if now is None else now
+        return {
+            "shard": self.id,
+            "symbols": len(self.symbols) - len(self.blacklist),
+            "topics": self.topics,
+            "connected": self.connected,
+            "connects": self.connects,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "messages": self.rate.total,
+            "msg_per_sec": self.last_rate,
+            "silent_sec": now - self.last_message if self.last_message else None,
+        }
+
+def build_shards(symbols, interval, shard_symbols=WS_SHARD_SYMBOLS, first_id=0):
+    """Режет список символов на шарды по shard_symbols (все топики символа — в одном шарде)."""
+    size = max(int(shard_symbols or len(symbols) or 1), 1)
+    return [
+        WsShard(first_id + k, symbols[i:i + size], interval)
+        for k, i in enumerate(range(0, len(symbols), size))
+    ]
+
+# Шарды этого процесса (для отчёта и HTTP-снимка метрик)
+shards = []
 
 def get_dynamic_timeout(interval):
     try:
@@ -159,133 +346,438 @@ def get_dynamic_timeout(interval):
             return 604800 * 1.15
         return 900
 
-async def kline_ws_worker_multi_async(symbols, timeframe="15m", stop_event=None):
-    interval = timeframe_to_ws_interval(timeframe)
+async def subscribe(ws, args, batch=WS_SUBSCRIBE_BATCH, op="subscribe"):
+    """Подписка (или op="unsubscribe" — отписка) пачками не больше batch топиков на запрос (лимит Bybit на args)."""
+    batch = max(int(batch or len(args) or 1), 1)
+    for i in range(0, len(args), batch):
+        await ws.send(json.dumps({"op": op, "args": args[i:i + batch]}))
+
+async def resync_books(ws, dispatch):
+    """Переподписка orderbook-топиков этого соединения, по которым стакан разошёлся с биржей (придёт snapshot)."""
+    topics = [f"orderbook.{ORDERBOOK_DEPTH}.{s}" for s in list(book_resync)]
+    topics = [t for t in topics if t in dispatch]
+    if not topics:
+        return
+    for topic in topics:
+        book_resync.discard(dispatch[topic][1])
+    await ws.send(json.dumps({"op": "unsubscribe", "args": topics}))
+    await subscribe(ws, topics)
+
+async def shard_subscribe(shard, symbols):
+    """Подписка пар на открытом соединении шарда (пары уже в shard.symbols); без соединения — при переподключении."""
+    if shard.ws is None:
+        return
+    args, dispatch = build_subscriptions(symbols, shard.interval)
+    shard.dispatch.update(dispatch)
+    shard.topics = len(shard.dispatch)
+    book_resync.difference_update(symbols)
+    await subscribe(shard.ws, args)
+
+async def drop_topics(shard, symbols):
+    """Отписка всех топиков пар на открытом соединении шарда, остальные подписки не трогаются."""
+    symbols = set(symbols)
+    topics = [topic for topic, (_, symbol) in shard.dispatch.items() if symbol in symbols]
+    for topic in topics:
+        del shard.dispatch[topic]
+    shard.topics = len(shard.dispatch)
+    book_resync.difference_update(symbols)
+    if topics and shard.ws is not None:
+        await subscribe(shard.ws, topics, op="unsubscribe")
+
+async def catch_up_subscriptions(shard, args):
+    """
+    Изменения состава шарда за время подключения (shard.ws ещё был None, add/remove_symbols
+    не дошли до биржи): подписка добавленных пар и отписка топиков снятых.
+    """
+    subscribed = {symbol for _, symbol in shard.dispatch.values()}
+    added = [s for s in shard.symbols if s not in shard.blacklist and s not in subscribed]
+    stale = [topic for topic in args if topic not in shard.dispatch]
+    if stale:
+        await subscribe(shard.ws, stale, op="unsubscribe")
+    if added:
+        await shard_subscribe(shard, added)
+
+async def run_shard(shard, stop_event=None):
     ws_url = "wss://stream.bybit.com/v5/public/linear"
-    blacklist = set()
-    timeout = get_dynamic_timeout(interval)
+    timeout = get_dynamic_timeout(shard.interval)
+    if WS_STALE_TIMEOUT:
+        timeout = min(timeout, WS_STALE_TIMEOUT)
+    shard.running = True
     while not (stop_event and stop_event.is_set()):
-        sub_symbols = [s for s in symbols if s not in blacklist]
+        sub_symbols = [s for s in shard.symbols if s not in shard.blacklist]
         if not sub_symbols:
-            print("[WS] Нет валидных пар для подписки, поток остановлен.")
+            print(f"[WS] Шард {shard.id}: нет валидных пар для подписки, шард остановлен.")
             break
+        args, shard.dispatch = build_subscriptions(sub_symbols, shard.interval)
+        dispatch = shard.dispatch
+        shard.topics = len(args)
         try:
             async with websockets.connect(ws_url, ping_interval=10, ping_timeout=5) as ws:
-                args = []
-                args += [f"kline.{interval}.{s}" for s in sub_symbols]
-                args += [f"tickers.{s}" for s in sub_symbols]
-                args += [f"publicTrade.{s}" for s in sub_symbols]
-                args += [f"orderbook.1.{s}" for s in sub_symbols]
-                sub_msg = json.dumps({"op": "subscribe", "args": args})
-                await ws.send(sub_msg)
-                print(f"[WS] Подключён к каналам: {args}")
+                await subscribe(ws, args)
+                book_resync.difference_update(sub_symbols)  # по новой подписке придут snapshot стаканов
+                shard.ws = ws
+                shard.connected = True
+                await catch_up_subscriptions(shard, args)
+                report_first_subscription()
+                shard.connects += 1
+                print(f"[WS] Шард {shard.id}: подключён к {len(args)} каналам по {len(sub_symbols)} парам (декодер {DECODER})")
 
                 while not (stop_event and stop_event.is_set()):
                     try:
                         msg = await asyncio.wait_for(ws.recv(), timeout=timeout)
-                        data = json.loads(msg)
-                        print(f"[WS] Raw message: {data}")
-                        # Ошибки подписки
+                        received = time.time()
+                        started = time.perf_counter()
+                        data = decode(msg)
+                        latency.record_since("parse", started)
+                        shard.last_message = received
+                        shard.rate.tick()
+                        if WS_DEBUG_SAMPLE and shard.rate.total % WS_DEBUG_SAMPLE == 0:
+                            print(f"[WS] Шард {shard.id} raw message: {data}")
+
+                        # Ошибки подписки — пара в черный список и отписка её топиков, соединение не рвётся
                         if "error" in data and "topic" in data:
                             bad_topic = data["topic"]
-                            print(f"[WS] Ошибка подписки: {bad_topic} — в черный список!")
+                            print(f"[WS] Шард {shard.id}: ошибка подписки {bad_topic} — в черный список!")
                             bad_symbol = bad_topic.split(".")[-1]
-                            blacklist.add(bad_symbol)
-                            break
+                            shard.blacklist.add(bad_symbol)
+                            await drop_topics(shard, [bad_symbol])
+                            continue
+                        symbol = handle_message(data, dispatch)
+                        if symbol is not None:
+                            latency.record_since("recv_to_dispatched", started)
+                            if "ts" in data:
+                                latency.record_feed_lag(symbol, data["ts"], received)
+                            if book_resync:
+                                await resync_books(ws, dispatch)
+                            continue
                         if "success" in data and not data["success"]:
                             bad_topic = data.get("ret_msg", "")
-                            print(f"[WS] Ошибка подписки: {bad_topic}")
+                            print(f"[WS] Шард {shard.id}: ошибка подписки: {bad_topic}")
                             if "topic:" in bad_topic:
                                 bad_symbol = bad_topic.split("topic:")[-1].split(".")[-1]
-                                blacklist.add(bad_symbol)
+                                shard.blacklist.add(bad_symbol)
+                                await drop_topics(shard, [bad_symbol])
                             continue
-                        # KLINES
-                        if "topic" in data and data["topic"].startswith("kline"):
-                            topic = data["topic"]
-                            symbol = topic.split(".")[-1]
-                            kline_list = data.get("data", [])
-                            for kline in kline_list:
-                                save_kline_snapshot(symbol, kline)
-                                print(f"[WS] KLINE {symbol}: {kline}")
-                        # TICKERS (Bybit v5: "snapshot" и "delta" имеют разный набор полей)
-                        elif "topic" in data and data["topic"].startswith("tickers"):
-                            topic = data["topic"]
-                            symbol = topic.split(".")[-1]
-                            # snapshot/делта для v5
-                            if data.get("type") == "snapshot":
-                                ticker = data.get("data", {})
-                                if isinstance(ticker, list) and len(ticker) > 0:
-                                    # На некоторых рынках Bybit присылает list из 1 dict
-                                    ticker = ticker[0]
-                                last_ticker_state[symbol] = ticker.copy()
-                                save_ticker_snapshot(symbol, ticker)
-                                print(f"[WS] TICKER {symbol}: {ticker}")
-                            elif data.get("type") == "delta":
-                                delta = data.get("data", {})
-                                if symbol in last_ticker_state:
-                                    last_ticker_state[symbol].update(delta)
-                                    save_ticker_snapshot(symbol, last_ticker_state[symbol])
-                                    print(f"[WS] TICKER {symbol}: {last_ticker_state[symbol]}")
-                                else:
-                                    print(f"[WS] Delta до snapshot для {symbol}: {delta}")
-                        # TRADES
-                        elif "topic" in data and data["topic"].startswith("publicTrade"):
-                            topic = data["topic"]
-                            symbol = topic.split(".")[-1]
-                            trades = data.get("data", [])
-                            for trade in trades:
-                                save_trade_snapshot(symbol, trade)
-                                print(f"[WS] TRADE {symbol}: {trade}")
-                        # ORDERBOOK
-                        elif "topic" in data and data["topic"].startswith("orderbook"):
-                            topic = data["topic"]
-                            symbol = topic.split(".")[-1]
-                            orderbook = data.get("data", {})
-                            save_orderbook_snapshot(symbol, orderbook)
-                            print(f"[WS] ORDERBOOK {symbol}: {orderbook}")
                     except asyncio.TimeoutError:
-                        print(f"[WS] Timeout ожидания сообщения ({timeout} сек), переподключение...")
+                        print(f"[WS] Шард {shard.id}: timeout ожидания сообщения ({timeout} сек), переподключение...")
+                        shard.errors += 1
+                        shard.last_error = "timeout"
                         break
                     except Exception as e:
-                        print(f"[WS] WebSocket message error: {e}")
+                        print(f"[WS] Шард {shard.id}: WebSocket message error: {e}")
+                        shard.errors += 1
+                        shard.last_error = str(e)
                         break
         except Exception as e:
-            print(f"[WS] Ошибка подключения: {e}")
+            print(f"[WS] Шард {shard.id}: ошибка подключения: {e}")
+            shard.errors += 1
+            shard.last_error = str(e)
+        shard.connected = False
+        shard.ws = None
         if stop_event and stop_event.is_set():
             break
         await asyncio.sleep(1)
+    shard.running = False
+
+def shards_health():
+    return [shard.health() for shard in shards]
 
-def websocket_collector_process(symbols, timeframe="15m", stop_event=None):
+def report_shards(now=None):
+    """Сводка [WS]: сообщений/сек по процессу и по каждому шарду."""
+    now = time.time() if now is None else now
+    rates = [shard.rate.roll(now) for shard in shards]
+    for shard, rate in zip(shards, rates):
+        shard.last_rate = rate
+    connected = sum(shard.connected for shard in shards)
+    lines = [f"[WS] {sum(rates):.0f} сообщ/с (всего {sum(s.rate.total for s in shards)}), "
+             f"шардов на связи {connected}/{len(shards)}"]
+    for shard in shards:
+        h = shard.health(now)
+        silent = f"{h['silent_sec']:.0f}с" if h["silent_sec"] is not None else "—"
+        lines.append(f"  шард {h['shard']:<3} {'ok ' if h['connected'] else 'OFF'} {h['msg_per_sec']:>8.0f} сообщ/с  "
+                     f"пар={h['symbols']:<4} переподкл.={h['connects']:<3} ошибок={h['errors']:<3} тишина={silent}")
+    return "\n".join(lines)
+
+async def _report_loop(stop_event, interval):
+    while not (stop_event and stop_event.is_set()):
+        await asyncio.sleep(interval)
+        print(report_shards())
+
+async def _trade_bars_flush_loop(stop_event, interval):
+    while not (stop_event and stop_event.is_set()):
+        await asyncio.sleep(interval)
+        flush_trade_bars()
+
+def _shard_with_room():
+    """Работающий шард, в который ещё помещаются пары (WS_SHARD_SYMBOLS), — наименее загруженный; иначе None."""
+    limit = WS_SHARD_SYMBOLS or float("inf")
+    candidates = [shard for shard in shards if shard.running and len(shard.symbols) < limit]
+    return min(candidates, key=lambda shard: len(shard.symbols), default=None)
+
+async def add_symbols(symbols, interval, stop_event=None, seed=None):
+    """
+    Новые пары вселенной: подписка на открытых соединениях шардов с запасом, остальные — в новый шард.
+    seed — { symbol: 1m DataFrame } для прогрева ресемплера. Возвращает реально добавленные пары.
+    """
+    owned = {s for shard in shards for s in shard.symbols}
+    new = [s for s in dict.fromkeys(symbols) if s not in owned]
+    pending = {}
+    for symbol in new:
+        if tickers is not None and tickers.shm is None:
+            tickers.register(symbol)  # в shared memory слот занимает основной процесс
+        if resampler is not None and seed and symbol in seed:
+            resampler.seed(symbol, seed[symbol])
+        shard = _shard_with_room()
+        if shard is None:
+            shard = WsShard(max((sh.id for sh in shards), default=-1) + 1, [], interval)
+            shard.running = True
+            shards.append(shard)
+            asyncio.ensure_future(run_shard(shard, stop_event))  # подпишется при подключении
+        shard.symbols.append(symbol)
+        pending.setdefault(shard.id, (shard, []))[1].append(symbol)
+    for shard, shard_symbols in pending.values():
+        await shard_subscribe(shard, shard_symbols)
+    return new
+
+async def remove_symbols(symbols):
+    """Пары, вышедшие из вселенной: отписка их топиков, состояние потоковых агрегатов сбрасывается."""
+    symbols = set(symbols)
+    removed = []
+    for shard in shards:
+        own = [s for s in shard.symbols if s in symbols]
+        if not own:
+            continue
+        shard.symbols = [s for s in shard.symbols if s not in symbols]
+        shard.blacklist.difference_update(own)
+        await drop_topics(shard, own)
+        removed.extend(own)
+    for symbol in removed:
+        trade_aggregators.pop(symbol, None)
+        if resampler is not None:
+            resampler.forget(symbol)
+            resample_pending.pop(symbol, None)
+        if symbol in order_books:
+            order_books.get(symbol).valid = False
+    return removed
+
+async def _control_loop(stop_event, control, interval):
+    """Команды основного процесса об изменении вселенной (см. send_universe_change)."""
+    while not (stop_event and stop_event.is_set()):
+        try:
+            action, symbols, seed = control.get_nowait()
+        except queue.Empty:
+            await asyncio.sleep(WS_CONTROL_POLL_INTERVAL)
+            continue
+        try:
+            if action == "subscribe":
+                added = await add_symbols(symbols, interval, stop_event, seed)
+                if added:
+                    print(f"[WS] Вселенная: подписка на {len(added)} новых пар {added}")
+            elif action == "unsubscribe":
+                removed = await remove_symbols(symbols)
+                if removed:
+                    print(f"[WS] Вселенная: отписка от {len(removed)} пар {removed}")
+            elif action == "seed" and resampler is not None:
+                seeded = seed_resampler(symbols, seed)
+                print(f"[WS] Ресемплер: прогрето {seeded} пар по 1m-истории")
+        except Exception as e:
+            # Пары уже в shard.symbols — подпишутся при переподключении шарда
+            print(f"[WS] Ошибка применения изменения вселенной ({action}): {e}")
+
+def send_universe_change(controls, added=(), removed=(), seed=None):
+    """
+    Изменение вселенной для процессов collector (controls — очереди из start_websocket_collector_proc).
+    Отписка рассылается всем процессам (каждый снимает свои пары), новые пары раздаются по crc32 имени.
+    seed — { symbol: 1m DataFrame } для ресемплера (режим RESAMPLE_TIMEFRAMES): история новых пар идёт
+    вместе с подпиской, история уже подписанных (collector запущен с await_seed) — всем процессам,
+    каждый прогревает свои ожидающие пары (значение None — истории нет, пара отпускается без прогрева).
+    """
+    if removed:
+        for control in controls:
+            control.put(("unsubscribe", list(removed), None))
+    running = [s for s in seed or {} if s not in added]
+    if running:
+        for control in controls:
+            control.put(("seed", running, {s: seed[s] for s in running}))
+    groups = {}
+    for symbol in added:
+        groups.setdefault(zlib.crc32(symbol.encode()) % len(controls), []).append(symbol)
+    for k, group in groups.items():
+        part = {s: seed[s] for s in group if s in seed} if seed else None
+        controls[k].put(("subscribe", group, part))
+
+async def kline_ws_worker_multi_async(symbols, timeframe="15m", stop_event=None, shard_list=None, control=None):
+    """
+    Все шарды процесса в одном event loop; shard_list — готовые шарды (иначе режутся из symbols).
+    control — очередь команд изменения вселенной (подписка/отписка пар на открытых соединениях).
+    """
+    interval = timeframe_to_ws_interval(timeframe)
+    if tickers is None:
+        setup_tickers(symbols)
+    shards[:] = shard_list if shard_list is not None else build_shards(symbols, interval)
+    tasks = [run_shard(shard, stop_event) for shard in shards]
+    if control is not None:
+        tasks.append(_control_loop(stop_event, control, interval))
+    background = []
+    if WS_RATE_REPORT_INTERVAL:
+        background.append(asyncio.ensure_future(_report_loop(stop_event, WS_RATE_REPORT_INTERVAL)))
+    if TRADE_BAR_INTERVAL_MS:
+        background.append(asyncio.ensure_future(_trade_bars_flush_loop(stop_event, TRADE_BAR_INTERVAL_MS / 1000)))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in background:
+            task.cancel()
+
+def setup_resampler(resample_shm, symbols, seed=None, await_seed=False):
+    """
+    Ресемплер 1m -> таймфреймы из resample_shm ({ tf: имя сегмента }), прогрев по 1m-истории seed.
+    await_seed — история придёт позже по очереди команд (send_universe_change(seed=...)), до неё минуты копятся.
+    """
+    global resampler
+    resampler = MultiTimeframeResampler(list(resample_shm))
+    for tf, name in resample_shm.items():
+        try:
+            shared_resampled[tf] = SharedCandles.attach(name, writable=True)
+        except Exception as e:
+            print(f"[WS-PROC] Не удалось подключиться к shared memory {name} ({tf}): {e}")
+    if await_seed:
+        resample_pending.update({symbol: {} for symbol in symbols})
+        print(f"[WS-PROC] Ресемплинг 1m -> {resampler.timeframes}, прогрев {len(symbols)} пар — по очереди команд")
+        return
+    seeded = 0
+    for symbol in symbols:
+        df = (seed or {}).get(symbol)
+        if df is not None and not df.empty:
+            resampler.seed(symbol, df)
+            seeded += 1
+    print(f"[WS-PROC] Ресемплинг 1m -> {resampler.timeframes}, прогрето {seeded} пар")
+
+def setup_tickers(symbols, shm_name=None):
+    """Таблица тикеров: сегмент shm_name основного процесса, иначе локальная по symbols."""
+    global tickers
+    if shm_name:
+        try:
+            tickers = TickerTable.attach(shm_name)
+            print(f"[WS-PROC] Тикеры публикуются в shared memory {shm_name}")
+            return tickers
+        except Exception as e:
+            print(f"[WS-PROC] Не удалось подключиться к shared memory {shm_name}: {e}")
+    tickers = TickerTable.local(symbols, spare=UNIVERSE_SPARE_SLOTS)
+    return tickers
+
+def websocket_collector_process(symbols, timeframe="15m", stop_event=None, shm_name=None, shard_symbols=None, process_index=0,
+                                resample_shm=None, seed=None, tickers_shm=None, control=None, await_seed=False):
+    """
+    shard_symbols — [(shard_id, [symbols]), ...] для этого процесса (режим нескольких процессов).
+    resample_shm — { tf: имя сегмента }: старшие таймфреймы из потока timeframe (должен быть 1m), seed — { symbol: 1m DataFrame }.
+    await_seed — seed придёт позже через control (send_universe_change), см. setup_resampler.
+    tickers_shm — имя сегмента таблицы тикеров (core.ticker_state) всей вселенной.
+    control — очередь команд изменения вселенной (send_universe_change).
+    """
+    global shared_candles, resampler, tickers
+    if shm_name:
+        try:
+            shared_candles = SharedCandles.attach(shm_name, writable=True)
+            print(f"[WS-PROC] Свечи публикуются в shared memory {shm_name}")
+        except Exception as e:
+            print(f"[WS-PROC] Не удалось подключиться к shared memory {shm_name}: {e}")
+    if resample_shm:
+        own = [s for _, syms in shard_symbols for s in syms] if shard_symbols is not None else symbols
+        setup_resampler(resample_shm, own, seed, await_seed)
+    setup_tickers(symbols, tickers_shm)
+    latency.name = f"collector-{process_index}" if shard_symbols is not None else "collector"
+    latency.add_source("ws_shards", shards_health)
+    latency.start_reporter(LATENCY_REPORT_INTERVAL, LATENCY_METRICS_PORT + 1 + process_index if LATENCY_METRICS_PORT else 0)
+    interval = timeframe_to_ws_interval(timeframe)
+    shard_list = None
+    if shard_symbols is not None:
+        shard_list = [WsShard(shard_id, shard_syms, interval) for shard_id, shard_syms in shard_symbols]
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     try:
-        loop.run_until_complete(kline_ws_worker_multi_async(symbols, timeframe, stop_event))
+        loop.run_until_complete(kline_ws_worker_multi_async(symbols, timeframe, stop_event, shard_list, control))
     finally:
         loop.close()
+        persistence.stop()
+        latency.stop()
+        if shared_candles is not None:
+            shared_candles.close()
+            shared_candles = None
+        for segment in shared_resampled.values():
+            segment.close()
+        shared_resampled.clear()
+        resample_pending.clear()
+        resampler = None
+        tickers.close()
+        tickers = None
 
-def start_websocket_collector_proc(symbols, timeframe="15m"):
+def start_websocket_collector_proc(symbols, timeframe="15m", shm_name=None, processes=WS_PROCESSES,
+                                   resample_shm=None, seed=None, tickers_shm=None, await_seed=False):
+    """
+    Запускает collector в processes процессах; шарды по WS_SHARD_SYMBOLS пар раздаются процессам по кругу.
+    resample_shm / seed / await_seed — режим ресемплинга, tickers_shm — таблица тикеров (см. websocket_collector_process).
+    Возвращает (список процессов, общий stop_event, очереди команд процессов для send_universe_change).
+    """
     stop_event = Event()
-    p = Process(target=websocket_collector_process, args=(symbols, timeframe, stop_event))
-    p.start()
-    print(f"[WS-PROC] Процесс WebSocket collector запущен с pid={p.pid}")
-    return p, stop_event
+    processes = max(int(processes or 1), 1)
+    shared = {"resample_shm": resample_shm, "seed": seed, "tickers_shm": tickers_shm, "await_seed": await_seed}
+    if processes == 1:
+        control = Queue()
+        p = Process(target=websocket_collector_process, args=(symbols, timeframe, stop_event, shm_name),
+                    kwargs=dict(shared, control=control))
+        p.start()
+        print(f"[WS-PROC] Процесс WebSocket collector запущен с pid={p.pid}")
+        return [p], stop_event, [control]
+    chunks = [(shard.id, shard.symbols) for shard in build_shards(symbols, timeframe_to_ws_interval(timeframe))]
+    procs, controls = [], []
+    for k in range(min(processes, len(chunks))):
+        own = chunks[k::processes]
+        control = Queue()
+        p = Process(target=websocket_collector_process,
+                    args=(symbols, timeframe, stop_event, shm_name, own, k), kwargs=dict(shared, control=control))
+        p.start()
+        procs.append(p)
+        controls.append(control)
+        print(f"[WS-PROC] Процесс WebSocket collector {k} запущен с pid={p.pid}, шарды {[c[0] for c in own]}")
+    return procs, stop_event, controls
 
+# get_last_n_klines/tickers/trades возвращают { колонка: numpy view } последних n записей (без копирования)
 def get_last_n_klines(symbol, n=100):
     if symbol in klines_buffer:
-        return klines_buffer[symbol][-n:]
-    return []
+        return klines_buffer.get(symbol).last(n)
+    return {}
 
 def get_last_n_tickers(symbol, n=100):
     if symbol in tickers_buffer:
-        return tickers_buffer[symbol][-n:]
-    return []
+        return tickers_buffer.get(symbol).last(n)
+    return {}
 
 def get_last_n_trades(symbol, n=100):
     if symbol in trades_buffer:
-        return trades_buffer[symbol][-n:]
-    return []
+        return trades_buffer.get(symbol).last(n)
+    return {}
+
+def get_last_n_trade_bars(symbol, kind=TIME, n=100):
+    """Последние n баров ленты сделок вида kind ("time" / "volume" / "dollar")"""
+    if symbol in trade_bars_buffer[kind]:
+        return trade_bars_buffer[kind].get(symbol).last(n)
+    return {}
 
 def get_last_n_orderbooks(symbol, n=10):
     if symbol in orderbook_buffer:
-        return orderbook_buffer[symbol][-n:]
-    return []
\ No newline at end of file
+        return orderbook_buffer.get(symbol).last(n)
+    return {}
+
+def get_order_book(symbol):
+    """Текущий L2-стакан символа (core.orderbook.L2Book) или None, если стакан ещё не получен/невалиден"""
+    if symbol in order_books:
+        book = order_books.get(symbol)
+        if book.valid:
+            return book
+    return None
+def get_ticker(symbol):
+    """Текущее состояние тикера { поле: float } из типизированной таблицы или None"""
+    if tickers is None:
+        return None
+    return tickers.get(symbol)
@@ -1,7 +1,6 @@
 import os
 from time import sleep
 from multiprocessing import Process, Event
-from pybit.unified_trading import WebSocket
 from dotenv import load_dotenv
 
 def handle_private_message(msg):
@@ -32,6 +31,22 @@ def handle_private_message(msg):
         except Exception:
             pass
 
+def start_private_stream(callback, api_key, api_secret):
+    """Приватный WebSocket с подписками position / order / wallet / execution; сообщения уходят в callback."""
+    from pybit.unified_trading import WebSocket  # pybit грузится только при подключении приватного потока
+    ws_private = WebSocket(
+        testnet=False,
+        channel_type="private",
+        api_key=api_key,
+        api_secret=api_secret,
+        callback_function=callback
+    )
+    ws_private.position_stream(callback=callback)
+    ws_private.order_stream(callback=callback)
+    ws_private.wallet_stream(callback=callback)
+    ws_private.execution_stream(callback=callback)
+    return ws_private
+
 def websocket_private_process(api_key, api_secret, stop_event=None):
     # Критично: загружаем переменные окружения именно здесь, чтобы видеть их и в дочернем процессе!
     load_dotenv()
@@ -45,17 +60,8 @@ def websocket_private_process(api_key, api_secret, stop_event=None):
         print("[WS-PRIVATE-ERROR] Нет API KEY или SECRET для приватного WebSocket!", flush=True)
         return
     print(f"[WS-PRIVATE] api_key: {api_key}, api_secret: {'*' * len(api_secret) if api_secret else None}", flush=True)
-    ws_private = WebSocket(
-        testnet=False,
-        channel_type="private",
-        api_key=api_key,
-        api_secret=api_secret,
-        callback_function=handle_private_message
-    )
+    ws_private = start_private_stream(handle_private_message, api_key, api_secret)
     print("[WS-PRIVATE] Бот подключен к кабинету (Bybit Private WebSocket) — соединение установлено", flush=True)
-    ws_private.position_stream(callback=handle_private_message)
-    ws_private.order_stream(callback=handle_private_message)
-    ws_private.wallet_stream(callback=handle_private_message)
     try:
         while not (stop_event and stop_event.is_set()):
             sleep(1)
@@ -63,6 +69,10 @@ def websocket_private_process(api_key, api_secret, stop_event=None):
         pass
 
 def start_websocket_private_proc(api_key=None, api_secret=None):
+    """
+    Отдельный процесс, который только печатает баланс/позиции (без торговли). Вместе с BybitTrader
+    не запускать: трейдер держит собственный приватный поток, и это было бы второе соединение.
+    """
     stop_event = Event()
     p = Process(target=websocket_private_process, args=(api_key, api_secret, stop_event))
     p.start()
@@ -1,5 +1,5 @@
 import pandas as pd
-from configs.config import ADX_PERIOD, TIMEFRAME
+from config import ADX_PERIOD, TIMEFRAME
 
 def calculate_adx(df: pd.DataFrame) -> pd.Series:
     """
@@ -1,5 +1,5 @@
 import pandas as pd
-from configs.config import CMO_PERIOD, TIMEFRAME
+from config import CMO_PERIOD, TIMEFRAME
 
 def calculate_cmo(close: pd.Series) -> pd.Series:
     """
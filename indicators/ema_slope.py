@@ -1,8 +1,21 @@
 import numpy as np
 import pandas as pd
-from sklearn.linear_model import LinearRegression
+from functools import lru_cache
+from numpy.lib.stride_tricks import sliding_window_view
 from config import EMA_WINDOW, SLOPE_PERIOD
 
+@lru_cache(maxsize=None)
+def slope_weights(slope_period: int = SLOPE_PERIOD) -> np.ndarray:
+    """
+    Предрасчитанные x-статистики для МНК-наклона по точкам x = 0..slope_period-1.
+    slope = sum(w_i * y_i), где w_i = (x_i - mean(x)) / sum((x - mean(x))^2)
+    """
+    x = np.arange(slope_period, dtype=np.float64)
+    x_centered = x - x.mean()
+    weights = x_centered / (x_centered ** 2).sum()
+    weights.setflags(write=False)
+    return weights
+
 def calculate_ema_slope(
     prices: pd.Series,
     ema_window: int = EMA_WINDOW,
@@ -20,11 +33,27 @@ def calculate_ema_slope(
         raise ValueError(f"Need at least {ema_window + slope_period} data points")
 
     ema_series = prices.ewm(span=ema_window, adjust=False).mean()
-    ema_values = ema_series.dropna().iloc[-slope_period:].values
+    ema_values = ema_series.dropna().to_numpy(dtype=np.float64)[-slope_period:]
 
-    X = np.arange(slope_period).reshape(-1, 1)
-    model = LinearRegression()
-    model.fit(X, ema_values)
-    slope = model.coef_[0]
+    slope = float(ema_values @ slope_weights(slope_period))
 
     return slope, ema_series
+
+def calculate_rolling_ema_slope(
+    prices: pd.Series,
+    ema_window: int = EMA_WINDOW,
+    slope_period: int = SLOPE_PERIOD
+):
+    """
+    Наклон EMA на каждой свече (для бэктестов): значение в точке t равно
+    calculate_ema_slope(prices[:t+1]). Пока цен меньше ema_window + slope_period — NaN.
+
+    :return: (slope_series, ema_series) с индексом prices
+    """
+    ema_series = prices.ewm(span=ema_window, adjust=False).mean()
+    ema_values = ema_series.to_numpy(dtype=np.float64)
+    slope = np.full(len(ema_values), np.nan, dtype=np.float64)
+    if len(ema_values) >= slope_period:
+        slope[slope_period - 1:] = sliding_window_view(ema_values, slope_period) @ slope_weights(slope_period)
+    slope[:ema_window + slope_period - 1] = np.nan
+    return pd.Series(slope, index=prices.index), ema_series
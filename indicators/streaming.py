@@ -0,0 +1,257 @@
+import copy
+import math
+from collections import deque
+from indicators.ema_slope import slope_weights
+from config import TEMA_PERIODS, ADX_PERIOD, CMO_PERIOD, EMA_WINDOW, SLOPE_PERIOD
+
+# Потоковые (инкрементальные) версии индикаторов из папки indicators.
+# Каждое состояние принимает одну свечу за раз и обновляется за O(1),
+# результаты совпадают с пакетными calculate_* (pandas) с точностью до float.
+
+NAN = float("nan")
+
+
+def _div(a, b):
+    """Деление с семантикой pandas: x/0 -> inf, 0/0 -> NaN (без исключений)."""
+    try:
+        return a / b
+    except ZeroDivisionError:
+        if a == 0 or a != a:
+            return NAN
+        return math.copysign(math.inf, a)
+
+
+class RollingSum:
+    """
+    Скользящая сумма по окну period (аналог rolling(window=period, min_periods=period)).
+    NaN-значения в окне делают результат NaN, как в pandas.
+    Сумма ведётся инкрементально и раз в period шагов пересчитывается точно (fsum),
+    чтобы не накапливалась ошибка округления.
+    """
+    __slots__ = ("period", "window", "total", "valid", "nonzero", "_steps")
+
+    def __init__(self, period):
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+        self.valid = 0      # количество не-NaN значений в окне
+        self.nonzero = 0    # количество ненулевых значений в окне
+        self._steps = 0
+
+    def push(self, x):
+        if len(self.window) == self.period:
+            old = self.window[0]
+            if old == old:
+                self.total -= old
+                self.valid -= 1
+                if old != 0:
+                    self.nonzero -= 1
+        self.window.append(x)
+        if x == x:
+            self.total += x
+            self.valid += 1
+            if x != 0:
+                self.nonzero += 1
+        self._steps += 1
+        if self._steps >= self.period:
+            self._steps = 0
+            self.total = math.fsum(v for v in self.window if v == v)
+        return self.sum()
+
+    def sum(self):
+        if self.valid < self.period:
+            return NAN
+        if self.nonzero == 0:
+            return 0.0
+        return self.total
+
+    def mean(self):
+        return self.sum() / self.period
+
+
+class EmaState:
+    """EMA с adjust=False: первое значение равно первой цене."""
+    __slots__ = ("alpha", "value")
+
+    def __init__(self, period):
+        self.alpha = 2.0 / (period + 1)
+        self.value = None
+
+    def update(self, x):
+        if self.value is None:
+            self.value = x
+        else:
+            self.value = (1 - self.alpha) * self.value + self.alpha * x
+        return self.value
+
+
+class TemaState:
+    """TEMA = 3 * (e1 - e2) + e3, где e1/e2/e3 — цепочка из трёх EMA."""
+    __slots__ = ("period", "e1", "e2", "e3", "value")
+
+    def __init__(self, period):
+        self.period = period
+        self.e1 = EmaState(period)
+        self.e2 = EmaState(period)
+        self.e3 = EmaState(period)
+        self.value = NAN
+
+    def update(self, close):
+        v1 = self.e1.update(close)
+        v2 = self.e2.update(v1)
+        v3 = self.e3.update(v2)
+        self.value = 3 * (v1 - v2) + v3
+        return self.value
+
+
+class AdxState:
+    """Потоковая версия indicators.adx.calculate_adx (скользящие средние TR, +DM, -DM, DX)."""
+    __slots__ = ("period", "prev_high", "prev_low", "prev_close", "tr", "plus_dm", "minus_dm", "dx", "value")
+
+    def __init__(self, period=ADX_PERIOD):
+        self.period = period
+        self.prev_high = None
+        self.prev_low = None
+        self.prev_close = None
+        self.tr = RollingSum(period)
+        self.plus_dm = RollingSum(period)
+        self.minus_dm = RollingSum(period)
+        self.dx = RollingSum(period)
+        self.value = NAN
+
+    def update(self, high, low, close):
+        if self.prev_close is None:
+            plus_dm = NAN
+            minus_dm = NAN
+            tr = high - low
+        else:
+            up = high - self.prev_high
+            down = low - self.prev_low
+            # Те же правила обнуления, что и в пакетной версии
+            plus_dm = up
+            if plus_dm < abs(down):
+                plus_dm = 0.0
+            if plus_dm < 0:
+                plus_dm = 0.0
+            minus_dm = down
+            if minus_dm < plus_dm:
+                minus_dm = 0.0
+            if minus_dm > 0:
+                minus_dm = 0.0
+            minus_dm = abs(minus_dm)
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_high, self.prev_low, self.prev_close = high, low, close
+
+        self.tr.push(tr)
+        self.plus_dm.push(plus_dm)
+        self.minus_dm.push(minus_dm)
+        atr = self.tr.mean()
+        plus_di = 100 * _div(self.plus_dm.mean(), atr)
+        minus_di = 100 * _div(self.minus_dm.mean(), atr)
+        dx = _div(abs(plus_di - minus_di), plus_di + minus_di) * 100
+        self.dx.push(dx)
+        self.value = self.dx.mean()
+        return self.value
+
+
+class CmoState:
+    """Потоковая версия indicators.cmo.calculate_cmo."""
+    __slots__ = ("period", "prev_close", "up", "down", "value")
+
+    def __init__(self, period=CMO_PERIOD):
+        self.period = period
+        self.prev_close = None
+        self.up = RollingSum(period)
+        self.down = RollingSum(period)
+        self.value = NAN
+
+    def update(self, close):
+        # Первая разница в пакетной версии NaN -> where(...) превращает её в 0
+        diff = 0.0 if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+        sum_up = self.up.push(diff if diff > 0 else 0.0)
+        sum_down = self.down.push(-diff if diff < 0 else 0.0)
+        self.value = 100 * _div(sum_up - sum_down, sum_up + sum_down)
+        return self.value
+
+
+class EmaSlopeState:
+    """
+    Потоковая версия indicators.ema_slope.calculate_ema_slope.
+    Наклон — МНК по последним slope_period значениям EMA; веса по x считаются один раз.
+    До накопления ema_window + slope_period цен значение равно None.
+    """
+    __slots__ = ("ema_window", "slope_period", "ema", "window", "weights", "count", "value")
+
+    def __init__(self, ema_window=EMA_WINDOW, slope_period=SLOPE_PERIOD):
+        self.ema_window = ema_window
+        self.slope_period = slope_period
+        self.ema = EmaState(ema_window)
+        self.window = deque(maxlen=slope_period)
+        self.weights = tuple(slope_weights(slope_period).tolist())
+        self.count = 0
+        self.value = None
+
+    def update(self, close):
+        self.window.append(self.ema.update(close))
+        self.count += 1
+        if self.count >= self.ema_window + self.slope_period:
+            self.value = math.fsum(w * y for w, y in zip(self.weights, self.window))
+        return self.value
+
+
+class SymbolIndicators:
+    """
+    Набор потоковых состояний индикаторов для одного символа.
+    update() принимает одну закрытую свечу; свечи с timestamp <= последнего игнорируются.
+    """
+    __slots__ = ("tema", "adx", "cmo", "ema_slope", "count", "last_timestamp")
+
+    def __init__(self, tema_periods=TEMA_PERIODS, adx_period=ADX_PERIOD, cmo_period=CMO_PERIOD,
+                 ema_window=EMA_WINDOW, slope_period=SLOPE_PERIOD):
+        self.tema = [TemaState(p) for p in tema_periods]
+        self.adx = AdxState(adx_period)
+        self.cmo = CmoState(cmo_period)
+        self.ema_slope = EmaSlopeState(ema_window, slope_period)
+        self.count = 0
+        self.last_timestamp = None
+
+    def update(self, high, low, close, timestamp=None):
+        if timestamp is not None:
+            if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+                return False
+            self.last_timestamp = timestamp
+        high, low, close = float(high), float(low), float(close)
+        for t in self.tema:
+            t.update(close)
+        self.adx.update(high, low, close)
+        self.cmo.update(close)
+        self.ema_slope.update(close)
+        self.count += 1
+        return True
+
+    def update_candle(self, candle):
+        """candle: dict/Series с ключами 'high', 'low', 'close' и (необязательно) 'timestamp'."""
+        timestamp = candle.get("timestamp") if hasattr(candle, "get") else None
+        return self.update(candle["high"], candle["low"], candle["close"], timestamp)
+
+    def feed_frame(self, df):
+        """Прогрев состояния по истории (DataFrame с колонками high/low/close[/timestamp])."""
+        timestamps = df["timestamp"].tolist() if "timestamp" in df else [None] * len(df)
+        for h, l, c, ts in zip(df["high"].tolist(), df["low"].tolist(), df["close"].tolist(), timestamps):
+            self.update(h, l, c, ts)
+        return self
+
+    def preview(self, high, low, close):
+        """Значения индикаторов с учётом формирующейся свечи — состояние не меняется."""
+        state = copy.deepcopy(self)
+        state.update(high, low, close)
+        return state.values()
+
+    def values(self):
+        result = {f"tema_{i+1}": t.value for i, t in enumerate(self.tema)}
+        result["adx"] = self.adx.value
+        result["cmo"] = self.cmo.value
+        result["ema"] = self.ema_slope.ema.value
+        result["ema_slope"] = self.ema_slope.value
+        return result
@@ -1,5 +1,5 @@
 import pandas as pd
-from configs.config import TEMA_PERIODS
+from config import TEMA_PERIODS
 
 def ema(series: pd.Series, period: int) -> pd.Series:
     return series.ewm(span=period, adjust=False).mean()
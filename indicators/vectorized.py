@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from indicators.ema_slope import slope_weights
+from config import TEMA_PERIODS, ADX_PERIOD, CMO_PERIOD, EMA_WINDOW, SLOPE_PERIOD
+
+# Векторизованные версии индикаторов для всей вселенной сразу.
+# Вход — 2-D массивы (символы × свечи), расчёт идёт вдоль оси времени (axis=1).
+# Более короткие ряды выравниваются по правому краю и дополняются NaN слева —
+# результат по каждой строке совпадает с пакетными calculate_* для исходного ряда.
+
+
+def stack_universe(history_cache, length=None, min_length=1):
+    """
+    Собирает { symbol: DataFrame } в матрицы high/low/close (символы × свечи).
+    length — сколько последних свечей брать (по умолчанию — максимальная длина истории).
+    Символы с историей короче min_length пропускаются.
+    Возвращает (symbols, {"high": ..., "low": ..., "close": ...})
+    """
+    frames = {
+        s: df for s, df in history_cache.items()
+        if df is not None and len(df) >= max(min_length, 1)
+    }
+    symbols = list(frames)
+    if length is None:
+        length = max((len(df) for df in frames.values()), default=0)
+    arrays = {}
+    for col in ("high", "low", "close"):
+        m = np.full((len(symbols), length), np.nan, dtype=np.float64)
+        for i, s in enumerate(symbols):
+            values = frames[s][col].to_numpy(dtype=np.float64)[-length:]
+            if len(values):
+                m[i, length - len(values):] = values
+        arrays[col] = m
+    return symbols, arrays
+
+
+def _shift(x):
+    """Сдвиг на одну свечу вправо (аналог Series.shift()) по оси времени."""
+    out = np.empty_like(x)
+    out[:, 0] = np.nan
+    out[:, 1:] = x[:, :-1]
+    return out
+
+
+def _rolling_sum(x, period):
+    """Скользящая сумма с min_periods=period: NaN в окне -> NaN."""
+    out = np.full(x.shape, np.nan, dtype=np.float64)
+    n = x.shape[1]
+    if n >= period:
+        # period сложений сдвинутых срезов быстрее суммы по strided-окну
+        acc = x[:, :n - period + 1].copy()
+        for k in range(1, period):
+            acc += x[:, k:n - period + 1 + k]
+        out[:, period - 1:] = acc
+    return out
+
+
+def ema_matrix(x, period):
+    """
+    EMA (adjust=False) вдоль оси времени; ведущие NaN (выравнивание рядов) пропускаются, как в pandas.
+    Рекурсия считается в pandas ewm по столбцам (цикл на C), а не шагом по времени в Python.
+    """
+    frame = pd.DataFrame(np.ascontiguousarray(np.asarray(x, dtype=np.float64).T))
+    return np.ascontiguousarray(frame.ewm(span=period, adjust=False).mean().to_numpy().T)
+
+
+def tema_matrix(close, period):
+    e1 = ema_matrix(close, period)
+    e2 = ema_matrix(e1, period)
+    e3 = ema_matrix(e2, period)
+    return 3 * (e1 - e2) + e3
+
+
+def adx_matrix(high, low, close, period=ADX_PERIOD):
+    """Векторизованная indicators.adx.calculate_adx."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        up = high - _shift(high)
+        down = low - _shift(low)
+
+        plus_dm = np.where(up < np.abs(down), 0.0, up)
+        plus_dm = np.where(plus_dm < 0, 0.0, plus_dm)
+
+        minus_dm = np.where(down < plus_dm, 0.0, down)
+        minus_dm = np.where(minus_dm > 0, 0.0, minus_dm)
+        minus_dm = np.abs(minus_dm)
+
+        prev_close = _shift(close)
+        tr = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+
+        atr = _rolling_sum(tr, period) / period
+        plus_di = 100 * (_rolling_sum(plus_dm, period) / period / atr)
+        minus_di = 100 * (_rolling_sum(minus_dm, period) / period / atr)
+        dx = (np.abs(plus_di - minus_di) / (plus_di + minus_di)) * 100
+        return _rolling_sum(dx, period) / period
+
+
+def cmo_matrix(close, period=CMO_PERIOD):
+    """Векторизованная indicators.cmo.calculate_cmo."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        diff = close - _shift(close)
+        missing = np.isnan(close)
+        up = np.where(missing, np.nan, np.where(diff > 0, diff, 0.0))
+        down = np.where(missing, np.nan, np.where(diff < 0, -diff, 0.0))
+        sum_up = _rolling_sum(up, period)
+        sum_down = _rolling_sum(down, period)
+        return 100 * (sum_up - sum_down) / (sum_up + sum_down)
+
+
+def ema_slope_matrix(close, ema_window=EMA_WINDOW, slope_period=SLOPE_PERIOD):
+    """
+    Наклон EMA на каждой свече (МНК по последним slope_period значениям EMA).
+    Значение определено, когда накоплено не меньше ema_window + slope_period цен.
+    Возвращает (slope, ema)
+    """
+    ema = ema_matrix(close, ema_window)
+    slope = np.full(close.shape, np.nan, dtype=np.float64)
+    if close.shape[1] >= slope_period:
+        slope[:, slope_period - 1:] = sliding_window_view(ema, slope_period, axis=1) @ slope_weights(slope_period)
+    seen = np.cumsum(~np.isnan(close), axis=1)
+    slope[seen < ema_window + slope_period] = np.nan
+    return slope, ema
+
+
+def compute_universe_indicators(high, low, close):
+    """
+    Все индикаторы стратегии за один векторизованный проход.
+    Возвращает словарь матриц (символы × свечи):
+    tema_1..tema_3 (по TEMA_PERIODS), adx, cmo, ema, ema_slope
+    """
+    assert len(TEMA_PERIODS) == 3, "В config.py должен быть список из 3 периодов для TEMA_PERIODS"
+    result = {f"tema_{i+1}": tema_matrix(close, p) for i, p in enumerate(TEMA_PERIODS)}
+    result["adx"] = adx_matrix(high, low, close)
+    result["cmo"] = cmo_matrix(close)
+    result["ema_slope"], result["ema"] = ema_slope_matrix(close)
+    return result
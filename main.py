@@ -1,163 +1,277 @@
-import subprocess
 import time
-import asyncio
-from pybit.unified_trading import HTTP
+from core.startup import timer as startup  # первым: отсчёт разбивки времени старта
+import threading
 from config import (
     HISTORY_CANDLE_LIMIT, THREADPOOL_WORKERS, TIMEFRAME,
-    VOLUME24_FILTER_ENABLED, MIN_VOLUME24H
+    VOLUME24_FILTER_ENABLED, MIN_VOLUME24H, SHARED_CANDLES_CAPACITY,
+    CANDLE_CLOSE_POLL_INTERVAL, INTRABAR_CHECK_INTERVAL,
+    LATENCY_REPORT_INTERVAL, LATENCY_METRICS_PORT, RESAMPLE_TIMEFRAMES,
+    UNIVERSE_CHECK_INTERVAL, UNIVERSE_SNAPSHOT_INTERVAL, UNIVERSE_DROP_RATIO, UNIVERSE_SPARE_SLOTS
 )
 
-from core.ohlcv import load_initial_history_pybit
-from core.websocket_collector import start_websocket_collector_proc
-from core.websocket_private import start_websocket_private_proc
+# До первой подписки WS нужны только лёгкие модули; pandas, история, индикаторы и стратегия
+# импортируются в main() после запуска collector (подписка их не ждёт)
+from core.latency import recorder as latency
+from core.async_rest import get_shared_client
+from core.clock import clock
+from core.shared_candles import SharedCandles
+from core.ticker_state import TickerTable
+from core.candle_scheduler import CandleCloseScheduler
+from core.websocket_collector import start_websocket_collector_proc, send_universe_change
+from core.universe import UniverseManager
+from core.resampler import MultiTimeframeResampler
 
-# === Импорт индикаторов из папки indicators ===
-from indicators.adx import calculate_adx
-from indicators.cmo import calculate_cmo
-from indicators.ema_slope import calculate_ema_slope
-from indicators.tema import calculate_tema_lines
-
-import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
-import requests
-
-# Импорт стратегии
-from strategies.tema_adx_cmo import check_signal
 
-def fetch_bybit_symbols_pybit(session):
+def fetch_tickers_snapshot(client):
+    """Один снимок тикеров рынка linear: (список тикеров, время биржи в мс); при ошибке — ([], 0)."""
     try:
-        response = session.get_tickers(category="linear")
-        symbols_data = response["result"]["list"]
-        symbols = [s["symbol"] for s in symbols_data if "USDT" in s["symbol"]]
-        print(f"[Bybit] ✅ Загружено {len(symbols)} пар через pybit")
-        return symbols
+        response = client.get_tickers(category="linear")
+        tickers = response["result"]["list"]
+        print(f"[Bybit] ✅ Снимок тикеров: {len(tickers)} пар")
+        return tickers, int(response.get("time", 0))
     except Exception as e:
-        print(f"[Bybit] ⚠️ Ошибка загрузки пар: {e}")
-        return []
-
-def filter_symbols_by_volume24h(symbols, min_volume24h=1_000_000):
-    url = "https://api.bybit.com/v5/market/tickers?category=linear"
-    try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        data = r.json()
-        tickers = data.get("result", {}).get("list", [])
-        symbol_to_vol = {t["symbol"]: float(t.get("volume24h", 0)) for t in tickers}
-        filtered = [s for s in symbols if symbol_to_vol.get(s, 0) >= min_volume24h]
-        print(f"[FILTER] Пары после фильтра по объему 24ч >= {min_volume24h}: {filtered} (количество: {len(filtered)})")
-        return filtered
-    except Exception as e:
-        print(f"[FILTER] Ошибка фильтрации по объему 24ч: {e}")
-        return symbols  # если не получилось — возвращаем всё
-
-# --- Синхронизация времени при запуске ---
-try:
-    subprocess.run(["sudo", "ntpdate", "pool.ntp.org"])
-    subprocess.run(["sudo", "timedatectl", "set-ntp", "true"])
-    print("[TIME] Системное время синхронизировано через ntpdate и timedatectl.")
-except Exception as e:
-    print(f"[TIME] Ошибка синхронизации времени: {e}")
+        print(f"[Bybit] ⚠️ Ошибка загрузки тикеров: {e}")
+        return [], 0
 
 def log_indicator(symbol, indicator_name, series):
     """Универсальный логгер для индикаторов."""
     msk_time = (datetime.utcnow() + timedelta(hours=3)).strftime('%Y-%m-%d %H:%M:%S')
-    values = pd.Series(series).dropna()[-10:].tolist()
+    values = np.asarray(series, dtype=float)
+    values = values[~np.isnan(values)][-10:].tolist()
     # print(f"[{symbol}] [{msk_time}] {indicator_name}: {values}")  # <-- закомментирован лог индикаторов
 
 def main():
-    session = HTTP(api_key="", api_secret="", testnet=False, recv_window=15000)
+    startup.mark("импорт")
+    # Запросы идут через общий async-клиент: keep-alive пул + token bucket по лимитам Bybit вместо пауз
+    client = get_shared_client()
+    # Смещение часов относительно сервера Bybit — в фоне, вместо блокирующего sudo ntpdate
+    clock.start_check(client)
 
-    # Получение списка символов
-    symbols = fetch_bybit_symbols_pybit(session)
+    # Вселенная пар по одному снимку тикеров: фильтр по объёму 24ч (если включен в config)
+    # и стартовые цены в таблице тикеров; дальше состав поддерживается по потоку тикеров
+    snapshot, snapshot_ts = fetch_tickers_snapshot(client)
+    universe = UniverseManager(MIN_VOLUME24H if VOLUME24_FILTER_ENABLED else 0, drop_ratio=UNIVERSE_DROP_RATIO)
+    symbols, _ = universe.load_snapshot(snapshot)
     if not symbols:
         print("Не удалось получить рабочий список торговых пар. Завершение работы.")
         return
+    print(f"[FILTER] Пары после фильтра по объему 24ч >= {universe.min_volume24h}: {symbols} (количество: {len(symbols)})")
+    startup.mark("снимок тикеров")
+    # Слоты shared memory — под все пары рынка (пара может войти во вселенную позже) + запас под новые листинги
+    catalog = sorted(universe.catalog)
+
+    # Тикеры (last/mark/bid/ask, объёмы, funding) collector пишет в типизированную таблицу в shared memory
+    shared_tickers = TickerTable.create(catalog, spare=UNIVERSE_SPARE_SLOTS)
+    for ticker in snapshot:
+        shared_tickers.apply(ticker["symbol"], ticker, snapshot_ts)
 
-    # -- Фильтр по объему 24ч (если включен в config) --
-    if 'VOLUME24_FILTER_ENABLED' in globals() and VOLUME24_FILTER_ENABLED:
-        symbols = filter_symbols_by_volume24h(symbols, MIN_VOLUME24H)
+    # 1. Запуск отдельного процесса WebSocket collector (живые свечи приходят через shared memory)
+    # Collector стартует до загрузки истории: свечи, закрывшиеся за время прогрева, уже будут в shared memory,
+    # и update_from_shared догонит по ним состояние индикаторов
+    # С RESAMPLE_TIMEFRAMES collector подписан только на 1m, а TIMEFRAME и старшие таймфреймы
+    # собирает из минут — у каждого таймфрейма свой сегмент shared memory (timeframe_segments)
+    resample_tfs = [tf for tf in dict.fromkeys(list(RESAMPLE_TIMEFRAMES) + [TIMEFRAME]) if tf != "1m"]
+    resample = bool(RESAMPLE_TIMEFRAMES and resample_tfs)
 
-    # 1. Сбор исторических данных чанками (chunk_size и chunk_delay теперь доступны)
-    history_cache = load_initial_history_pybit(
-        session, symbols, TIMEFRAME, HISTORY_CANDLE_LIMIT, THREADPOOL_WORKERS, chunk_size=10, chunk_delay=1
+    def create_segment():
+        return SharedCandles.create(catalog, SHARED_CANDLES_CAPACITY, spare=UNIVERSE_SPARE_SLOTS)
+
+    def load_seed(seed_symbols):
+        """1m-история для прогрева ресемплера"""
+        from core.ohlcv import load_history_incremental
+        return load_history_incremental(
+            client, seed_symbols, "1m", MultiTimeframeResampler(resample_tfs).seed_minutes(),
+            THREADPOOL_WORKERS, chunk_size=len(seed_symbols), chunk_delay=0, save_csv=False
+        )
+
+    if resample:
+        timeframe_segments = {tf: create_segment() for tf in resample_tfs}
+        base_segment = create_segment() if TIMEFRAME == "1m" else None
+        shared_candles = base_segment or timeframe_segments[TIMEFRAME]
+        ws_procs, ws_stop, ws_controls = start_websocket_collector_proc(
+            symbols, "1m", base_segment.name if base_segment else None,
+            resample_shm={tf: seg.name for tf, seg in timeframe_segments.items()}, await_seed=True,
+            tickers_shm=shared_tickers.name
+        )
+    else:
+        shared_candles = create_segment()
+        timeframe_segments = {TIMEFRAME: shared_candles}
+        ws_procs, ws_stop, ws_controls = start_websocket_collector_proc(
+            symbols, TIMEFRAME, shared_candles.name, tickers_shm=shared_tickers.name
+        )
+    print(f"[MAIN] WebSocket collector запущен, процессов: {len(ws_procs)}.")
+    segments = {shared_candles, *timeframe_segments.values()}
+    # Точка отсчёта планировщика — до прогрева: свечи, закрывшиеся за время загрузки истории, не теряются
+    closed_baseline = shared_candles.closed_timestamps()
+    startup.mark("запуск collector")
+    if resample:
+        # 1m-история для ресемплера грузится, пока collector уже подписан; минуты за это время он копит
+        seed = load_seed(symbols)
+        send_universe_change(ws_controls, seed={s: seed.get(s) for s in symbols})
+        startup.mark("прогрев ресемплера")
+
+    from core.ohlcv import load_history_incremental, format_interval, INTERVAL_SECONDS
+    from core.indicator_cache import IndicatorCache
+    from indicators.vectorized import stack_universe, compute_universe_indicators
+    from strategies.tema_adx_cmo import check_signal_vectorized, SIGNAL_LONG, SIGNAL_SHORT
+    startup.mark("импорт стратегии")
+
+    # 2. Тёплый старт истории: локальное хранилище + догрузка только недостающих свечей
+    history_cache = load_history_incremental(
+        client, symbols, TIMEFRAME, HISTORY_CANDLE_LIMIT, THREADPOOL_WORKERS,
+        chunk_size=len(symbols), chunk_delay=0
     )
     print("[MAIN] Исторические данные по всем парам собраны.")
+    startup.mark("история")
 
-    # --- Логирование индикаторов по каждой паре ---
-    for symbol, df in history_cache.items():
-        if not isinstance(df, pd.DataFrame) or df.empty:
-            continue
+    # --- Индикаторы по всей вселенной одним векторизованным проходом (символы × свечи) ---
+    universe_symbols, matrices = stack_universe(history_cache)
+    universe_indicators = compute_universe_indicators(matrices["high"], matrices["low"], matrices["close"])
+    for i, symbol in enumerate(universe_symbols):
+        log_indicator(symbol, "ADX", universe_indicators["adx"][i])
+        log_indicator(symbol, "CMO", universe_indicators["cmo"][i])
+        log_indicator(symbol, "EMA", universe_indicators["ema"][i])
+        log_indicator(symbol, "EMA_SLOPE", universe_indicators["ema_slope"][i, -1:])
+        for name in ("tema_1", "tema_2", "tema_3"):
+            log_indicator(symbol, name, universe_indicators[name][i])
+    start_signals = check_signal_vectorized(universe_indicators)
+    print(f"[STRATEGY] Стартовый скан: LONG={int((start_signals == SIGNAL_LONG).sum())}, "
+          f"SHORT={int((start_signals == SIGNAL_SHORT).sum())} из {len(universe_symbols)} пар")
 
-        # ADX
-        try:
-            adx = calculate_adx(df)
-            log_indicator(symbol, "ADX", adx)
-        except Exception as e:
-            # print(f"[{symbol}] Ошибка расчета ADX: {e}")  # <-- закомментирован лог индикаторов
-            pass
+    # Потоковые индикаторы: прогрев один раз, дальше O(1) на свечу
+    indicator_cache = IndicatorCache(symbols, None, TIMEFRAME)
+    indicator_cache.initialize_from_history(history_cache)
+    universe.admit(symbols)
+    startup.mark("индикаторы")
 
-        # CMO
-        try:
-            cmo = calculate_cmo(df['close'])
-            log_indicator(symbol, "CMO", cmo)
-        except Exception as e:
-            # print(f"[{symbol}] Ошибка расчета CMO: {e}")  # <-- закомментирован лог индикаторов
-            pass
+    # history_cache / indicator_cache пополняет поток вселенной, а читает и обновляет evaluate в потоке
+    # планировщика — оба работают с ними только под этой блокировкой
+    state_lock = threading.Lock()
 
-        # EMA и EMA SLOPE
+    def apply_universe_change(added, removed):
+        """Отписка вышедших пар, прогрев истории и подписка только для новых."""
+        if removed:
+            send_universe_change(ws_controls, removed=removed)
+            print(f"[UNIVERSE] Вышли из вселенной: {removed}")
+        no_slot = [s for s in added if not (all(seg.register(s) for seg in segments) and shared_tickers.register(s))]
+        if no_slot:
+            universe.exclude(no_slot)
+            print(f"[UNIVERSE] ⚠️ Нет запасных слотов shared memory для {no_slot} — будут добавлены после перезапуска")
+        added = [s for s in added if s not in no_slot]
+        if not added:
+            return
         try:
-            slope, ema_series = calculate_ema_slope(df['close'])
-            log_indicator(symbol, "EMA", ema_series)
-            log_indicator(symbol, "EMA_SLOPE", [slope])
-        except Exception as e:
-            # print(f"[{symbol}] Ошибка расчета EMA/EMA SLOPE: {e}")  # <-- закомментирован лог индикаторов
-            pass
-
-        # TEMA
-        try:
-            tema_lines = calculate_tema_lines(df['close'])
-            for name, series in tema_lines.items():
-                log_indicator(symbol, name, series)
-        except Exception as e:
-            # print(f"[{symbol}] Ошибка расчета TEMA: {e}")  # <-- закомментирован лог индикаторов
-            pass
+            # Загрузка истории — без блокировки: evaluate тем временем продолжает работать по старым парам
+            history = load_history_incremental(
+                client, added, TIMEFRAME, HISTORY_CANDLE_LIMIT, THREADPOOL_WORKERS, chunk_size=len(added), chunk_delay=0
+            )
+        except Exception:
+            universe.reject(added)
+            raise
+        with state_lock:
+            history_cache.update(history)
+            indicator_cache.initialize_from_history(history)
+            universe.admit(added)
+        send_universe_change(ws_controls, added=added, seed=load_seed(added) if resample else None)
+        print(f"[UNIVERSE] Новые пары: {added} (история прогрета по {len(history)})")
+
+    def universe_loop():
+        next_snapshot = time.monotonic() + UNIVERSE_SNAPSHOT_INTERVAL
+        while not universe_stop.wait(UNIVERSE_CHECK_INTERVAL):
+            try:
+                universe.update_volumes(shared_tickers)
+                tickers = []
+                if time.monotonic() >= next_snapshot:
+                    next_snapshot = time.monotonic() + UNIVERSE_SNAPSHOT_INTERVAL
+                    tickers, _ = fetch_tickers_snapshot(client)
+                added, removed = universe.load_snapshot(tickers) if tickers else universe.rebalance()
+                if added or removed:
+                    apply_universe_change(added, removed)
+            except Exception as e:
+                print(f"[UNIVERSE] Ошибка обновления вселенной: {e}")
 
-    # 2. Запуск отдельного процесса WebSocket collector
-    ws_proc, ws_stop = start_websocket_collector_proc(symbols, TIMEFRAME)
-    print("[MAIN] WebSocket collector процесс запущен.")
+    # Состав вселенной живой: объёмы из потока тикеров, листинги/делистинги из редкого снимка REST
+    universe_stop = threading.Event()
+    if UNIVERSE_CHECK_INTERVAL:
+        threading.Thread(target=universe_loop, daemon=True).start()
 
-    # 3. Запуск приватного WebSocket процесса
-    ws_private_proc, ws_private_stop = start_websocket_private_proc()
-    print("[MAIN] Приватный WebSocket collector процесс запущен.")
+    # Приватный WebSocket открывает BybitTrader (один поток на аккаунт, события идут в PrivateStateStore)
 
     # === Запуск мониторинга рынка по стратегии ===
     print("[STRATEGY] Бот начал мониторинг рынка по стратегии TEMA/ADX/CMO...")
+    latency.name = "strategy"
+    latency.start_reporter(LATENCY_REPORT_INTERVAL, LATENCY_METRICS_PORT)
+    candle_seconds = INTERVAL_SECONDS[format_interval(TIMEFRAME)]
 
-    try:
-        while True:
-            # Имитация получения новых данных для каждой пары (в реале - из WebSocket либо обновлять history_cache)
-            for symbol, df in history_cache.items():
-                if not isinstance(df, pd.DataFrame) or df.empty or len(df) < 50:
+    def quote_text(symbol):
+        quote = shared_tickers.quote(symbol)
+        if quote is None:
+            return "тикер ещё не получен"
+        bid, ask, last, mark = quote
+        return f"last={last} bid={bid} ask={ask} mark={mark}"
+
+    def evaluate(symbols_to_check, intrabar=False):
+        """Проверка сигналов только по переданным символам (закрылась свеча / intrabar-проверка)."""
+        for symbol in symbols_to_check:
+            with state_lock:
+                if symbol not in universe:
+                    continue
+                df = history_cache.get(symbol)
+                if df is None or df.empty or len(df) < 50:
                     print(f"[STRATEGY] {symbol}: недостаточно данных для анализа.")
                     continue
-                print(f"[STRATEGY] Анализирую {symbol} по индикаторам...")
-                signal = check_signal(df)
-                if signal is None:
-                    print(f"[STRATEGY] {symbol}: сделка не открыта - нет сигнала по индикаторам.")
-                elif signal == "long":
-                    print(f"[STRATEGY] {symbol}: СИГНАЛ НА LONG! (сделка будет открыта/симулирована)")
-                elif signal == "short":
-                    print(f"[STRATEGY] {symbol}: СИГНАЛ НА SHORT! (сделка будет открыта/симулирована)")
+                if intrabar:
+                    signal = indicator_cache.get_intrabar_signal(symbol, shared_candles)
                 else:
-                    print(f"[STRATEGY] {symbol}: неизвестный сигнал: {signal}")
-            # Для примера - анализ раз в 30 секунд (в реальном времени - скорее по факту новой свечи)
-            time.sleep(30)
+                    # Свежие закрытые свечи из процесса collector (shared memory, без pickle/pipe)
+                    started = time.perf_counter()
+                    indicator_cache.update_from_shared(symbol, shared_candles)
+                    latency.record_since("indicator_update", started)
+                    print(f"[STRATEGY] Анализирую {symbol} по индикаторам...")
+                    started = time.perf_counter()
+                    signal = indicator_cache.get_signal(symbol)
+                    latency.record_since("check_signal", started)
+                    last_ts = indicator_cache.cache[symbol]["state"].last_timestamp if symbol in indicator_cache.cache else None
+                    if last_ts is not None:
+                        # От закрытия свечи на бирже (start + длительность) до готового сигнала
+                        latency.record("close_to_signal", time.time() - (last_ts + candle_seconds))
+            if signal is None:
+                if not intrabar:
+                    print(f"[STRATEGY] {symbol}: сделка не открыта - нет сигнала по индикаторам.")
+            elif signal == "long":
+                print(f"[STRATEGY] {symbol}: СИГНАЛ НА LONG! (сделка будет открыта/симулирована) {quote_text(symbol)}")
+            elif signal == "short":
+                print(f"[STRATEGY] {symbol}: СИГНАЛ НА SHORT! (сделка будет открыта/симулирована) {quote_text(symbol)}")
+            else:
+                print(f"[STRATEGY] {symbol}: неизвестный сигнал: {signal}")
+
+    # Анализ по факту закрытия свечи (флаг confirm), а не раз в 30 секунд по всей вселенной
+    scheduler = CandleCloseScheduler(
+        shared_candles,
+        on_close=evaluate,
+        on_intrabar=lambda syms: evaluate(syms, intrabar=True),
+        poll_interval=CANDLE_CLOSE_POLL_INTERVAL,
+        intrabar_interval=INTRABAR_CHECK_INTERVAL,
+        baseline=closed_baseline,
+    )
+
+    startup.mark("запуск стратегии")
+    print(startup.summary())
+
+    try:
+        scheduler.run()
     except KeyboardInterrupt:
         print("Остановка бота...")
+        universe_stop.set()
         ws_stop.set()
-        ws_proc.join()
-        ws_private_stop.set()
-        ws_private_proc.join()
+        for ws_proc in ws_procs:
+            ws_proc.join()
+        for segment in segments:
+            segment.close()
+        shared_tickers.close()
+        print(latency.summary())
         print("[MAIN] Все процессы остановлены.")
 
 if __name__ == "__main__":
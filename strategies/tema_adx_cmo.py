@@ -1,7 +1,8 @@
+import numpy as np
 from indicators.tema import calculate_tema_lines
 from indicators.adx import calculate_adx
 from indicators.cmo import calculate_cmo
-from configs.config import (
+from config import (
     TEMA_ADX_CMO_ENABLED,
     TEMA_ADX_THRESHOLD_LONG,
     TEMA_ADX_THRESHOLD_SHORT,
@@ -9,6 +10,12 @@ from configs.config import (
     TEMA_CMO_THRESHOLD_SHORT,
 )
 
+# Коды сигналов для векторизованной проверки
+SIGNAL_NONE = 0
+SIGNAL_LONG = 1
+SIGNAL_SHORT = -1
+SIGNAL_NAMES = {SIGNAL_NONE: None, SIGNAL_LONG: "long", SIGNAL_SHORT: "short"}
+
 def check_signal(df):
     """
     df: pandas.DataFrame с колонками ['close', 'high', 'low']
@@ -22,12 +29,32 @@ def check_signal(df):
     cmo = calculate_cmo(df['close'])
 
     # последние значения индикаторов
-    t1 = tema['tema_1'].iloc[-1]
-    t2 = tema['tema_2'].iloc[-1]
-    t3 = tema['tema_3'].iloc[-1]
-    adx_last = adx.iloc[-1]
-    cmo_last = cmo.iloc[-1]
+    return signal_from_values(
+        tema['tema_1'].iloc[-1],
+        tema['tema_2'].iloc[-1],
+        tema['tema_3'].iloc[-1],
+        adx.iloc[-1],
+        cmo.iloc[-1],
+    )
 
+def check_signal_state(state):
+    """
+    state: indicators.streaming.SymbolIndicators (потоковые индикаторы символа)
+    Возвращает 'long', 'short' или None без пересчёта истории
+    """
+    if not TEMA_ADX_CMO_ENABLED:
+        return None
+
+    values = state.values()
+    return signal_from_values(
+        values['tema_1'], values['tema_2'], values['tema_3'], values['adx'], values['cmo']
+    )
+
+def signal_from_values(t1, t2, t3, adx_last, cmo_last):
+    """
+    Правила стратегии по последним значениям индикаторов.
+    Возвращает 'long', 'short' или None
+    """
     # ЛОНГ: короткая > средняя > длинная, ADX >= порога, CMO > порога
     if (
         t1 > t2 and t2 > t3 and
@@ -45,3 +72,39 @@ def check_signal(df):
         return "short"
 
     return None
+
+def default_thresholds():
+    """Пороги ADX/CMO стратегии из config"""
+    return {
+        'adx_long': TEMA_ADX_THRESHOLD_LONG,
+        'adx_short': TEMA_ADX_THRESHOLD_SHORT,
+        'cmo_long': TEMA_CMO_THRESHOLD_LONG,
+        'cmo_short': TEMA_CMO_THRESHOLD_SHORT,
+    }
+
+def check_signal_vectorized(indicators, index=-1, thresholds=None):
+    """
+    indicators: словарь матриц (символы × свечи) из indicators.vectorized.compute_universe_indicators
+    index: свеча, по которой проверяется сигнал (по умолчанию последняя); None — по всем свечам
+    thresholds: пороги {adx_long, adx_short, cmo_long, cmo_short} вместо config (для оптимизатора)
+    Возвращает np.int8 массив SIGNAL_LONG / SIGNAL_SHORT / SIGNAL_NONE для каждого символа
+    """
+    th = default_thresholds()
+    th.update(thresholds or {})
+
+    def pick(name):
+        m = indicators[name]
+        return m if index is None else m[:, index]
+
+    t1, t2, t3 = pick('tema_1'), pick('tema_2'), pick('tema_3')
+    adx_last, cmo_last = pick('adx'), pick('cmo')
+    result = np.full(t1.shape, SIGNAL_NONE, dtype=np.int8)
+    if not TEMA_ADX_CMO_ENABLED:
+        return result
+
+    with np.errstate(invalid="ignore"):
+        long_mask = (t1 > t2) & (t2 > t3) & (adx_last >= th['adx_long']) & (cmo_last > th['cmo_long'])
+        short_mask = (t1 < t2) & (t2 < t3) & (adx_last <= th['adx_short']) & (cmo_last < th['cmo_short'])
+    result[short_mask] = SIGNAL_SHORT
+    result[long_mask] = SIGNAL_LONG
+    return result
@@ -0,0 +1,146 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+from core.async_rest import BybitAsyncClient, TokenBucket
+
+
+@pytest.fixture
+def server():
+    """
+    Локальный HTTP-сервер в loop клиента: path -> список статусов по очереди (последний повторяется);
+    headers: path -> функция без аргументов, возвращающая заголовки ответа.
+    """
+    client = BybitAsyncClient(base_url="http://127.0.0.1", max_retries=3)
+    client._backoff = lambda attempt, base=0.25, cap=10.0: 0.0
+    hits = {}
+    statuses = {}
+    headers = {}
+
+    async def handler(request):
+        hits[request.path] = hits.get(request.path, 0) + 1
+        queue = statuses[request.path]
+        status = queue.pop(0) if len(queue) > 1 else queue[0]
+        extra = headers[request.path]() if request.path in headers else {}
+        if status != 200:
+            return web.Response(status=status, headers=extra)
+        return web.json_response({"retCode": 0, "result": {"ok": True}}, headers=extra)
+
+    async def start():
+        app = web.Application()
+        app.router.add_get("/{tail:.*}", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        return runner
+
+    runner = client.run(start())
+    client.base_url = "http://127.0.0.1:%d" % runner.addresses[0][1]
+    yield client, statuses, hits, headers
+    client.run(runner.cleanup())
+    client.close()
+
+
+@pytest.mark.parametrize("status", [400, 401, 404])
+def test_client_errors_are_not_retried(server, status):
+    client, statuses, hits, _ = server
+    statuses["/v5/market/tickers"] = [status]
+    with pytest.raises(RuntimeError, match=f"HTTP {status}"):
+        client.get_tickers(category="linear")
+    assert hits["/v5/market/tickers"] == 1
+    assert client.stats["retries"] == 0
+
+
+def test_retryable_statuses_are_retried(server):
+    client, statuses, hits, _ = server
+    statuses["/v5/market/tickers"] = [503, 500, 200]
+    assert client.get_tickers(category="linear")["result"] == {"ok": True}
+    assert hits["/v5/market/tickers"] == 3
+    assert client.stats["retries"] == 2
+
+
+def test_bucket_spends_capacity_then_paces_at_rate():
+    bucket = TokenBucket(20, capacity=2)
+
+    async def take(n):
+        for _ in range(n):
+            await bucket.acquire()
+
+    started = time.monotonic()
+    asyncio.run(take(2))
+    assert time.monotonic() - started < 0.02  # запас capacity выдаётся сразу
+    started = time.monotonic()
+    asyncio.run(take(2))
+    assert time.monotonic() - started >= 2 / 20 * 0.9
+
+
+def test_bucket_refill_is_capped_by_capacity():
+    bucket = TokenBucket(10, capacity=5)
+    bucket.tokens = 0.0
+    bucket._refill(bucket.updated + 0.2)
+    assert bucket.tokens == pytest.approx(2.0)
+    bucket._refill(bucket.updated + 10)
+    assert bucket.tokens == 5.0
+
+
+def test_set_rate_shrinks_capacity_and_ignores_zero():
+    bucket = TokenBucket(50)
+    bucket.set_rate(0)
+    assert bucket.rate == 50
+    bucket.set_rate(10)
+    assert (bucket.rate, bucket.capacity) == (10, 10)
+    assert bucket.tokens <= 10
+
+
+def test_block_for_delays_acquire():
+    bucket = TokenBucket(100)
+    bucket.block_for(0.1)
+    bucket.block_for(0.01)  # более короткая блокировка не сокращает уже назначенную
+    started = time.monotonic()
+    asyncio.run(bucket.acquire())
+    assert time.monotonic() - started >= 0.09
+
+
+def test_limit_headers_adapt_only_their_endpoint(server):
+    client, statuses, hits, headers = server
+    statuses["/v5/market/tickers"] = [200]
+    statuses["/v5/market/kline"] = [200]
+    headers["/v5/market/tickers"] = lambda: {
+        "X-Bapi-Limit": "5",
+        "X-Bapi-Limit-Status": "0",
+        "X-Bapi-Limit-Reset-Timestamp": str(int((time.time() + 0.3) * 1000)),
+    }
+
+    client.get_tickers(category="linear")
+    tickers = client.endpoint_buckets["/v5/market/tickers"]
+    assert (tickers.rate, tickers.capacity) == (5, 5)
+    assert tickers.blocked_until > time.monotonic() + 0.1
+
+    # Исчерпанное окно tickers не тормозит другой эндпоинт
+    started = time.monotonic()
+    client.get_kline(category="linear", symbol="BTCUSDT", interval="1")
+    assert time.monotonic() - started < 0.1
+    assert client.endpoint_buckets["/v5/market/kline"].rate == client.ip_rate
+
+    # ...а следующий запрос к tickers ждёт сброса окна
+    headers.pop("/v5/market/tickers")
+    started = time.monotonic()
+    client.get_tickers(category="linear")
+    assert time.monotonic() - started >= 0.15
+    assert hits["/v5/market/tickers"] == 2
+
+
+def test_remaining_quota_does_not_block(server):
+    client, statuses, _, headers = server
+    statuses["/v5/market/tickers"] = [200]
+    headers["/v5/market/tickers"] = lambda: {
+        "X-Bapi-Limit": "10",
+        "X-Bapi-Limit-Status": "7",
+        "X-Bapi-Limit-Reset-Timestamp": str(int((time.time() + 5) * 1000)),
+    }
+    client.get_tickers(category="linear")
+    bucket = client.endpoint_buckets["/v5/market/tickers"]
+    assert bucket.rate == 10
+    assert bucket.blocked_until == 0.0
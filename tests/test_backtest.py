@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from core.columnar_store import ColumnarStore, KLINE_SCHEMA
+from core.backtest import exit_model, exit_outcomes, _simulate_position, EXIT_REASONS, run_backtest, summarize
+from core.optimizer import build_combinations, default_params, run_optimizer
+
+MODELS = [
+    exit_model([2.0, 2.5, 5.0], [60, 20, 20], 5.0, 2.0, 3.5),
+    exit_model([1.0], [100], 2.0, 0, 1.0),
+    exit_model([3.0, 6.0], [50, 50], 1.5, 1.0, 0.5, fee_percent=0),
+]
+
+
+def random_candles(n, seed):
+    """Случайное блуждание с трендовыми участками, чтобы стратегия давала сигналы в обе стороны."""
+    rng = np.random.default_rng(seed)
+    drift = np.repeat(rng.choice([-0.004, 0.0, 0.004], size=n // 50 + 1), 50)[:n]
+    close = 100 * np.exp(np.cumsum(drift + rng.normal(0, 0.01, n)))
+    wick = np.abs(rng.normal(0, 0.006, (2, n))) * close
+    return {
+        "timestamp": 1_600_000_000 + 3600 * np.arange(n, dtype=np.int64),
+        "open": np.concatenate(([close[0]], close[:-1])),
+        "high": close + wick[0],
+        "low": close - wick[1],
+        "close": close,
+        "volume": np.ones(n),
+        "turnover": close,
+    }
+
+
+@pytest.mark.parametrize("model", MODELS)
+@pytest.mark.parametrize("window", [4, 64])
+def test_exit_outcomes_match_bar_by_bar_simulation(model, window):
+    for seed in range(10):
+        c = random_candles(400, seed)
+        h, l, close = c["high"].tolist(), c["low"].tolist(), c["close"].tolist()
+        for d in (1, -1):
+            out = exit_outcomes(c["high"], c["low"], c["close"], model, d, window=window)
+            for i in range(len(close) - 1):
+                t = _simulate_position(i, d, h, l, close, model)
+                assert out["exit_bar"][i] == t["exit_bar"]
+                assert EXIT_REASONS[out["reason"][i]] == t["exit_reason"]
+                assert out["tp_hits"][i] == t["tp_hits"]
+                assert out["pnl_percent"][i] == pytest.approx(t["pnl_percent"], abs=1e-9)
+
+
+@pytest.fixture
+def store_root(tmp_path):
+    store = ColumnarStore(str(tmp_path))
+    for k, n in enumerate((1500, 1200, 900, 1500, 300)):
+        store.append("history_60", f"S{k}USDT", random_candles(n, 100 + k), schema=KLINE_SCHEMA)
+    return str(tmp_path)
+
+
+def test_optimizer_default_row_matches_backtest(store_root):
+    trades = run_backtest(root=store_root, interval="1h", processes=1, chunk_size=2)
+    expected = summarize(trades)
+    assert expected["trades"] > 20
+
+    combos = build_combinations({"sl_percent": [3.0, default_params()["sl_percent"]]})
+    rows = run_optimizer(combos, root=store_root, interval="1h", processes=1, chunk_size=2)
+    row = next(r for r in rows if r["sl_percent"] == default_params()["sl_percent"])
+    assert row["trades"] == expected["trades"]
+    assert row["total_pnl_usd"] == pytest.approx(expected["total_pnl_usd"], abs=1e-9)
+    assert row["win_rate"] == pytest.approx(expected["win_rate"])
+    assert row["profit_factor"] == pytest.approx(expected["profit_factor"])
+    assert row["avg_pnl_percent"] == pytest.approx(expected["avg_pnl_percent"])
+
+
+def test_build_combinations():
+    grid = {"adx_long": [20, 25, 30], "tema_periods": [[8, 14, 21], [5, 13, 34]]}
+    combos = build_combinations(grid)
+    assert len(combos) == 6
+    assert {c["tema_periods"] for c in combos} == {(8, 14, 21), (5, 13, 34)}
+    sampled = build_combinations(grid, samples=4, seed=1)
+    assert len({(c["adx_long"], c["tema_periods"]) for c in sampled}) == 4
+    with pytest.raises(ValueError):
+        build_combinations({"unknown": [1]})
@@ -0,0 +1,44 @@
+import pytest
+
+from core.shared_candles import SharedCandles
+from core.candle_scheduler import CandleCloseScheduler
+
+
+@pytest.fixture
+def segment():
+    shared = SharedCandles.create(["BTCUSDT", "ETHUSDT"], capacity=16)
+    writer = SharedCandles.attach(shared.name, writable=True)  # публикует, как collector
+    yield shared, writer
+    writer.close()
+    shared.close()
+
+
+def close_candle(writer, symbol, ts):
+    writer.publish(symbol, ts, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, closed=True)
+
+
+def test_fires_only_for_symbols_whose_candle_closed(segment):
+    shared, writer = segment
+    seen = []
+    scheduler = CandleCloseScheduler(shared, on_close=seen.append)
+    assert scheduler.poll_once() == []
+    close_candle(writer, "ETHUSDT", 3600)
+    assert scheduler.poll_once() == ["ETHUSDT"]
+    assert scheduler.poll_once() == []
+    assert seen == [["ETHUSDT"]]
+
+
+def test_closes_during_warmup_fire_with_baseline(segment):
+    shared, writer = segment
+    baseline = shared.closed_timestamps()
+    # Прогрев истории и индикаторов: тем временем collector закрывает свечу BTCUSDT
+    close_candle(writer, "BTCUSDT", 3600)
+
+    seen = []
+    scheduler = CandleCloseScheduler(shared, on_close=seen.append, baseline=baseline)
+    assert scheduler.poll_once() == ["BTCUSDT"]
+    assert scheduler.poll_once() == []
+
+    late = []
+    CandleCloseScheduler(shared, on_close=late.append).poll_once()
+    assert late == []  # без baseline закрытие за время прогрева теряется
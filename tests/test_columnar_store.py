@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from core.columnar_store import ColumnarStore, convert_csv_file
+
+
+def write_trades(path, rows):
+    pd.DataFrame(rows, columns=["timestamp", "symbol", "price", "size", "side", "trade_id"]).to_csv(path, index=False)
+
+
+def test_rerun_keeps_trades_from_the_same_second(tmp_path):
+    store = ColumnarStore(str(tmp_path / "store"))
+    path = tmp_path / "BTCUSDT_trades.csv"
+    first = [
+        [100, "BTCUSDT", 1.0, 1, "Buy", None],
+        [101, "BTCUSDT", 2.0, 1, "Sell", None],
+        [101, "BTCUSDT", 3.0, 1, "Buy", None],
+    ]
+    write_trades(path, first)
+    assert convert_csv_file(str(path), store) == 3
+    assert convert_csv_file(str(path), store) == 0
+
+    # Collector дописал ещё сделки в ту же секунду и в следующую
+    write_trades(path, first + [[101, "BTCUSDT", 4.0, 1, "Sell", None], [102, "BTCUSDT", 5.0, 1, "Buy", None]])
+    assert convert_csv_file(str(path), store) == 2
+    data = store.read("trades", "BTCUSDT")
+    np.testing.assert_array_equal(data["timestamp"], [100, 101, 101, 101, 102])
+    np.testing.assert_array_equal(data["price"], [1.0, 2.0, 3.0, 4.0, 5.0])
+    np.testing.assert_array_equal(data["side"], [1, -1, 1, -1, 1])
+
+
+def test_empty_column_keeps_the_schema_across_files(tmp_path):
+    store = ColumnarStore(str(tmp_path / "store"))
+    first, second = tmp_path / "a" / "ETHUSDT_trades.csv", tmp_path / "b" / "ETHUSDT_trades.csv"
+    first.parent.mkdir()
+    second.parent.mkdir()
+    write_trades(first, [[100, "ETHUSDT", 1.0, 1, "Buy", None]])
+    write_trades(second, [[101, "ETHUSDT", 2.0, 1, "Sell", 7]])
+
+    assert convert_csv_file(str(first), store) == 1
+    schema = store.schema("trades", "ETHUSDT")
+    assert "trade_id" in schema and "symbol" not in schema
+    assert convert_csv_file(str(second), store) == 1
+    assert store.schema("trades", "ETHUSDT") == schema
+    np.testing.assert_array_equal(store.read("trades", "ETHUSDT")["trade_id"], [np.nan, 7.0])
+
+
+def test_missing_column_is_filled_with_nan(tmp_path):
+    store = ColumnarStore(str(tmp_path / "store"))
+    path = tmp_path / "SOLUSDT_ticker.csv"
+    pd.DataFrame({"timestamp": [100], "last": [1.0], "funding": [0.1]}).to_csv(path, index=False)
+    assert convert_csv_file(str(path), store) == 1
+    pd.DataFrame({"timestamp": [101], "last": [2.0]}).to_csv(path, index=False)
+    assert convert_csv_file(str(path), store) == 1
+    data = store.read("tickers", "SOLUSDT")
+    np.testing.assert_array_equal(data["funding"], [0.1, np.nan])
+
+
+def test_history_duplicates_collapse_to_last_row(tmp_path):
+    store = ColumnarStore(str(tmp_path / "store"))
+    path = tmp_path / "BTCUSDT_60_history.csv"
+    pd.DataFrame({"timestamp": [100, 200, 200], "close": [1.0, 2.0, 3.0]}).to_csv(path, index=False)
+    assert convert_csv_file(str(path), store) == 2
+    assert convert_csv_file(str(path), store) == 0
+    np.testing.assert_array_equal(store.read("history_60", "BTCUSDT")["close"], [1.0, 3.0])
@@ -0,0 +1,189 @@
+import pytest
+
+pytest.importorskip("pybit")
+
+import config
+from core.bybit_trader import BybitTrader
+from core.instruments import InstrumentRegistry
+from core.private_state import PrivateStateStore
+
+
+class FakeTradeSession:
+    """REST Bybit для быстрого входа: ордер подтверждается, события приватного WS — через on_order."""
+
+    def __init__(self, positions=(), on_order=None, history=(), executions=()):
+        self.positions = list(positions)
+        self.history = list(history)
+        self.executions = list(executions)
+        self.on_order = on_order
+        self.calls = []
+
+    def get_instruments_info(self, **kwargs):
+        return {"result": {"list": [{
+            "symbol": "BTCUSDT",
+            "priceFilter": {"tickSize": "0.1"},
+            "lotSizeFilter": {"qtyStep": "0.001", "minOrderQty": "0.001"},
+            "leverageFilter": {"minLeverage": "1", "maxLeverage": "10", "leverageStep": "0.01"},
+        }]}}
+
+    def place_order(self, **kwargs):
+        self.calls.append(("place_order", kwargs))
+        if self.on_order is not None:
+            self.on_order(kwargs)
+        return {"retCode": 0, "result": {"orderId": "1"}}
+
+    def get_positions(self, **kwargs):
+        self.calls.append(("get_positions", kwargs))
+        return {"result": {"list": self.positions}}
+
+    def get_order_history(self, **kwargs):
+        self.calls.append(("get_order_history", kwargs))
+        return {"result": {"list": [o for o in self.history if o["orderLinkId"] == kwargs["orderLinkId"]]}}
+
+    def get_executions(self, **kwargs):
+        self.calls.append(("get_executions", kwargs))
+        return {"result": {"list": [e for e in self.executions if e["orderLinkId"] == kwargs["orderLinkId"]]}}
+
+    def place_batch_order(self, **kwargs):
+        self.calls.append(("place_batch_order", kwargs))
+        return {"retCode": 0}
+
+    def set_trading_stop(self, **kwargs):
+        self.calls.append(("set_trading_stop", kwargs))
+        return {"retCode": 0}
+
+    def called(self, name):
+        return [kwargs for call, kwargs in self.calls if call == name]
+
+
+def make_trader(session):
+    trader = BybitTrader.__new__(BybitTrader)
+    trader.session = session
+    trader.category = "linear"
+    trader.instruments = InstrumentRegistry(session)
+    trader.instruments.load()
+    trader.private_state = PrivateStateStore()
+    trader._leverage = {"BTCUSDT": 1.0}
+    trader.open_trades = []
+    trader._trade_history = []
+    return trader
+
+
+def open_trade(trader):
+    return trader.open_trade_fast("BTCUSDT", "Buy", 100.0, 10.0, 1, [2.0], [100], 5.0)
+
+
+@pytest.fixture(autouse=True)
+def short_fill_timeout(monkeypatch):
+    monkeypatch.setattr(config, "FILL_WAIT_TIMEOUT", 0.05)
+
+
+def assert_nothing_placed(trader, session):
+    assert not session.called("place_batch_order")
+    assert not session.called("set_trading_stop")
+    assert trader.open_trades == []
+
+
+def test_fill_from_execution_stream():
+    trader = None
+
+    def on_order(kwargs):
+        trader.private_state.on_message({"topic": "execution", "data": [{
+            "orderLinkId": kwargs["orderLinkId"], "execType": "Trade", "execQty": str(kwargs["qty"]), "execPrice": "100.5",
+        }]})
+
+    session = FakeTradeSession(on_order=on_order)
+    trader = make_trader(session)
+    trade = open_trade(trader)
+    assert trade["entry_price"] == 100.5
+    assert trade["qty"] == 0.1
+    assert not session.called("get_positions")
+    assert len(session.called("place_batch_order")) == 1
+    assert len(session.called("set_trading_stop")) == 1
+
+
+def test_terminal_zero_fill_aborts_without_rest():
+    trader = None
+
+    def on_order(kwargs):
+        trader.private_state.on_message({"topic": "order", "data": [{
+            "orderId": "1", "orderLinkId": kwargs["orderLinkId"], "orderStatus": "Cancelled", "cumExecQty": "0", "avgPrice": "",
+        }]})
+
+    session = FakeTradeSession(on_order=on_order)
+    trader = make_trader(session)
+    assert open_trade(trader) is None
+    assert not session.called("get_positions")
+    assert_nothing_placed(trader, session)
+
+
+def link_id(session):
+    return session.called("place_order")[0]["orderLinkId"]
+
+
+class LateSession(FakeTradeSession):
+    """Ордер исполнен, но в приватный WS событие не пришло: REST знает о нём по orderLinkId."""
+
+    def __init__(self, make_history=None, make_executions=None, **kwargs):
+        super().__init__(**kwargs)
+        self.make_history = make_history
+        self.make_executions = make_executions
+
+    def place_order(self, **kwargs):
+        response = super().place_order(**kwargs)
+        link = kwargs["orderLinkId"]
+        if self.make_history:
+            self.history.extend(self.make_history(link))
+        if self.make_executions:
+            self.executions.extend(self.make_executions(link))
+        return response
+
+
+def test_timeout_without_rest_fill_aborts():
+    session = FakeTradeSession()
+    trader = make_trader(session)
+    assert open_trade(trader) is None
+    assert session.called("get_order_history")[0]["orderLinkId"] == link_id(session)
+    assert len(session.called("get_executions")) == 1
+    assert_nothing_placed(trader, session)
+
+
+def test_timeout_falls_back_to_order_history():
+    session = LateSession(make_history=lambda link: [
+        {"orderLinkId": link, "orderStatus": "Filled", "cumExecQty": "0.1", "avgPrice": "101"},
+    ])
+    trader = make_trader(session)
+    trade = open_trade(trader)
+    assert trade["entry_price"] == 101.0
+    assert trade["qty"] == 0.1
+    assert not session.called("get_positions")
+    assert not session.called("get_executions")
+    assert len(session.called("place_batch_order")) == 1
+
+
+def test_existing_position_is_not_taken_as_this_orders_fill():
+    # На символе уже есть позиция 5.0, а новый ордер отменён без исполнения
+    session = LateSession(
+        positions=[{"symbol": "BTCUSDT", "size": "5", "avgPrice": "90"}],
+        make_history=lambda link: [{"orderLinkId": link, "orderStatus": "Cancelled", "cumExecQty": "0", "avgPrice": ""}],
+    )
+    trader = make_trader(session)
+    assert open_trade(trader) is None
+    assert not session.called("get_executions")
+    assert_nothing_placed(trader, session)
+
+
+def test_executions_when_order_history_lags():
+    session = LateSession(
+        positions=[{"symbol": "BTCUSDT", "size": "5", "avgPrice": "90"}],
+        make_executions=lambda link: [
+            {"orderLinkId": link, "execQty": "0.06", "execPrice": "100"},
+            {"orderLinkId": link, "execQty": "0.04", "execPrice": "105"},
+            {"orderLinkId": "other", "execQty": "1", "execPrice": "1"},
+        ],
+    )
+    trader = make_trader(session)
+    trade = open_trade(trader)
+    assert trade["qty"] == pytest.approx(0.1)
+    assert trade["entry_price"] == pytest.approx(102.0)
+    assert len(session.called("place_batch_order")) == 1
@@ -0,0 +1,112 @@
+import time
+import numpy as np
+import pandas as pd
+
+from core.columnar_store import ColumnarStore, KLINE_SCHEMA
+from core.ohlcv import (
+    closed_candles, find_history_gaps, fetch_ohlcv_paged_pybit, load_history_incremental,
+)
+
+HOUR = 3600
+
+
+class FakeKlineSession:
+    """get_kline с семантикой Bybit: от новых к старым, start/end в мс, последняя свеча — формирующаяся."""
+
+    def __init__(self, now=None):
+        now = time.time() if now is None else now
+        self.forming = int(now) // HOUR * HOUR
+        self.calls = []
+
+    def get_kline(self, category, symbol, interval, limit, start=None, end=None):
+        self.calls.append(dict(symbol=symbol, limit=limit, start=start, end=end))
+        newest = self.forming if end is None else min(self.forming, end // 1000 // HOUR * HOUR)
+        oldest = 0 if start is None else -(-start // 1000 // HOUR) * HOUR
+        rows = []
+        ts = newest
+        while ts >= oldest and len(rows) < limit:
+            price = 100 + (ts // HOUR) % 17
+            rows.append([str(ts * 1000), str(price), str(price + 1), str(price - 1), str(price), "1", str(price)])
+            ts -= HOUR
+        return {"retCode": 0, "result": {"list": rows}}
+
+
+def load(session, store, limit=2500):
+    return load_history_incremental(session, ["BTCUSDT"], "1h", limit, 1, chunk_delay=0, store=store,
+                                    save_csv=False)["BTCUSDT"]
+
+
+def test_closed_candles_drops_forming_candle():
+    now = 10 * HOUR + 5
+    df = pd.DataFrame({"timestamp": [8 * HOUR, 9 * HOUR, 10 * HOUR]})
+    assert closed_candles(df, "1h", now)["timestamp"].tolist() == [8 * HOUR, 9 * HOUR]
+    assert closed_candles(df, "1h", 11 * HOUR)["timestamp"].tolist() == [8 * HOUR, 9 * HOUR, 10 * HOUR]
+
+
+def test_find_history_gaps():
+    ts = [0, HOUR, 2 * HOUR, 5 * HOUR, 6 * HOUR, 8 * HOUR]
+    assert find_history_gaps(ts, HOUR) == [(2 * HOUR, 5 * HOUR), (6 * HOUR, 8 * HOUR)]
+    assert find_history_gaps([0, HOUR, 2 * HOUR], HOUR) == []
+    assert find_history_gaps([HOUR], HOUR) == []
+
+
+def test_paged_fetch_crosses_page_limit():
+    session = FakeKlineSession()
+    df, requests_made = fetch_ohlcv_paged_pybit(session, "BTCUSDT", "1h", 2500)
+    assert requests_made == 3
+    assert len(df) == 2500
+    assert df["timestamp"].is_monotonic_increasing
+    assert find_history_gaps(df["timestamp"], HOUR) == []
+
+
+def test_cold_start_then_restart_fetches_only_the_gap(tmp_path, monkeypatch):
+    store = ColumnarStore(str(tmp_path))
+    session = FakeKlineSession()
+    df = load(session, store)
+    assert len(session.calls) == 3
+    assert len(df) == 2500
+    assert int(df["timestamp"].iloc[-1]) == session.forming - HOUR  # формирующаяся свеча не сохраняется
+
+    # Сразу после остановки: один запрос, новых закрытых свечей нет
+    session.calls.clear()
+    df = load(session, store)
+    assert len(session.calls) == 1
+    assert session.calls[0]["start"] == session.forming * 1000
+    assert len(df) == 2500
+
+    # Простой на 5 свечей: догружаются только они
+    now = session.forming + 5 * HOUR + 10
+    monkeypatch.setattr("core.ohlcv.time.time", lambda: now)
+    later = FakeKlineSession(now)
+    df = load(later, store)
+    assert len(later.calls) == 1
+    assert len(df) == 2500
+    assert int(df["timestamp"].iloc[-1]) == later.forming - HOUR
+    assert find_history_gaps(df["timestamp"], HOUR) == []
+    assert store.rows("history_60", "BTCUSDT") == 2505
+
+
+def test_gap_in_store_triggers_full_reload(tmp_path):
+    store = ColumnarStore(str(tmp_path))
+    session = FakeKlineSession()
+    full, _ = fetch_ohlcv_paged_pybit(session, "BTCUSDT", "1h", 300)
+    full = closed_candles(full, "1h")
+    holed = full.drop(index=[100, 101]).reset_index(drop=True)
+    store.append("history_60", "BTCUSDT", holed, schema=KLINE_SCHEMA)
+
+    session.calls.clear()
+    df = load(session, store, limit=200)
+    assert len(df) == 200
+    assert find_history_gaps(df["timestamp"], HOUR) == []
+    assert store.rows("history_60", "BTCUSDT") == 200
+    np.testing.assert_array_equal(store.read("history_60", "BTCUSDT")["timestamp"], df["timestamp"].to_numpy())
+
+
+def test_history_window_is_also_written_to_csv(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = ColumnarStore(str(tmp_path / "store"))
+    session = FakeKlineSession()
+    df = load_history_incremental(session, ["BTCUSDT"], "1h", 50, 1, chunk_delay=0, store=store)["BTCUSDT"]
+    saved = pd.read_csv(tmp_path / "history_data" / "BTCUSDT_60_history.csv")
+    assert len(saved) == 50
+    np.testing.assert_array_equal(saved["timestamp"].to_numpy(), df["timestamp"].to_numpy())
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators.tema import calculate_tema_lines
+from indicators.adx import calculate_adx
+from indicators.cmo import calculate_cmo
+from indicators.ema_slope import calculate_ema_slope, calculate_rolling_ema_slope
+from indicators.streaming import SymbolIndicators
+from indicators.vectorized import stack_universe, compute_universe_indicators
+from core.indicator_cache import IndicatorCache
+
+# Потоковые и векторизованные индикаторы сверяются с пакетными calculate_* (эталон):
+# совпадает маска NaN, значения — в пределах допуска float
+RTOL = 1e-7
+ATOL = 1e-7
+INDICATORS = ("tema_1", "tema_2", "tema_3", "adx", "cmo", "ema", "ema_slope")
+
+
+def make_candles(n, seed=0, start_ts=1_700_000_000):
+    """Случайное блуждание с плоскими участками (нулевые приращения, 0/0 в ADX и CMO)."""
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 1, n)
+    steps[n // 3:n // 3 + 20] = 0.0
+    close = 100 + np.cumsum(steps)
+    spread = np.abs(rng.normal(0, 0.5, n))
+    spread[n // 3:n // 3 + 20] = 0.0
+    return pd.DataFrame({
+        "timestamp": start_ts + 3600 * np.arange(n),
+        "high": close + spread,
+        "low": close - spread,
+        "close": close,
+    })
+
+
+def reference(df):
+    """Эталон: пакетные индикаторы на каждой свече."""
+    result = {k: v.to_numpy() for k, v in calculate_tema_lines(df["close"]).items()}
+    result["adx"] = calculate_adx(df).to_numpy()
+    result["cmo"] = calculate_cmo(df["close"]).to_numpy()
+    slope, ema = calculate_rolling_ema_slope(df["close"])
+    result["ema_slope"] = slope.to_numpy()
+    result["ema"] = ema.to_numpy()
+    return result
+
+
+def assert_matches(actual, expected, name):
+    actual = np.asarray(actual, dtype=np.float64)
+    expected = np.asarray(expected, dtype=np.float64)
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected), err_msg=f"{name}: маска NaN")
+    np.testing.assert_allclose(actual, expected, rtol=RTOL, atol=ATOL, equal_nan=True, err_msg=name)
+
+
+def streamed(df):
+    """Значения SymbolIndicators после каждой свечи."""
+    state = SymbolIndicators()
+    out = {name: [] for name in INDICATORS}
+    for row in df.itertuples(index=False):
+        assert state.update(row.high, row.low, row.close, row.timestamp)
+        for name, value in state.values().items():
+            out[name].append(np.nan if value is None else value)
+    return out
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_streaming_matches_batch(seed):
+    df = make_candles(600, seed)
+    expected = reference(df)
+    actual = streamed(df)
+    for name in INDICATORS:
+        assert_matches(actual[name], expected[name], name)
+
+
+def test_streaming_ignores_stale_candles():
+    df = make_candles(200)
+    state = SymbolIndicators().feed_frame(df)
+    before = state.values()
+    assert not state.update(1.0, 1.0, 1.0, int(df["timestamp"].iloc[-1]))
+    assert not state.update(1.0, 1.0, 1.0, int(df["timestamp"].iloc[0]))
+    assert state.values() == before
+    assert state.count == len(df)
+
+
+def test_preview_does_not_change_state():
+    df = make_candles(300)
+    state = SymbolIndicators().feed_frame(df.iloc[:-1])
+    last = df.iloc[-1]
+    preview = state.preview(last["high"], last["low"], last["close"])
+    assert state.count == len(df) - 1
+    expected = reference(df)
+    for name in INDICATORS:
+        assert_matches([preview[name]], [expected[name][-1]], name)
+
+
+def test_vectorized_matches_batch_per_row():
+    # Ряды разной длины: короткие выравниваются по правому краю и дополняются NaN слева
+    frames = {f"S{i}": make_candles(n, seed=i) for i, n in enumerate((600, 450, 131, 20))}
+    symbols, matrices = stack_universe(frames)
+    result = compute_universe_indicators(matrices["high"], matrices["low"], matrices["close"])
+    length = matrices["close"].shape[1]
+    for i, symbol in enumerate(symbols):
+        df = frames[symbol]
+        expected = reference(df)
+        for name in INDICATORS:
+            row = result[name][i]
+            assert np.isnan(row[:length - len(df)]).all(), f"{symbol} {name}: выравнивание"
+            assert_matches(row[length - len(df):], expected[name], f"{symbol} {name}")
+
+
+def test_indicator_cache_matches_batch_after_updates():
+    df = make_candles(400)
+    cache = IndicatorCache(["BTCUSDT"], None, "1h")
+    cache.initialize_from_history({"BTCUSDT": df.iloc[:300]})
+    for _, candle in df.iloc[300:].iterrows():
+        cache.update("BTCUSDT", candle)
+    entry = cache.cache["BTCUSDT"]
+    expected = reference(df)
+    for name in ("tema_1", "tema_2", "tema_3"):
+        assert_matches([entry["tema"][name]], [expected[name][-1]], name)
+    for name in ("adx", "cmo", "ema", "ema_slope"):
+        assert_matches([entry[name]], [expected[name][-1]], name)
+
+
+@pytest.mark.parametrize("slope_period", [2, 5, 30])
+def test_ema_slope_closed_form_matches_least_squares(slope_period):
+    # Замена регрессии sklearn: наклон по весам slope_weights равен МНК-наклону np.polyfit
+    close = make_candles(300, seed=slope_period)["close"]
+    slope, ema = calculate_ema_slope(close, ema_window=50, slope_period=slope_period)
+    tail = ema.to_numpy()[-slope_period:]
+    expected = np.polyfit(np.arange(slope_period), tail, 1)[0]
+    assert slope == pytest.approx(expected, rel=1e-9, abs=1e-12)
+
+
+def test_ema_slope_requires_enough_prices():
+    close = make_candles(40)["close"]
+    with pytest.raises(ValueError):
+        calculate_ema_slope(close, ema_window=20, slope_period=30)
@@ -0,0 +1,111 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from core.instruments import InstrumentInfo, InstrumentRegistry, quantize_to_step
+
+
+def instrument(symbol, tick="0.01", step="0.001", max_qty="100", min_lev="1", max_lev="50", lev_step="0.01"):
+    return {
+        "symbol": symbol,
+        "priceFilter": {"tickSize": tick},
+        "lotSizeFilter": {"qtyStep": step, "minOrderQty": step, "maxOrderQty": max_qty},
+        "leverageFilter": {"minLeverage": min_lev, "maxLeverage": max_lev, "leverageStep": lev_step},
+    }
+
+
+class FakeSession:
+    """get_instruments_info: pages — страницы bulk-запроса по cursor, single — ответы на запрос по symbol."""
+
+    def __init__(self, pages, single=None):
+        self.pages = pages
+        self.single = single or {}
+        self.calls = []
+
+    def get_instruments_info(self, **kwargs):
+        self.calls.append(kwargs)
+        if "symbol" in kwargs:
+            item = self.single.get(kwargs["symbol"])
+            return {"result": {"list": [item] if item else []}}
+        page = int(kwargs.get("cursor", 0))
+        cursor = str(page + 1) if page + 1 < len(self.pages) else ""
+        return {"result": {"list": self.pages[page], "nextPageCursor": cursor}}
+
+
+def registry(*items, single=None):
+    reg = InstrumentRegistry(FakeSession([list(items)], single))
+    reg.load()
+    return reg
+
+
+def test_quantize_has_no_float_artefacts():
+    assert quantize_to_step(0.1 + 0.2, Decimal("0.1")) == Decimal("0.3")
+    assert quantize_to_step(0.7 * 3, Decimal("0.01")) == Decimal("2.10")
+    assert quantize_to_step(1.23456, Decimal("0.001")) == Decimal("1.234")
+
+
+def test_floor_vs_half_up():
+    assert quantize_to_step(1.2349, Decimal("0.01")) == Decimal("1.23")
+    assert quantize_to_step(1.235, Decimal("0.01"), ROUND_HALF_UP) == Decimal("1.24")
+    assert quantize_to_step(1.2349, Decimal("0.01"), ROUND_HALF_UP) == Decimal("1.23")
+    assert quantize_to_step(107, Decimal("5")) == Decimal("105")
+
+
+def test_round_qty_and_price_strings():
+    reg = registry(instrument("BTCUSDT", tick="0.10", step="0.001"), instrument("PEPEUSDT", tick="0.0000001", step="100"))
+    assert reg.round_qty("BTCUSDT", 0.1 + 0.2) == "0.300"
+    assert reg.round_qty("BTCUSDT", 0.0019999) == "0.001"
+    assert reg.round_qty("PEPEUSDT", 12345.9) == "12300"
+    assert reg.round_price("BTCUSDT", 65000.19) == "65000.10"
+    assert reg.nearest_price("BTCUSDT", 65000.15) == "65000.20"
+    assert reg.nearest_price("BTCUSDT", 65000.14) == "65000.10"
+    assert reg.round_price("PEPEUSDT", 0.00001234567) == "0.0000123"
+
+
+def test_missing_max_order_qty_is_none():
+    item = instrument("XUSDT")
+    del item["lotSizeFilter"]["maxOrderQty"]
+    assert InstrumentInfo.from_api(item).max_order_qty is None
+    assert InstrumentInfo.from_api(instrument("YUSDT", max_qty="0")).max_order_qty is None
+    reg = registry(item)
+    assert reg.round_qty("XUSDT", 123456.7891) == "123456.789"
+
+
+def test_clamp_leverage():
+    reg = registry(instrument("BTCUSDT", min_lev="1", max_lev="25", lev_step="0.5"))
+    assert reg.clamp_leverage("BTCUSDT", 100) == 25.0
+    assert reg.clamp_leverage("BTCUSDT", 0.2) == 1.0
+    assert reg.clamp_leverage("BTCUSDT", 7.8) == 7.5
+    assert reg.clamp_leverage("UNKNOWN", 7.8) == 7.8  # нет данных — плечо как есть
+
+
+def test_load_follows_cursor_pages():
+    pages = [[instrument("AUSDT"), instrument("BUSDT")], [instrument("CUSDT")], [instrument("DUSDT")]]
+    session = FakeSession(pages)
+    reg = InstrumentRegistry(session)
+    assert reg.load() == 4
+    assert [call.get("cursor") for call in session.calls] == [None, "1", "2"]
+    assert all(call["limit"] == 1000 for call in session.calls)
+    assert "DUSDT" in reg and len(reg) == 4
+
+
+def test_failed_reload_keeps_cache():
+    reg = registry(instrument("AUSDT"))
+
+    def broken(**kwargs):
+        raise ConnectionError("boom")
+
+    reg.session.get_instruments_info = broken
+    assert reg.load() == 0
+    assert "AUSDT" in reg
+
+
+def test_unknown_symbol_falls_back_to_single_request():
+    session = FakeSession([[instrument("AUSDT")]], single={"NEWUSDT": instrument("NEWUSDT", tick="0.5", step="1")})
+    reg = InstrumentRegistry(session)
+    reg.load()
+    assert reg.round_price("NEWUSDT", 10.74) == "10.5"
+    assert "NEWUSDT" in reg
+    calls = len(session.calls)
+    reg.round_qty("NEWUSDT", 3.9)
+    assert len(session.calls) == calls  # ответ закэширован
+    assert reg.get("GHOSTUSDT") is None
+    assert reg.round_qty("GHOSTUSDT", 1.23456) == "1.234"  # без данных — шаг по умолчанию
@@ -0,0 +1,78 @@
+import json
+import math
+import socket
+import urllib.request
+
+import numpy as np
+import pytest
+
+from core.latency import BUCKET_RATIO, MAX_BUCKETS, LatencyHistogram, LatencyRecorder
+
+
+def test_bucket_edges():
+    hist = LatencyHistogram()
+    for us in (0.0, 0.5, 1.0, 1.009, 1.011, 2.0):
+        hist.record(us)
+    assert hist.counts[0] == 2          # < 1 мкс
+    assert hist.counts[1] == 2          # [1, 1.01)
+    assert hist.counts[2] == 1          # [1.01, 1.0201)
+    assert hist.counts[int(math.log(2.0) / math.log(BUCKET_RATIO)) + 1] == 1
+    assert sum(hist.counts) == hist.count == 6
+
+
+def test_huge_values_go_to_the_last_bucket():
+    hist = LatencyHistogram()
+    hist.record(1e30)
+    assert hist.counts[MAX_BUCKETS - 1] == 1
+    assert hist.percentile(99) == 1e30  # граница корзины ограничена max
+
+
+@pytest.mark.parametrize("q", [1, 25, 50, 90, 99])
+def test_percentiles_within_one_bucket_of_numpy(q):
+    values = np.random.default_rng(7).lognormal(mean=6, sigma=1.5, size=50_000)
+    hist = LatencyHistogram()
+    for us in values:
+        hist.record(us)
+    # Верхняя граница корзины: не меньше точного значения и не больше чем на шаг корзины (+ шум соседних рангов)
+    exact = np.percentile(values, q)
+    got = hist.percentile(q)
+    assert exact * 0.999 <= got <= exact * BUCKET_RATIO * 1.001
+
+
+def test_summary_in_milliseconds():
+    hist = LatencyHistogram()
+    assert hist.summary() == {"count": 0}
+    assert hist.percentile(50) == 0.0
+    for us in (1000.0, 2000.0, 3000.0):
+        hist.record(us)
+    summary = hist.summary()
+    assert summary["count"] == 3
+    assert summary["mean_ms"] == pytest.approx(2.0)
+    assert summary["max_ms"] == 3.0
+    assert 2.0 <= summary["p50_ms"] <= 2.0 * BUCKET_RATIO
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_json_endpoint_serves_snapshot():
+    recorder = LatencyRecorder("test")
+    recorder.record("check_signal", 0.002)
+    recorder.record_feed_lag("BTCUSDT", 1_000_000, received=1_000.05)
+    recorder.add_source("shards", lambda: {"alive": 2})
+    port = free_port()
+    recorder.start_reporter(interval=0, port=port)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=2) as resp:
+            assert resp.headers["Content-Type"] == "application/json"
+            snap = json.load(resp)
+    finally:
+        recorder.stop()
+    assert snap["process"] == "test"
+    assert snap["stages"]["check_signal"]["count"] == 1
+    assert snap["stages"]["feed_lag"]["count"] == 1
+    assert snap["feed_lag_top"]["BTCUSDT"]["last_ms"] == pytest.approx(50.0)
+    assert snap["shards"] == {"alive": 2}
@@ -0,0 +1,109 @@
+import random
+
+import pytest
+
+from core.orderbook import L2Book
+
+
+class ReferenceBook:
+    """Эталон: стакан на dict, лучшие уровни — сортировкой при каждом запросе."""
+
+    def __init__(self):
+        self.bids = {}
+        self.asks = {}
+
+    def load(self, bids, asks):
+        self.bids = {float(p): float(s) for p, s in bids if float(s) > 0}
+        self.asks = {float(p): float(s) for p, s in asks if float(s) > 0}
+
+    def apply(self, bids, asks):
+        for side, levels in ((self.bids, bids), (self.asks, asks)):
+            for price, size in levels:
+                if float(size) == 0:
+                    side.pop(float(price), None)
+                else:
+                    side[float(price)] = float(size)
+
+    def levels(self, side):
+        if side == "bids":
+            return sorted(self.bids.items(), reverse=True)
+        return sorted(self.asks.items())
+
+
+def book_levels(book, side):
+    prices, sizes = getattr(book, side).levels()
+    return list(zip(prices.tolist(), sizes.tolist()))
+
+
+def random_levels(rng, prices, count):
+    return [[f"{rng.choice(prices):.1f}", "0" if rng.random() < 0.3 else f"{rng.uniform(0.1, 5):.3f}"]
+            for _ in range(count)]
+
+
+def test_matches_reference_over_random_deltas():
+    rng = random.Random(7)
+    # Пулы цен по 60 уровней на сторону: в ёмкость стакана (2 × depth) помещаются все уровни
+    bid_prices = [100.0 - 0.1 * k for k in range(1, 61)]
+    ask_prices = [100.0 + 0.1 * k for k in range(0, 60)]
+    book = L2Book("BTCUSDT", depth=50)
+    ref = ReferenceBook()
+
+    bids = [[f"{p:.1f}", "1"] for p in bid_prices[:50]]
+    asks = [[f"{p:.1f}", "1"] for p in ask_prices[:50]]
+    assert book.apply("snapshot", {"b": bids, "a": asks, "u": 10, "seq": 100})
+    ref.load(bids, asks)
+
+    for u in range(11, 20_011):
+        b = random_levels(rng, bid_prices, rng.randint(0, 4))
+        a = random_levels(rng, ask_prices, rng.randint(0, 4))
+        assert book.apply("delta", {"b": b, "a": a, "u": u, "seq": 100 + u})
+        ref.apply(b, a)
+        if u % 500 == 0:
+            for side in ("bids", "asks"):
+                assert book_levels(book, side) == ref.levels(side)
+
+    for side in ("bids", "asks"):
+        assert book_levels(book, side) == ref.levels(side)
+    best_bid, best_ask = ref.levels("bids")[0], ref.levels("asks")[0]
+    assert book.best_bid() == best_bid
+    assert book.best_ask() == best_ask
+    assert book.mid() == pytest.approx((best_bid[0] + best_ask[0]) / 2)
+    assert book.spread() == pytest.approx(best_ask[0] - best_bid[0])
+    bid_depth = sum(s for _, s in ref.levels("bids")[:10])
+    ask_depth = sum(s for _, s in ref.levels("asks")[:10])
+    assert book.depth(10) == pytest.approx((bid_depth, ask_depth))
+    assert book.imbalance(10) == pytest.approx((bid_depth - ask_depth) / (bid_depth + ask_depth))
+
+
+def test_full_side_keeps_best_levels():
+    book = L2Book("BTCUSDT", depth=2)  # ёмкость стороны — 4 уровня
+    book.apply("snapshot", {"b": [["10", "1"], ["9", "1"], ["8", "1"], ["7", "1"]], "a": [], "u": 1})
+    book.apply("delta", {"b": [["6", "1"]], "a": [], "u": 2})
+    assert book_levels(book, "bids") == [(10.0, 1.0), (9.0, 1.0), (8.0, 1.0), (7.0, 1.0)]
+    book.apply("delta", {"b": [["11", "2"]], "a": [], "u": 3})
+    assert book_levels(book, "bids") == [(11.0, 2.0), (10.0, 1.0), (9.0, 1.0), (8.0, 1.0)]
+
+
+def test_update_id_gap_invalidates_until_snapshot():
+    book = L2Book("BTCUSDT")
+    book.apply("snapshot", {"b": [["99", "1"]], "a": [["101", "1"]], "u": 5, "seq": 50})
+    assert book.apply("delta", {"b": [["98", "2"]], "a": [], "u": 6, "seq": 51})
+    assert not book.apply("delta", {"b": [["97", "2"]], "a": [], "u": 8, "seq": 53})
+    assert not book.valid and book.resyncs == 1
+    # delta до нового snapshot игнорируются
+    assert book.apply("delta", {"b": [["96", "2"]], "a": [], "u": 9, "seq": 54})
+    assert book_levels(book, "bids") == [(99.0, 1.0), (98.0, 2.0)]
+    book.apply("snapshot", {"b": [["95", "1"]], "a": [["105", "1"]], "u": 20, "seq": 60})
+    assert book.valid
+    assert book.best_bid() == (95.0, 1.0)
+
+
+def test_seq_rollback_and_service_restart():
+    book = L2Book("BTCUSDT")
+    book.apply("snapshot", {"b": [["99", "1"]], "a": [["101", "1"]], "u": 5, "seq": 50})
+    assert not book.apply("delta", {"b": [], "a": [], "u": 6, "seq": 40})
+    # u == 1 — рестарт сервиса биржи: сообщение заменяет стакан, как snapshot
+    assert book.apply("delta", {"b": [["90", "3"]], "a": [["110", "3"]], "u": 1, "seq": 1})
+    assert book.valid
+    assert book_levels(book, "bids") == [(90.0, 3.0)]
+    assert book_levels(book, "asks") == [(110.0, 3.0)]
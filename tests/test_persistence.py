@@ -0,0 +1,101 @@
+import csv
+import time
+
+from core.persistence import CsvWriteBehind
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def read_rows(path):
+    with open(path, newline="") as f:
+        return list(csv.reader(f))
+
+
+def test_flush_by_row_count(tmp_path):
+    writer = CsvWriteBehind(flush_rows=3, flush_interval=3600, metrics_interval=0)
+    path = str(tmp_path / "a.csv")
+    try:
+        for k in range(3):
+            writer.submit(path, {"timestamp": k, "price": k * 1.5})
+        assert wait_for(lambda: writer.metrics()["flushes"] == 1)
+        assert read_rows(path) == [["timestamp", "price"], ["0", "0.0"], ["1", "1.5"], ["2", "3.0"]]
+        assert writer.metrics()["rows_written"] == 3
+    finally:
+        writer.stop()
+
+
+def test_flush_by_interval(tmp_path):
+    writer = CsvWriteBehind(flush_rows=1000, flush_interval=0.05, metrics_interval=0)
+    path = str(tmp_path / "a.csv")
+    try:
+        writer.submit(path, {"timestamp": 1})
+        assert wait_for(lambda: writer.metrics()["rows_written"] == 1)
+        assert read_rows(path) == [["timestamp"], ["1"]]
+    finally:
+        writer.stop()
+
+
+def test_stop_writes_remaining_rows(tmp_path):
+    writer = CsvWriteBehind(flush_rows=1000, flush_interval=3600, metrics_interval=0)
+    path = str(tmp_path / "a.csv")
+    for k in range(5):
+        writer.submit(path, {"timestamp": k})
+    writer.stop()
+    assert [r[0] for r in read_rows(path)] == ["timestamp", "0", "1", "2", "3", "4"]
+    assert writer.metrics()["rows_written"] == 5
+
+
+def test_header_only_for_new_files(tmp_path):
+    existing = tmp_path / "old.csv"
+    existing.write_text("timestamp,price\r\n1,2.0\r\n")
+    writer = CsvWriteBehind(flush_rows=1000, flush_interval=3600, metrics_interval=0)
+    writer.submit(str(existing), {"timestamp": 2, "price": 3.0})
+    writer.submit(str(tmp_path / "new.csv"), {"timestamp": 2, "price": 3.0})
+    writer.stop()
+    assert read_rows(existing) == [["timestamp", "price"], ["1", "2.0"], ["2", "3.0"]]
+    assert read_rows(tmp_path / "new.csv") == [["timestamp", "price"], ["2", "3.0"]]
+
+
+def test_lru_closes_least_recently_used_file(tmp_path):
+    writer = CsvWriteBehind(flush_rows=1, flush_interval=3600, max_open_files=2, metrics_interval=0)
+    paths = [str(tmp_path / f"{k}.csv") for k in range(3)]
+    try:
+        for k, path in enumerate(paths):
+            writer.submit(path, {"timestamp": k})
+        assert wait_for(lambda: writer.metrics()["rows_written"] == 3)
+        assert list(writer._files) == paths[1:]
+        # Закрытый файл открывается снова и дописывается без второго заголовка
+        writer.submit(paths[0], {"timestamp": 10})
+        assert wait_for(lambda: writer.metrics()["rows_written"] == 4)
+        assert list(writer._files) == [paths[2], paths[0]]
+    finally:
+        writer.stop()
+    assert read_rows(paths[0]) == [["timestamp"], ["0"], ["10"]]
+
+
+def test_full_queue_drops_rows(tmp_path, monkeypatch):
+    writer = CsvWriteBehind(max_queue=2, metrics_interval=0)
+    monkeypatch.setattr(writer, "start", lambda: None)  # писатель не запущен — очередь не разбирается
+    for k in range(5):
+        writer.submit(str(tmp_path / "a.csv"), {"timestamp": k})
+    metrics = writer.metrics()
+    assert metrics["dropped"] == 3
+    assert metrics["queue_depth"] == 2
+
+
+def test_failed_write_is_not_counted_as_written(tmp_path):
+    writer = CsvWriteBehind(flush_rows=1000, flush_interval=3600, metrics_interval=0)
+    writer.submit(str(tmp_path / "missing_dir" / "a.csv"), {"timestamp": 1})
+    writer.submit(str(tmp_path / "b.csv"), {"timestamp": 1})
+    writer.submit(str(tmp_path / "b.csv"), {"timestamp": 2})
+    writer.stop()
+    metrics = writer.metrics()
+    assert metrics["rows_written"] == 2
+    assert metrics["write_errors"] == 1
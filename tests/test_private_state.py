@@ -0,0 +1,125 @@
+import threading
+import time
+
+from core.private_state import PrivateStateStore
+
+
+def position(symbol, size, side="Buy", stop_loss="0"):
+    return {"symbol": symbol, "positionIdx": 0, "size": str(size), "side": side, "stopLoss": stop_loss}
+
+
+def order(order_id, status="New", symbol="BTCUSDT", link=""):
+    return {"orderId": order_id, "orderStatus": status, "symbol": symbol, "orderLinkId": link}
+
+
+def test_position_and_order_events():
+    store = PrivateStateStore()
+    store.on_message({"topic": "position", "data": [position("BTCUSDT", 1), position("ETHUSDT", 2)]})
+    store.on_message({"topic": "order", "data": [order("1"), order("2", symbol="ETHUSDT")]})
+    assert {p["symbol"] for p in store.open_positions()} == {"BTCUSDT", "ETHUSDT"}
+    assert [o["orderId"] for o in store.open_orders("ETHUSDT")] == ["2"]
+
+    store.on_message({"topic": "position", "data": [position("ETHUSDT", 0)]})
+    store.on_message({"topic": "order", "data": [order("1", status="Filled")]})
+    assert store.position("ETHUSDT") is None
+    assert store.position("BTCUSDT")["size"] == "1"
+    assert [o["orderId"] for o in store.open_orders()] == ["2"]
+
+
+def test_reconcile_replaces_state_and_counts_mismatch():
+    store = PrivateStateStore()
+    store.replace_positions([position("BTCUSDT", 1)])
+    store.mark_ready()
+    assert not store.replace_positions([position("BTCUSDT", 1)])
+    assert store.replace_positions([position("BTCUSDT", 1), position("ETHUSDT", 3)])
+    assert store.position("ETHUSDT")["size"] == "3"
+    assert store.replace_orders([order("7")])
+    assert [o["orderId"] for o in store.open_orders()] == ["7"]
+    assert store.stats["mismatches"] == 2
+
+
+def test_reconcile_keeps_ws_updates_newer_than_the_snapshot():
+    store = PrivateStateStore()
+    store.on_message({"topic": "position", "data": [position("BTCUSDT", 1), position("ETHUSDT", 2)]})
+    store.on_message({"topic": "order", "data": [order("1"), order("2")]})
+    store.mark_ready()
+
+    since = store.sequence()
+    # Пока идёт постраничный REST-запрос: ETH закрыта, SOL открыта, ордер 1 исполнен, ордер 3 выставлен
+    store.on_message({"topic": "position", "data": [position("ETHUSDT", 0), position("SOLUSDT", 5)]})
+    store.on_message({"topic": "order", "data": [order("1", status="Filled"), order("3")]})
+    # Снимок собран до этих событий
+    rest_positions = [position("BTCUSDT", 1, stop_loss="90"), position("ETHUSDT", 2)]
+    rest_orders = [order("1"), order("2")]
+    store.replace_positions(rest_positions, since)
+    store.replace_orders(rest_orders, since)
+
+    assert store.position("ETHUSDT") is None
+    assert store.position("SOLUSDT")["size"] == "5"
+    assert store.position("BTCUSDT")["stopLoss"] == "90"  # не менялась по WS — берётся из снимка
+    assert sorted(o["orderId"] for o in store.open_orders()) == ["2", "3"]
+
+    # Следующая сверка без новых событий WS — снимок снова главный
+    store.replace_positions([position("BTCUSDT", 1)], store.sequence())
+    assert [p["symbol"] for p in store.open_positions()] == ["BTCUSDT"]
+
+
+def test_reconcile_without_since_overwrites_everything():
+    store = PrivateStateStore()
+    store.on_message({"topic": "position", "data": [position("ETHUSDT", 2)]})
+    store.replace_positions([position("BTCUSDT", 1)])
+    assert [p["symbol"] for p in store.open_positions()] == ["BTCUSDT"]
+
+
+def test_listeners_run_after_state_is_applied():
+    store = PrivateStateStore()
+    seen = []
+    store.add_listener(lambda topic, items: seen.append((topic, store.position("BTCUSDT") is not None)))
+    store.on_message({"topic": "position", "data": position("BTCUSDT", 1)})
+    assert seen == [("position", True)]
+
+
+def execution(link, qty, price):
+    return {"orderLinkId": link, "execType": "Trade", "execQty": str(qty), "execPrice": str(price)}
+
+
+def test_wait_for_fill_full_fill_from_executions():
+    store = PrivateStateStore()
+    store.on_message({"topic": "execution", "data": [execution("e1", 0.4, 100), execution("e1", 0.6, 101)]})
+    price, qty = store.wait_for_fill("e1", 1.0, timeout=0.01)
+    assert qty == 1.0
+    assert price == 100.6
+
+
+def test_wait_for_fill_partial_fill_then_cancel():
+    store = PrivateStateStore()
+    store.on_message({"topic": "execution", "data": [execution("e2", 0.3, 50)]})
+    store.on_message({"topic": "order", "data": [
+        dict(order("2", status="Cancelled", link="e2"), cumExecQty="0.3", avgPrice="50")
+    ]})
+    assert store.wait_for_fill("e2", 1.0, timeout=0.01) == (50.0, 0.3)
+
+
+def test_wait_for_fill_terminal_zero_fill_is_not_a_timeout():
+    store = PrivateStateStore()
+    store.on_message({"topic": "order", "data": [
+        dict(order("3", status="Rejected", link="e3"), cumExecQty="0", avgPrice="")
+    ]})
+    started = time.monotonic()
+    assert store.wait_for_fill("e3", 1.0, timeout=5) == (0.0, 0.0)
+    assert time.monotonic() - started < 1
+
+
+def test_wait_for_fill_timeout_returns_none():
+    store = PrivateStateStore()
+    assert store.wait_for_fill("missing", 1.0, timeout=0.02) is None
+
+
+def test_wait_for_fill_wakes_on_event_from_another_thread():
+    store = PrivateStateStore()
+    timer = threading.Timer(0.05, store.on_message, args=({"topic": "execution", "data": [execution("e4", 2, 10)]},))
+    timer.start()
+    try:
+        assert store.wait_for_fill("e4", 2.0, timeout=5) == (10.0, 2.0)
+    finally:
+        timer.cancel()
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.resampler import MultiTimeframeResampler, resample_frame, bucket_start, timeframe_seconds
+
+TIMEFRAMES = ("5m", "15m", "1h", "4h", "1d", "1w")
+COLUMNS = ["timestamp", "open", "high", "low", "close", "volume", "turnover"]
+
+
+def random_minutes(n, seed=0, start=1_704_067_200, gaps=True):
+    """1m-свечи с начала 2024 г. (понедельник), с пропусками в потоке."""
+    rng = np.random.default_rng(seed)
+    ts = start + 60 * np.arange(n)
+    if gaps:
+        ts = ts[rng.random(n) > 0.02]
+    close = 100 + np.cumsum(rng.normal(0, 0.1, len(ts)))
+    spread = np.abs(rng.normal(0, 0.05, (2, len(ts))))
+    volume = rng.uniform(0, 10, len(ts))
+    return pd.DataFrame({
+        "timestamp": ts,
+        "open": close - rng.normal(0, 0.05, len(ts)),
+        "high": close + spread[0],
+        "low": close - spread[1],
+        "close": close,
+        "volume": volume,
+        "turnover": volume * close,
+    })
+
+
+def test_bucket_start_aligns_weeks_to_monday():
+    monday = 1_704_067_200  # 2024-01-01 00:00 UTC
+    assert bucket_start(monday + 3 * 86400 + 5, 604800) == monday
+    assert bucket_start(monday + 3600 * 5 + 59, 3600) == monday + 3600 * 5
+    with pytest.raises(ValueError):
+        timeframe_seconds("30s")
+
+
+def test_incremental_matches_resample_frame():
+    minutes = random_minutes(20_000)
+    resampler = MultiTimeframeResampler(TIMEFRAMES, capacity=20_000)
+    closed = {tf: [] for tf in TIMEFRAMES}
+    rng = np.random.default_rng(1)
+    for row in minutes[COLUMNS].itertuples(index=False):
+        # Перед подтверждением минуты — несколько обновлений формирующейся свечи
+        # (после пропуска в потоке предыдущий интервал закрывается уже первым обновлением следующего)
+        events = []
+        for _ in range(rng.integers(0, 3)):
+            events += resampler.update("BTCUSDT", int(row[0]), row[1], row[2] + 1, row[3] - 1, row[4], row[5] / 2, row[6] / 2)
+        events += resampler.update("BTCUSDT", int(row[0]), *row[1:], closed=True)
+        for tf, candle, is_closed in events:
+            if is_closed:
+                closed[tf].append(candle)
+
+    for tf in TIMEFRAMES:
+        expected = resample_frame(minutes, tf)
+        # Последний интервал ещё формируется: закрыт, только если в нём была последняя минута интервала
+        seconds = timeframe_seconds(tf)
+        last = int(minutes["timestamp"].iloc[-1])
+        if last + 60 < bucket_start(last, seconds) + seconds:
+            expected = expected.iloc[:-1]
+            forming = resampler.forming("BTCUSDT", tf)
+            np.testing.assert_allclose(forming, resample_frame(minutes, tf).iloc[-1][COLUMNS].to_numpy(dtype=float))
+        actual = pd.DataFrame(closed[tf], columns=COLUMNS)
+        assert len(actual) == len(expected), tf
+        np.testing.assert_allclose(actual.to_numpy(dtype=float), expected[COLUMNS].to_numpy(dtype=float),
+                                   rtol=1e-9, atol=1e-9, err_msg=tf)
+        ring = resampler.candles("BTCUSDT", tf, n=len(expected))
+        np.testing.assert_array_equal(ring["timestamp"], expected["timestamp"].to_numpy())
+
+
+def test_seed_then_stream_matches_resample_frame():
+    minutes = random_minutes(3 * 1440, seed=5, gaps=False)
+    split = 1440 + 437
+    resampler = MultiTimeframeResampler(("15m", "1h", "1d"))
+    resampler.seed("BTCUSDT", minutes.iloc[:split])
+    events = []
+    resampler.add_listener(lambda symbol, tf, row: events.append((tf, row)))
+    for row in minutes.iloc[split:][COLUMNS].itertuples(index=False):
+        resampler.update("BTCUSDT", int(row[0]), *row[1:], closed=True)
+
+    for tf in ("15m", "1h", "1d"):
+        expected = resample_frame(minutes, tf)
+        start = bucket_start(int(minutes["timestamp"].iloc[split]), timeframe_seconds(tf))
+        expected = expected[expected["timestamp"] >= start]
+        actual = [row for t, row in events if t == tf]
+        np.testing.assert_allclose(np.array(actual, dtype=float), expected[COLUMNS].to_numpy(dtype=float),
+                                   rtol=1e-9, atol=1e-9, err_msg=tf)
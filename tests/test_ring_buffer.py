@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from core.ring_buffer import RingBuffer, CandleBuffer, RingBufferStore, KLINE_COLUMNS, TRADE_COLUMNS
+
+
+def test_last_after_wrap_around_is_contiguous_and_ordered():
+    buf = RingBuffer(4, {"timestamp": np.int64, "price": np.float64})
+    for k in range(11):
+        buf.append(k, k * 1.5)
+    assert len(buf) == 4
+    last = buf.last()
+    assert last["timestamp"].tolist() == [7, 8, 9, 10]
+    assert last["price"].tolist() == [10.5, 12.0, 13.5, 15.0]
+    assert buf.last(2)["timestamp"].tolist() == [9, 10]
+    assert buf.last(100)["timestamp"].tolist() == [7, 8, 9, 10]
+    assert buf.last(0)["timestamp"].tolist() == []
+    assert last["timestamp"].base is not None  # view, не копия
+    with pytest.raises(ValueError):
+        last["price"][0] = 0.0
+
+
+def test_partial_buffer_returns_only_written_rows():
+    buf = RingBuffer(8, {"timestamp": np.int64})
+    buf.append(1)
+    buf.append(2)
+    assert buf.last()["timestamp"].tolist() == [1, 2]
+    assert buf.last_value("timestamp") == 2
+    assert RingBuffer(3, {"timestamp": np.int64}).last_value("timestamp") is None
+
+
+def test_last_views_change_in_place_on_later_appends():
+    buf = RingBuffer(3, {"timestamp": np.int64})
+    for k in range(3):
+        buf.append(k)
+    view = buf.last(3)["timestamp"]
+    buf.append(3)
+    # Память view перезаписана новым значением, а не сдвинута
+    assert view.tolist() != [0, 1, 2]
+    assert buf.last(3)["timestamp"].tolist() == [1, 2, 3]
+
+
+def test_update_last_changes_both_copies():
+    buf = RingBuffer(3, {"timestamp": np.int64, "price": np.float64})
+    with pytest.raises(IndexError):
+        buf.update_last(price=1.0)
+    for k in range(5):  # после переноса последняя строка лежит в начале кольца
+        buf.append(k, float(k))
+    buf.update_last(price=42.0)
+    assert buf.last()["price"].tolist() == [2.0, 3.0, 42.0]
+    buf.append(5, 5.0)
+    buf.append(6, 6.0)
+    assert buf.last()["price"].tolist() == [42.0, 5.0, 6.0]
+
+
+def test_candle_upsert_same_older_newer():
+    buf = CandleBuffer(4)
+    assert buf.upsert(60, 1, 2, 0.5, 1.5, 10, 15)
+    assert not buf.upsert(60, 1, 3, 0.4, 2.5, 12, 30)  # тот же timestamp — обновление на месте
+    assert not buf.upsert(0, 9, 9, 9, 9, 9, 9)         # более старая — пропуск
+    assert buf.upsert(120, 2.5, 2.6, 2.4, 2.5, 1, 2)
+    last = buf.last()
+    assert last["timestamp"].tolist() == [60, 120]
+    assert last["high"].tolist() == [3.0, 2.6]
+    assert last["close"].tolist() == [2.5, 2.5]
+    assert last["volume"].tolist() == [12.0, 1.0]
+
+
+def test_nbytes_per_symbol_matches_allocated_buffers():
+    candles = RingBufferStore(100)
+    trades = RingBufferStore(50, TRADE_COLUMNS)
+    assert candles.nbytes_per_symbol == 2 * 100 * 8 * len(KLINE_COLUMNS)
+    assert candles.nbytes_per_symbol == candles.get("BTCUSDT").nbytes
+    assert trades.nbytes_per_symbol == 2 * 50 * (8 + 8 + 8 + 1)
+    assert trades.nbytes_per_symbol == trades.get("BTCUSDT").nbytes
+    assert isinstance(candles.get("BTCUSDT"), CandleBuffer)
+    assert "BTCUSDT" in candles and "ETHUSDT" not in candles
@@ -0,0 +1,120 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from core.shared_candles import SharedCandles, CANDLE_FIELDS, S_SEQ
+
+
+@pytest.fixture
+def segment():
+    shared = SharedCandles.create(["BTCUSDT", "ETHUSDT"], capacity=4, spare=1)
+    writer = SharedCandles.attach(shared.name, writable=True)  # публикует, как collector
+    yield shared, writer
+    writer.close()
+    shared.close()
+
+
+def candle(ts):
+    """Все поля свечи равны ts — разорванное чтение видно по несовпадению полей строки."""
+    return (ts, ts, ts, ts, ts, ts, ts)
+
+
+def test_ring_wraps_around_at_capacity(segment):
+    shared, writer = segment
+    for ts in range(60, 60 * 8, 60):
+        writer.publish("BTCUSDT", *candle(ts), closed=True)
+    columns, closed_ts = shared.read("BTCUSDT")
+    assert columns["timestamp"].tolist() == [240, 300, 360, 420]
+    assert columns["close"].tolist() == [240.0, 300.0, 360.0, 420.0]
+    assert closed_ts == 420
+    assert shared.read("BTCUSDT", 2)[0]["timestamp"].tolist() == [360, 420]
+    assert shared.read("ETHUSDT")[0]["timestamp"].tolist() == []
+
+
+def test_forming_candle_updates_in_place_and_old_ones_are_ignored(segment):
+    shared, writer = segment
+    writer.publish("BTCUSDT", *candle(60), closed=True)
+    writer.publish("BTCUSDT", 120, 1, 2, 0.5, 1.5, 3, 4)
+    writer.publish("BTCUSDT", 120, 1, 5, 0.5, 4.5, 6, 7)
+    writer.publish("BTCUSDT", *candle(0))
+    columns, closed_ts = shared.read("BTCUSDT")
+    assert columns["timestamp"].tolist() == [60, 120]
+    assert columns["high"].tolist() == [60.0, 5.0]
+    assert closed_ts == 60
+    # Формирующаяся свеча не считается закрытой
+    assert [c["timestamp"] for c in shared.closed_candles_since("BTCUSDT")] == [60]
+    writer.publish("BTCUSDT", *candle(180), closed=True)
+    assert [c["timestamp"] for c in shared.closed_candles_since("BTCUSDT", after_ts=60)] == [120, 180]
+    assert shared.closed_candles_since("MISSING") == []
+
+
+class WriteDuringCopy:
+    """Обёртка над кольцом свечей: при первом копировании строк писатель публикует новую свечу."""
+
+    def __init__(self, candles, write):
+        self.candles = candles
+        self.write = write
+
+    def __getitem__(self, i):
+        rows = self.candles[i]
+        outer = self
+
+        class Rows:
+            def __getitem__(self, index):
+                copied = rows[index]
+                if outer.write is not None:
+                    write, outer.write = outer.write, None
+                    write()
+                return copied
+
+        return Rows()
+
+
+def test_read_retries_when_the_writer_interleaves(segment):
+    shared, writer = segment
+    writer.publish("BTCUSDT", *candle(60), closed=True)
+    reader = SharedCandles.attach(shared.name)
+    try:
+        reader._candles = WriteDuringCopy(reader._candles, lambda: writer.publish("BTCUSDT", *candle(120), closed=True))
+        columns, closed_ts = reader.read("BTCUSDT")
+        # Первый снимок устарел (seq сменился) — возвращается повторное чтение
+        assert columns["timestamp"].tolist() == [60, 120]
+        assert closed_ts == 120
+    finally:
+        del reader._candles
+        reader.shm.close()
+
+
+def test_read_gives_up_while_a_write_is_in_progress(segment):
+    shared, writer = segment
+    writer.publish("BTCUSDT", *candle(60))
+    writer._slots[0, S_SEQ] += 1  # писатель «завис» посреди записи
+    assert shared.read("BTCUSDT") is None
+    writer._slots[0, S_SEQ] += 1
+    assert shared.read("BTCUSDT")[0]["timestamp"].tolist() == [60]
+
+
+def publish_from_child(name, symbol, count):
+    writer = SharedCandles.attach(name, writable=True)
+    try:
+        for k in range(1, count + 1):
+            writer.publish(symbol, *candle(60 * k), closed=True)
+    finally:
+        writer.close()
+
+
+def test_writer_in_another_process(segment):
+    shared, _ = segment
+    assert shared.register("SOLUSDT")
+    ctx = multiprocessing.get_context("spawn")
+    child = ctx.Process(target=publish_from_child, args=(shared.name, "SOLUSDT", 6))
+    child.start()
+    child.join(30)
+    assert child.exitcode == 0
+    columns, closed_ts = shared.read("SOLUSDT")
+    assert columns["timestamp"].tolist() == [180, 240, 300, 360]
+    for name in CANDLE_FIELDS:
+        np.testing.assert_array_equal(columns[name], columns["timestamp"].astype(np.float64))
+    assert closed_ts == 360
+    assert shared.global_sequence() == 12  # 6 публикаций, по два шага seq на каждую
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+import core.startup as startup
+from config import STARTUP_SUBSCRIBE_BUDGET
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Всё, что main импортирует до запуска collector (первой подписки WS)
+PRE_SUBSCRIPTION_IMPORTS = """
+import sys, time
+started = time.time()
+import core.startup
+from core.latency import recorder
+from core.async_rest import get_shared_client
+from core.clock import clock
+from core.shared_candles import SharedCandles
+from core.ticker_state import TickerTable
+from core.candle_scheduler import CandleCloseScheduler
+from core.websocket_collector import start_websocket_collector_proc, send_universe_change
+from core.universe import UniverseManager
+from core.resampler import MultiTimeframeResampler
+print(time.time() - started, *sorted(m for m in ("pandas", "pybit", "indicators.vectorized") if m in sys.modules))
+"""
+
+
+def test_imports_before_first_subscription_fit_the_budget():
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    out = subprocess.run([sys.executable, "-c", PRE_SUBSCRIPTION_IMPORTS], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout.split()
+    elapsed, heavy = float(out[0]), out[1:]
+    assert heavy == []  # тяжёлые модули грузятся после запуска collector
+    assert elapsed < STARTUP_SUBSCRIBE_BUDGET / 2
+
+
+def test_first_subscription_reports_budget(monkeypatch, capsys):
+    monkeypatch.setattr(startup, "_subscribed", False)
+    monkeypatch.setattr(startup.timer, "started", startup.time.time() - 7)
+    assert startup.report_first_subscription(budget=5) is False
+    assert "превышен" in capsys.readouterr().out
+    assert startup.report_first_subscription(budget=5) is None  # печатается один раз на процесс
+
+    monkeypatch.setattr(startup, "_subscribed", False)
+    monkeypatch.setattr(startup.timer, "started", startup.time.time() - 1)
+    assert startup.report_first_subscription(budget=5) is True
@@ -0,0 +1,79 @@
+import math
+
+import pytest
+
+import core.ticker_state as ticker_state
+from core.ticker_state import TickerTable
+
+
+SNAPSHOT = {
+    "symbol": "BTCUSDT", "lastPrice": "65000.5", "markPrice": "65001", "indexPrice": "64999",
+    "bid1Price": "65000", "bid1Size": "2.5", "ask1Price": "65001", "ask1Size": "1.2",
+    "fundingRate": "0.0001", "tickDirection": "PlusTick", "curPreListingPhase": "",
+}
+
+
+@pytest.fixture
+def shared_table():
+    table = TickerTable.create(["BTCUSDT"], spare=2)
+    yield table
+    table.close()
+
+
+def test_delta_updates_only_present_fields():
+    table = TickerTable.local(["BTCUSDT"])
+    assert table.apply("BTCUSDT", SNAPSHOT, ts=1_000)
+    assert table.apply("BTCUSDT", {"symbol": "BTCUSDT", "lastPrice": "65010", "tickDirection": "ZeroMinusTick"}, ts=2_000)
+    row = table.get("BTCUSDT")
+    assert row["lastPrice"] == 65010.0
+    assert row["tickDirection"] == -1.0
+    assert row["ts"] == 2_000
+    # Поля, которых не было в delta, остались из snapshot
+    assert (row["bid1Price"], row["ask1Price"], row["markPrice"]) == (65000.0, 65001.0, 65001.0)
+    assert row["fundingRate"] == 0.0001
+    assert math.isnan(row["openInterest"])  # ни разу не приходило
+
+
+def test_empty_string_becomes_nan():
+    table = TickerTable.local(["BTCUSDT"])
+    table.apply("BTCUSDT", SNAPSHOT, ts=1_000)
+    table.apply("BTCUSDT", {"bid1Price": "", "bid1Size": ""}, ts=1_001)
+    assert math.isnan(table.value("BTCUSDT", "bid1Price"))
+    assert math.isnan(table.value("BTCUSDT", "bid1Size"))
+    assert table.value("BTCUSDT", "ask1Price") == 65001.0
+
+
+def test_unknown_symbol():
+    table = TickerTable.local(["BTCUSDT"])
+    assert not table.apply("ETHUSDT", SNAPSHOT)
+    assert table.get("ETHUSDT") is None
+    assert table.quote("ETHUSDT") is None
+    assert math.isnan(table.value("ETHUSDT", "lastPrice"))
+
+
+def test_register_is_visible_from_second_instance(shared_table):
+    reader = TickerTable.attach(shared_table.name)
+    try:
+        assert "ETHUSDT" not in reader
+        assert shared_table.register("ETHUSDT")
+        assert shared_table.register("ETHUSDT")  # повторная регистрация слот не тратит
+        writer = TickerTable.attach(shared_table.name)
+        writer.apply("ETHUSDT", {"lastPrice": "3500", "bid1Price": "3499", "ask1Price": "3501"}, ts=5_000)
+        writer.close()
+        assert "ETHUSDT" in reader
+        assert reader.get("ETHUSDT")["lastPrice"] == 3500.0
+        assert reader.symbols == ["BTCUSDT", "ETHUSDT", ""]
+        assert shared_table.register("SOLUSDT")
+        assert not shared_table.register("XRPUSDT")  # запасные слоты кончились
+    finally:
+        reader.close()
+
+
+def test_quote_respects_max_age(monkeypatch):
+    table = TickerTable.local(["BTCUSDT"])
+    assert table.quote("BTCUSDT") is None  # тикер ещё не приходил
+    table.apply("BTCUSDT", SNAPSHOT, ts=1_000_000)
+    monkeypatch.setattr(ticker_state.clock, "now_ms", lambda: 1_004_000)
+    assert table.quote("BTCUSDT") == (65000.0, 65001.0, 65000.5, 65001.0)
+    assert table.quote("BTCUSDT", max_age=5) is not None
+    assert table.quote("BTCUSDT", max_age=3) is None
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.trade_bars import BarBuilder, TradeAggregator, BAR_FIELDS, TIME, VOLUME, DOLLAR
+
+
+def random_tape(n, seed=0, start_ms=1_700_000_000_000):
+    rng = np.random.default_rng(seed)
+    ts = start_ms + np.cumsum(rng.integers(0, 400, n))
+    price = 100 + np.cumsum(rng.normal(0, 0.05, n))
+    size = rng.uniform(0.01, 2.0, n)
+    side = rng.choice([1, -1], n)
+    return pd.DataFrame({"ts": ts, "price": price, "size": size, "side": side})
+
+
+def feed(aggregator, tape):
+    bars = []
+    for row in tape.itertuples(index=False):
+        bars.extend(aggregator.on_trade(int(row.ts), float(row.price), float(row.size), int(row.side)))
+    return bars
+
+
+def test_time_bars_match_pandas_groupby():
+    tape = random_tape(20_000)
+    agg = TradeAggregator("BTCUSDT", time_ms=1000)
+    bars = [dict(zip(BAR_FIELDS, bar)) for kind, bar in feed(agg, tape)]
+    bars += [dict(zip(BAR_FIELDS, bar)) for kind, bar in agg.flush(int(tape["ts"].iloc[-1]) + 10_000)]
+
+    tape["bucket"] = tape["ts"] - tape["ts"] % 1000
+    tape["turnover"] = tape["price"] * tape["size"]
+    tape["buy"] = np.where(tape["side"] > 0, tape["size"], 0.0)
+    tape["cvd"] = (tape["size"] * tape["side"]).cumsum()
+    g = tape.groupby("bucket", sort=True)
+    expected = pd.DataFrame({
+        "start_ms": g["ts"].first() - g["ts"].first() % 1000,
+        "end_ms": g["ts"].last(),
+        "open": g["price"].first(),
+        "high": g["price"].max(),
+        "low": g["price"].min(),
+        "close": g["price"].last(),
+        "volume": g["size"].sum(),
+        "buy_volume": g["buy"].sum(),
+        "turnover": g["turnover"].sum(),
+        "cvd": g["cvd"].last(),
+        "trades": g.size(),
+    }).reset_index(drop=True)
+
+    actual = pd.DataFrame(bars)
+    assert len(actual) == len(expected)
+    for column in expected.columns:
+        np.testing.assert_allclose(actual[column].to_numpy(dtype=float), expected[column].to_numpy(dtype=float),
+                                   rtol=1e-9, atol=1e-9, err_msg=column)
+    np.testing.assert_allclose(actual["vwap"], expected["turnover"] / expected["volume"], rtol=1e-9)
+
+
+@pytest.mark.parametrize("kind, threshold, column", [(VOLUME, 25.0, "volume"), (DOLLAR, 2500.0, "turnover")])
+def test_volume_and_dollar_bars_close_at_threshold(kind, threshold, column):
+    tape = random_tape(5_000, seed=3)
+    builder = BarBuilder(kind, threshold)
+    bars, cvd = [], 0.0
+    for row in tape.itertuples(index=False):
+        cvd += row.size * row.side
+        bar = builder.update(int(row.ts), float(row.price), float(row.size), int(row.side), cvd)
+        if bar is not None:
+            bars.append(dict(zip(BAR_FIELDS, bar)))
+    assert bars
+    assert all(bar[column] >= threshold for bar in bars)
+    assert sum(bar["trades"] for bar in bars) + builder.trades == len(tape)
+
+
+def test_late_trade_after_flush_does_not_duplicate_bar():
+    builder = BarBuilder(TIME, 1000)
+    assert builder.update(1_000_100, 10.0, 1.0, 1, 1.0) is None
+    bar = builder.flush(1_001_005, 1.0)
+    assert bar is not None and bar[0] == 1_000_000
+    # Сделка из уже закрытого интервала пришла после flush — второго бара с тем же start_ms нет
+    assert builder.update(1_000_995, 11.0, 1.0, 1, 2.0) is None
+    assert builder.late == 1
+    assert builder.trades == 0
+    builder.update(1_001_200, 12.0, 1.0, 1, 3.0)
+    bar = builder.flush(1_003_000, 3.0)
+    assert bar[0] == 1_001_000 and bar[-1] == 1
+
+
+def test_trade_before_open_bar_is_late():
+    builder = BarBuilder(TIME, 1000)
+    builder.update(1_001_200, 12.0, 1.0, 1, 1.0)
+    # Сделка из предыдущего интервала (ничего ещё не закрыто) не вливается в открытый бар
+    assert builder.update(1_000_900, 9.0, 1.0, -1, 0.0) is None
+    assert builder.late == 1
+    assert builder.trades == 1
+    bar = dict(zip(BAR_FIELDS, builder.flush(1_003_000, 1.0)))
+    assert (bar["start_ms"], bar["end_ms"]) == (1_001_000, 1_001_200)
+    assert (bar["low"], bar["volume"]) == (12.0, 1.0)
+
+
+def test_flush_waits_for_grace_and_keeps_lagging_trade():
+    agg = TradeAggregator("BTCUSDT", time_ms=1000)
+    agg.on_trade(1_000_100, 10.0, 1.0, 1)
+    assert agg.flush(1_001_005, grace_ms=500) == []
+    agg.on_trade(1_000_995, 11.0, 2.0, -1)
+    (kind, bar), = agg.flush(1_001_500, grace_ms=500)
+    bar = dict(zip(BAR_FIELDS, bar))
+    assert kind == TIME
+    assert bar["start_ms"] == 1_000_000
+    assert bar["trades"] == 2
+    assert bar["close"] == 11.0
+    assert bar["cvd"] == -1.0
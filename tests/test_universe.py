@@ -0,0 +1,42 @@
+from core.universe import UniverseManager
+
+
+def tickers(**volumes):
+    return [{"symbol": symbol, "volume24h": str(volume)} for symbol, volume in volumes.items()]
+
+
+def test_candidates_become_members_only_after_admit():
+    universe = UniverseManager(min_volume24h=100)
+    added, removed = universe.load_snapshot(tickers(AUSDT=500, BUSDT=50))
+    assert (added, removed) == (["AUSDT"], [])
+    assert "AUSDT" not in universe and len(universe) == 0
+    # Пока история грузится, кандидат не предлагается повторно
+    assert universe.rebalance() == ([], [])
+    assert universe.admit(["AUSDT", "BUSDT"]) == ["AUSDT"]
+    assert "AUSDT" in universe and universe.members == ["AUSDT"]
+    assert universe.pending == set()
+
+
+def test_rejected_candidate_is_offered_again():
+    universe = UniverseManager(min_volume24h=100)
+    added, _ = universe.load_snapshot(tickers(AUSDT=500))
+    universe.reject(added)
+    assert universe.rebalance() == (["AUSDT"], [])
+
+
+def test_exclude_drops_candidate_and_member():
+    universe = UniverseManager(min_volume24h=100)
+    universe.admit(universe.load_snapshot(tickers(AUSDT=500))[0])
+    universe.load_snapshot(tickers(AUSDT=500, BUSDT=500))
+    assert universe.exclude(["AUSDT", "BUSDT"]) == ["AUSDT"]
+    assert universe.pending == set() and len(universe) == 0
+    assert universe.admit(["BUSDT"]) == []
+    assert universe.rebalance() == ([], [])
+
+
+def test_hysteresis_and_delisting():
+    universe = UniverseManager(min_volume24h=100, drop_ratio=0.8)
+    universe.admit(universe.load_snapshot(tickers(AUSDT=500, BUSDT=500))[0])
+    # AUSDT на границе (90 >= 80) остаётся, BUSDT пропал из снимка — делистинг
+    assert universe.load_snapshot(tickers(AUSDT=90)) == ([], ["BUSDT"])
+    assert universe.load_snapshot(tickers(AUSDT=70)) == ([], ["AUSDT"])
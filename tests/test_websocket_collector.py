@@ -0,0 +1,177 @@
+import asyncio
+import json
+import queue
+
+import numpy as np
+import pandas as pd
+
+import core.websocket_collector as collector
+from core.websocket_collector import (
+    WsShard, run_shard, add_symbols, remove_symbols, seed_resampler, send_universe_change,
+)
+from core.resampler import MultiTimeframeResampler, resample_frame
+
+
+class StopEvent:
+    def __init__(self):
+        self.stopped = False
+
+    def is_set(self):
+        return self.stopped
+
+    def set(self):
+        self.stopped = True
+
+
+class FakeConnection:
+    """Соединение, которое открывается только после gate.set(): окно гонки с add/remove_symbols."""
+
+    def __init__(self, gate):
+        self.gate = gate
+        self.ops = []
+
+    async def __aenter__(self):
+        await self.gate.wait()
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def send(self, message):
+        message = json.loads(message)
+        self.ops.append((message["op"], message["args"]))
+
+    async def recv(self):
+        await asyncio.sleep(0.01)
+        return json.dumps({"op": "pong"})
+
+
+def subscribed_symbols(ops):
+    """Пары с активной подпиской на бирже по журналу subscribe/unsubscribe соединения."""
+    topics = set()
+    for op, args in ops:
+        if op == "subscribe":
+            topics.update(args)
+        else:
+            topics.difference_update(args)
+    return {topic.split(".")[-1] for topic in topics}
+
+
+def test_pairs_changed_while_connecting_reach_the_exchange(monkeypatch):
+    async def scenario():
+        gate = asyncio.Event()
+        conn = FakeConnection(gate)
+        monkeypatch.setattr(collector.websockets, "connect", lambda *a, **k: conn)
+        shard = WsShard(0, ["AUSDT", "BUSDT"], "60")
+        monkeypatch.setattr(collector, "shards", [shard])
+        stop = StopEvent()
+        task = asyncio.ensure_future(run_shard(shard, stop))
+        await asyncio.sleep(0.01)
+
+        # Шард ещё подключается (shard.ws is None): изменения только в shard.symbols
+        assert await add_symbols(["CUSDT"], "60", stop) == ["CUSDT"]
+        assert await remove_symbols(["BUSDT"]) == ["BUSDT"]
+        assert conn.ops == []
+
+        gate.set()
+        await asyncio.sleep(0.05)
+        stop.set()
+        await asyncio.wait_for(task, timeout=1)
+        return shard, conn
+
+    shard, conn = asyncio.run(scenario())
+    assert subscribed_symbols(conn.ops) == {"AUSDT", "CUSDT"}
+    assert {symbol for _, symbol in shard.dispatch.values()} == {"AUSDT", "CUSDT"}
+    assert shard.topics == len(shard.dispatch)
+
+
+class DroppingConnection(FakeConnection):
+    """Соединение, которое рвётся на первом recv, если подписано на пару из drop (один раз на пару)."""
+
+    def __init__(self, gate, drop):
+        super().__init__(gate)
+        self.drop = drop
+
+    async def recv(self):
+        symbols = subscribed_symbols(self.ops) & self.drop
+        if symbols:
+            self.drop -= symbols
+            await asyncio.sleep(0.01)
+            raise ConnectionError("connection closed")
+        return await super().recv()
+
+
+def test_failing_shard_resubscribes_alone(monkeypatch):
+    async def scenario():
+        gate = asyncio.Event()
+        gate.set()
+        drop = {"AUSDT"}
+        connections = []
+
+        def connect(*args, **kwargs):
+            connections.append(DroppingConnection(gate, drop))
+            return connections[-1]
+
+        real_sleep = asyncio.sleep
+        monkeypatch.setattr(collector.asyncio, "sleep", lambda delay: real_sleep(min(delay, 0.01)))
+        monkeypatch.setattr(collector.websockets, "connect", connect)
+        failing, healthy = WsShard(0, ["AUSDT"], "60"), WsShard(1, ["BUSDT"], "60")
+        monkeypatch.setattr(collector, "shards", [failing, healthy])
+        stop = StopEvent()
+        tasks = [asyncio.ensure_future(run_shard(shard, stop)) for shard in (failing, healthy)]
+        await real_sleep(0.1)
+        stop.set()
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=1)
+        return failing, healthy, connections
+
+    failing, healthy, connections = asyncio.run(scenario())
+    subscriptions = [subscribed_symbols(conn.ops) for conn in connections]
+    assert subscriptions.count({"AUSDT"}) == 2  # обрыв — переподключение и переподписка только своих пар
+    assert subscriptions.count({"BUSDT"}) == 1  # соседний шард своё соединение не терял
+    assert len(subscriptions) == 3
+    assert (failing.errors, failing.connects) == (1, 2)
+    assert (healthy.errors, healthy.connects) == (0, 1)
+
+
+def minutes_frame(n, start=1_704_067_200):
+    close = 100 + np.sin(np.arange(n))
+    return pd.DataFrame({
+        "timestamp": start + 60 * np.arange(n), "open": close - 0.1, "high": close + 0.5,
+        "low": close - 0.5, "close": close, "volume": np.ones(n), "turnover": close,
+    })
+
+
+def test_minutes_held_until_seed_then_replayed(monkeypatch):
+    minutes = minutes_frame(150)
+    resampler = MultiTimeframeResampler(["1h"])
+    monkeypatch.setattr(collector, "resampler", resampler)
+    monkeypatch.setattr(collector, "shared_resampled", {})
+    monkeypatch.setattr(collector, "resample_pending", {"BTCUSDT": {}, "ETHUSDT": {}})
+
+    # История до 100-й минуты грузится, а collector уже получает минуты из потока (с повторами формирующейся)
+    history, live = minutes.iloc[:100], minutes.iloc[95:]
+    held = collector.resample_pending["BTCUSDT"]
+    for row in live.itertuples(index=False):
+        candle = tuple(row)
+        held[candle[0]] = ((candle[0], *candle[1:4], candle[4] + 1, *candle[5:]), False)
+        held[candle[0]] = (candle, True)
+
+    assert seed_resampler(["BTCUSDT", "ETHUSDT", "SOLUSDT"], {"BTCUSDT": history, "ETHUSDT": None}) == 1
+    assert collector.resample_pending == {}  # ETHUSDT без истории отпущена без прогрева
+
+    # Прогрев начинается с интервала последней минуты истории, третий час ещё формируется:
+    # закрытый час собран из минут истории и накопленных минут потока
+    expected = resample_frame(minutes, "1h").iloc[1:2]
+    got = resampler.candles("BTCUSDT", "1h")
+    for column in expected.columns:
+        np.testing.assert_allclose(got[column], expected[column].to_numpy())
+
+
+def test_seed_for_running_pairs_goes_to_every_process():
+    controls = [queue.Queue(), queue.Queue()]
+    send_universe_change(controls, added=["NEWUSDT"], seed={"NEWUSDT": "new", "BTCUSDT": "btc", "ETHUSDT": None})
+    messages = [[control.get_nowait() for _ in range(control.qsize())] for control in controls]
+    for received in messages:
+        assert ("seed", ["BTCUSDT", "ETHUSDT"], {"BTCUSDT": "btc", "ETHUSDT": None}) in received
+    subscribes = [m for received in messages for m in received if m[0] == "subscribe"]
+    assert subscribes == [("subscribe", ["NEWUSDT"], {"NEWUSDT": "new"})]